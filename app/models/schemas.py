@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Annotated, List, Optional, Dict, Any
+from dataclasses import dataclass, field
 
 class ChildProfileInput(BaseModel):
     child_id: str = Field(..., description="아동 식별자")
@@ -17,12 +17,24 @@ class AssessmentInput(BaseModel):
     child_id: str   = Field(..., description="아동 식별자")
     lesson_id: str  = Field(..., description="교재 세션 식별자")
     responses_text: str = Field(..., description="아동의 평가 응답 전체 텍스트")
-    materials_text: str = Field(..., description="문제 전체 텍스트")
+    materials_text: Optional[str] = Field(None, description="문제 정답 텍스트 (생략하면 lesson_id로 서버에 저장된 교재에서 찾음)")
+
+class BulkAssessmentInput(BaseModel):
+    assessments: List[AssessmentInput] = Field(..., description="한 번에 제출하는 평가 응답 목록")
 
 class FeedbackResponse(BaseModel):
     feedback: str           = Field(..., description="이해도 평가 기반 피드백")
     next_lesson: Optional[str] = Field(None, description="다음 교재 내용(옵션)")
 
+class BulkFeedbackItem(BaseModel):
+    child_id: str           = Field(..., description="아동 식별자")
+    lesson_id: str          = Field(..., description="교재 세션 식별자")
+    feedback: Optional[str] = Field(None, description="이해도 평가 기반 피드백")
+    error: Optional[str]    = Field(None, description="피드백 생성 실패 시 오류 메시지")
+
+class BulkFeedbackResponse(BaseModel):
+    results: List[BulkFeedbackItem] = Field(..., description="제출 순서대로의 피드백 결과")
+
 class OverallFeedbackResponse(BaseModel):
     feedback: str = Field(..., description="학습 이력 기반 종합 피드백")
 
@@ -32,21 +44,28 @@ class FeedbackHistoryItem(BaseModel):
     feedback: str
 
 class OverallFeedbackRequest(BaseModel):
+    child_id: Optional[str] = None  # 종합 피드백 캐시 키 (없으면 이름+나이)
     name: str
     age: int
     history: List[FeedbackHistoryItem]
 
 # LangGraph 워크플로우용 통합 상태
+def merge_node_timings(left: Optional[Dict[str, float]], right: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """병렬 브랜치가 각자 기록한 노드별 소요 시간을 합친다 (LangGraph reducer)"""
+    return {**(left or {}), **(right or {})}
+
 @dataclass
 class EducationWorkflowState:
     # 입력 데이터
     child_profile: Optional[ChildProfileInput] = None
     assessment_input: Optional[AssessmentInput] = None
+    assessment_inputs: Optional[List[AssessmentInput]] = None
     
     # 워크플로우 상태
     curriculum: Optional[str] = None
     embedding: Optional[List[float]] = None
     related_docs: Optional[List[Any]] = None
+    context_tokens: Optional[Dict[str, int]] = None  # 컨텍스트 패킹 전후/최종 프롬프트 토큰 수
     lesson: Optional[str] = None
     materials: Optional[List[str]] = None
     lesson_id: Optional[str] = None
@@ -57,5 +76,9 @@ class EducationWorkflowState:
     # 결과
     learning_response: Optional[LearningResponse] = None
     feedback_response: Optional[FeedbackResponse] = None
+    bulk_feedback_response: Optional[BulkFeedbackResponse] = None
     overall_feedback_response: Optional[OverallFeedbackResponse] = None
     history: Optional[List[Dict[str, str]]] = None
+
+    # 노드별 소요 시간(초). 병렬 노드가 동시에 기록하므로 reducer로 합친다
+    node_timings: Annotated[Dict[str, float], merge_node_timings] = field(default_factory=dict)
@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+class AssessmentIndex:
+    """
+    학생별 최신 평가 문서 id를 바로 찾기 위한 작은 보조 인덱스 (SQLite).
+
+    - assessment_counters: 학생별 단조 증가 시퀀스와 타임스탬프 발급
+    - assessment_latest:   학생 -> 가장 최근 평가 id (O(1) 조회)
+    - assessment_recent:   학생별 최근 N개 평가 (평가 id당 한 행, 다시 제출하면 seq만 갱신)
+    """
+
+    def __init__(self, path: str, recent_n: int = 10):
+        self.recent_n = recent_n
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS assessment_counters (
+                student_id TEXT PRIMARY KEY,
+                last_seq INTEGER,
+                last_ts INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS assessment_latest (
+                student_id TEXT PRIMARY KEY,
+                assessment_id TEXT,
+                seq INTEGER,
+                ts INTEGER
+            );
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS assessment_recent (
+                student_id TEXT,
+                assessment_id TEXT,
+                seq INTEGER,
+                ts INTEGER,
+                PRIMARY KEY (student_id, assessment_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_assessment_recent_seq ON assessment_recent(student_id, seq)")
+        self._conn.commit()
+
+    def allocate(self, student_id: str) -> Tuple[int, int]:
+        """다음 (seq, ts) 발급. ts는 나노초 단위이며 같은 학생 안에서 항상 증가한다"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_seq, last_ts FROM assessment_counters WHERE student_id=?", (student_id,)
+            ).fetchone()
+            last_seq, last_ts = row if row else (0, 0)
+            seq = last_seq + 1
+            ts = max(time.time_ns(), last_ts + 1)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO assessment_counters (student_id, last_seq, last_ts) VALUES (?, ?, ?)",
+                (student_id, seq, ts)
+            )
+            self._conn.commit()
+            return seq, ts
+
+    def record(self, entries: List[Tuple[str, str, int, int]]):
+        """저장이 끝난 평가들을 인덱스에 반영. entries: [(student_id, assessment_id, seq, ts)]"""
+        with self._lock:
+            for student_id, assessment_id, seq, ts in entries:
+                # 늦게 끝난 이전 쓰기가 최신 값을 덮어쓰지 않도록 seq가 더 클 때만 갱신
+                self._conn.execute("""
+                    INSERT INTO assessment_latest (student_id, assessment_id, seq, ts) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(student_id) DO UPDATE SET assessment_id=excluded.assessment_id, seq=excluded.seq, ts=excluded.ts
+                    WHERE excluded.seq > assessment_latest.seq
+                """, (student_id, assessment_id, seq, ts))
+                # 같은 평가(같은 교재 재제출)는 새 행을 만들지 않고 seq만 올린다
+                self._conn.execute("""
+                    INSERT INTO assessment_recent (student_id, assessment_id, seq, ts) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(student_id, assessment_id) DO UPDATE SET seq=excluded.seq, ts=excluded.ts
+                    WHERE excluded.seq > assessment_recent.seq
+                """, (student_id, assessment_id, seq, ts))
+            for student_id in {entry[0] for entry in entries}:
+                # 최근 recent_n개만 남긴다
+                self._conn.execute("""
+                    DELETE FROM assessment_recent WHERE student_id=? AND seq < (
+                        SELECT MIN(seq) FROM (
+                            SELECT seq FROM assessment_recent WHERE student_id=? ORDER BY seq DESC LIMIT ?
+                        )
+                    )
+                """, (student_id, student_id, self.recent_n))
+            self._conn.commit()
+
+    def latest(self, student_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT assessment_id FROM assessment_latest WHERE student_id=?", (student_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def recent(self, student_id: str, n: Optional[int] = None) -> List[str]:
+        """최근 평가 id 목록 (최신순, 최대 recent_n개)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT assessment_id FROM assessment_recent WHERE student_id=? ORDER BY seq DESC LIMIT ?",
+                (student_id, n or self.recent_n)
+            ).fetchall()
+        return [r[0] for r in rows]
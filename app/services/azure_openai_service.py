@@ -1,149 +1,505 @@
 import openai
+import httpx
+import asyncio
 from jinja2 import Environment, FileSystemLoader
 import os
-import uuid
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-# from langfuse import Langfuse, Trace  # langfuse 관련 import 제거
-
-# langfuse = Langfuse(
-#     public_key="pk-lf-0aac3129-100a-4e8f-bac7-7d66539e16ae",
-#     secret_key="sk-lf-f12705b9-29ae-4533-a55d-e7831edb36ae",
-#     host="https://us.cloud.langfuse.com"  # 또는 클라우드 주소
-# )
+from typing import Optional
+from app.services.tokens import count_message_tokens, count_tokens
+from app.services import metrics
+from app.services.tracing import Tracer
 
 # Jinja2 템플릿 로더 설정
 template_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'prompts')
 env = Environment(loader=FileSystemLoader(template_dir))
 
+API_VERSION = "2024-05-01-preview"
+
+ANSWER_SEPARATOR = "---정답---"
+
+# 커리큘럼/교재 프롬프트에는 아이 이름 대신 이 자리표시자를 넣고, 생성된 교재에서 실제 이름으로 바꾼다
+# (나이/관심사가 같은 아이들이 교재 캐시와 임베딩 캐시를 함께 쓰도록)
+NAME_PLACEHOLDER = "[이름]"
+# 모델이 자리표시자를 쓰지 않을 수도 있으므로, 교재 앞 NAME_CHECK_CHARS자(제목/첫 문단) 안에 자리표시자가 없으면
+# 이름을 넣은 인사말을 앞에 붙인다. 스트리밍도 이 길이만큼만 모아 보고 정하므로 두 경로의 결과가 같다.
+NAME_CHECK_CHARS = 100
+NAME_GREETING = "{name} 친구, 오늘도 함께 공부해요!\n\n"
+
+
+def _needs_greeting(text: str) -> bool:
+    return NAME_PLACEHOLDER not in text[:NAME_CHECK_CHARS]
+
+
+def personalize(text: str, name: Optional[str]) -> str:
+    """교재의 이름 자리표시자를 아이 이름으로 치환 (name이 없으면 그대로). 앞부분에 자리표시자가 없으면 인사말을 붙인다"""
+    if not name or not text:
+        return text
+    greeting = NAME_GREETING.format(name=name) if _needs_greeting(text) else ""
+    return greeting + text.replace(NAME_PLACEHOLDER, name)
+
+
+async def personalize_stream(tokens, name: Optional[str]):
+    """
+    토큰 스트림용 personalize.
+    인사말이 필요한지 알 때까지(자리표시자가 나오거나 NAME_CHECK_CHARS자가 찰 때까지) 앞부분을 모아 두고,
+    이후에는 자리표시자가 토큰 경계에 걸칠 수 있어 그 앞부분만큼만 붙잡아 둔다
+    """
+    if not name:
+        async for token in tokens:
+            yield token
+        return
+    head = ""  # 인사말 여부를 정하기 전까지 모으는 앞부분
+    decided = False
+    pending = ""
+    async for token in tokens:
+        if not decided:
+            head += token
+            if NAME_PLACEHOLDER not in head and len(head) < NAME_CHECK_CHARS:
+                continue
+            decided = True
+            if _needs_greeting(head):
+                yield NAME_GREETING.format(name=name)
+            token = head
+        pending = (pending + token).replace(NAME_PLACEHOLDER, name)
+        keep = 0
+        for size in range(min(len(NAME_PLACEHOLDER) - 1, len(pending)), 0, -1):
+            if NAME_PLACEHOLDER.startswith(pending[-size:]):
+                keep = size
+                break
+        if len(pending) > keep:
+            yield pending[:len(pending) - keep]
+            pending = pending[len(pending) - keep:]
+    if not decided:
+        # 앞부분이 다 차기 전에 끝난 짧은 교재
+        if head:
+            yield personalize(head, name)
+    elif pending:
+        yield pending
+
+
+def build_http_clients(max_connections: int = 100, max_keepalive_connections: int = 20,
+                       keepalive_expiry: float = 30.0, http2: bool = False, timeout: float = 120.0):
+    """
+    동기/비동기 OpenAI 클라이언트가 공유할 httpx 커넥션 풀 생성.
+    keep-alive로 연결을 재사용해 요청마다 TLS 핸드셰이크를 하지 않도록 한다.
+    """
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("[http] h2 패키지가 없어 HTTP/1.1로 동작합니다. (pip install 'httpx[http2]')")
+            http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeout = httpx.Timeout(timeout, connect=10.0)
+    return (
+        httpx.Client(limits=limits, http2=http2, timeout=timeout),
+        httpx.AsyncClient(limits=limits, http2=http2, timeout=timeout),
+    )
+
+
+def split_materials(content: str):
+    """생성된 교재 텍스트를 (지문+문제, 정답 목록)으로 분리"""
+    parts = content.split(ANSWER_SEPARATOR)
+    lesson = parts[0].strip()  # 지문과 문제
+    answers = parts[1].strip() if len(parts) > 1 else ""  # 정답
+
+    # materials에는 정답만 포함 (피드백용)
+    materials = [answers] if answers else []
+    return lesson, materials
 
 
 class AzureOpenAIService:
-    def __init__(self, endpoint, key, dep_curriculum, dep_embed):
+    def __init__(self, endpoint, key, dep_curriculum, dep_embed, embedding_cache=None, lesson_cache=None, embed_batch_size=16,
+                 http_pool: dict = None, scheduler=None, completion_token_estimate: int = 1000, tracer=None):
         dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
         load_dotenv(dotenv_path)
-        openai.api_type = "azure"
-        openai.api_base = endpoint
-        openai.api_version = "2024-05-01-preview"
-        openai.api_key = key
-        os.environ["AZURE_OPENAI_API_KEY"] = key
         self.dep_curriculum = dep_curriculum
         self.dep_embed = dep_embed
+        # 같은 텍스트는 다시 임베딩하지 않도록 (EmbeddingCache, 선택)
+        self.embedding_cache = embedding_cache
+        # 동일 프롬프트의 교재 재생성을 막는 캐시 (LessonCache, 선택)
+        self.lesson_cache = lesson_cache
+        # embeddings.create 한 번에 보낼 수 있는 입력 개수 (Azure 배포별 제한)
+        self.embed_batch_size = embed_batch_size
+        # 배포별 RPM/TPM 제한 + 우선순위 대기열 (LLMScheduler, 선택)
+        # 요청 전에 프롬프트 토큰 + 예상 completion 토큰을 예약하고, 응답 usage로 보정한다.
+        self.scheduler = scheduler
+        self.completion_token_estimate = completion_token_estimate
+        # LLM 호출마다 span 기록 (Tracer, 선택. 현재 trace가 샘플링된 경우에만 기록됨)
+        self.tracer = tracer or Tracer()
+        # openai 모듈 전역 설정 대신 서비스가 클라이언트를 직접 소유한다.
+        # 서비스는 프로세스당 하나(nodes.py)만 만들어 모든 노드가 같은 커넥션 풀을 공유한다.
+        self.http_client, self.async_http_client = build_http_clients(**(http_pool or {}))
+        self.client = openai.AzureOpenAI(
+            azure_endpoint=endpoint,
+            api_key=key,
+            api_version=API_VERSION,
+            http_client=self.http_client,
+        )
+        # 비동기 경로(FastAPI 엔드포인트/LangGraph 노드)용 클라이언트
+        # 이벤트 루프를 막지 않고 하나의 워커에서 여러 LLM 호출을 동시에 처리한다.
+        self.async_client = openai.AsyncAzureOpenAI(
+            azure_endpoint=endpoint,
+            api_key=key,
+            api_version=API_VERSION,
+            http_client=self.async_http_client,
+        )
+
+    async def aclose(self):
+        """커넥션 풀 정리 (앱 종료 시)"""
+        self.http_client.close()
+        await self.async_http_client.aclose()
+
+    # ---- 저수준 호출 (모든 completion/embedding 호출은 스케줄러를 거친다) ----
+
+    @contextmanager
+    def _llm_span(self, deployment, operation, inputs):
+        """LLM 호출 span (프롬프트/입력 크기 포함)"""
+        with self.tracer.span(f"llm.{operation}", deployment=deployment) as span:
+            if span.recording:
+                if operation.startswith("chat"):
+                    span.set(prompt_chars=sum(len(m["content"]) for m in inputs))
+                else:
+                    texts = inputs if isinstance(inputs, list) else [inputs]
+                    span.set(inputs=len(texts), input_chars=sum(len(t) for t in texts))
+            yield span
+
+    @staticmethod
+    def _record_output(span, resp, output_chars=None):
+        if not span.recording:
+            return
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=getattr(usage, "completion_tokens", None))
+        if output_chars is not None:
+            span.set(output_chars=output_chars)
+
+    def _settle(self, reservation, resp, deployment):
+        usage = getattr(resp, "usage", None)
+        metrics.record_usage(deployment, usage)
+        if reservation is not None:
+            self.scheduler.settle(reservation, usage.total_tokens if usage else None)
+
+    def _chat(self, messages) -> str:
+        with self._llm_span(self.dep_curriculum, "chat", messages) as span:
+            reservation = None
+            if self.scheduler is not None:
+                tokens = count_message_tokens(messages) + self.completion_token_estimate
+                reservation = self.scheduler.acquire_sync(self.dep_curriculum, tokens)
+            with metrics.observe_llm(self.dep_curriculum, "chat"):
+                resp = self.client.chat.completions.create(
+                    model=self.dep_curriculum,
+                    messages=messages
+                )
+            content = resp.choices[0].message.content.strip()
+            self._record_output(span, resp, len(content))
+        self._settle(reservation, resp, self.dep_curriculum)
+        return content
+
+    async def _achat(self, messages) -> str:
+        with self._llm_span(self.dep_curriculum, "chat", messages) as span:
+            reservation = None
+            if self.scheduler is not None:
+                tokens = count_message_tokens(messages) + self.completion_token_estimate
+                reservation = await self.scheduler.acquire(self.dep_curriculum, tokens)
+            with metrics.observe_llm(self.dep_curriculum, "chat"):
+                resp = await self.async_client.chat.completions.create(
+                    model=self.dep_curriculum,
+                    messages=messages
+                )
+            content = resp.choices[0].message.content.strip()
+            self._record_output(span, resp, len(content))
+        self._settle(reservation, resp, self.dep_curriculum)
+        return content
+
+    def _embed(self, inputs):
+        with self._llm_span(self.dep_embed, "embedding", inputs) as span:
+            reservation = None
+            if self.scheduler is not None:
+                texts = inputs if isinstance(inputs, list) else [inputs]
+                reservation = self.scheduler.acquire_sync(self.dep_embed, sum(count_tokens(t) for t in texts))
+            with metrics.observe_llm(self.dep_embed, "embedding"):
+                response = self.client.embeddings.create(
+                    input=inputs,
+                    model=self.dep_embed
+                )
+            self._record_output(span, response)
+        self._settle(reservation, response, self.dep_embed)
+        return response
+
+    async def _aembed(self, inputs):
+        with self._llm_span(self.dep_embed, "embedding", inputs) as span:
+            reservation = None
+            if self.scheduler is not None:
+                texts = inputs if isinstance(inputs, list) else [inputs]
+                reservation = await self.scheduler.acquire(self.dep_embed, sum(count_tokens(t) for t in texts))
+            with metrics.observe_llm(self.dep_embed, "embedding"):
+                response = await self.async_client.embeddings.create(
+                    input=inputs,
+                    model=self.dep_embed
+                )
+            self._record_output(span, response)
+        self._settle(reservation, response, self.dep_embed)
+        return response
 
     def get_initial_curriculum(self, profile):
-        """아동 프로필 기반 초기 학습 주제 생성"""
+        """아동 프로필 기반 초기 학습 주제 생성 (이름은 자리표시자, 관심사는 정렬해 같은 조합이면 같은 텍스트)"""
         tmpl = env.get_template("initial_curriculum.txt")
         return tmpl.render(
-            name=profile.name,
+            name=NAME_PLACEHOLDER,
             age=profile.age,
-            interests=profile.interests
+            interests=sorted({i.strip() for i in profile.interests if i.strip()})
         )
 
-    def get_embedding(self, text: str) -> list:
-        """텍스트를 임베딩 벡터로 변환"""
-        if openai.api_type == "azure":
-            response = openai.embeddings.create(
-                input=text,
-                model=self.dep_embed
-            )
-        else:
-            response = openai.embeddings.create(
-                input=text,
-                model="text-embedding-ada-002"
-            )
-        embedding = response.data[0].embedding
-        return embedding
+    # ---- 프롬프트 구성 ----
 
-    def generate_materials(self, curriculum_text: str, docs: list):
-        """커리큘럼 및 유사 자료를 바탕으로 교재 및 평가 문제 생성"""
+    def _materials_messages(self, curriculum_text, docs):
         tmpl = env.get_template("materials.txt")
         prompt = tmpl.render(curriculum=curriculum_text, docs=docs)
-        resp = openai.chat.completions.create(
-            model=self.dep_curriculum,
-            messages=[
-                {"role": "system", "content": "교재 생성 AI"},
-                {"role": "user",   "content": prompt}
-            ]
-        )
-        content = resp.choices[0].message.content.strip()
-        
-        # 문제와 정답을 분리
-        parts = content.split("---정답---")
-        lesson = parts[0].strip()  # 지문과 문제
-        answers = parts[1].strip() if len(parts) > 1 else ""  # 정답
-        
-        # materials에는 정답만 포함 (피드백용)
-        materials = [answers] if answers else []
-        return lesson, materials
-
-    def save_lesson(self, child_id, lesson_text, docs):
-        """학습 세션 ID 생성 및 저장"""
-        lesson_id = str(uuid.uuid4())
-        # TODO: 필요 시 저장 로직 추가
-        return lesson_id
+        return [
+            {"role": "system", "content": "교재 생성 AI"},
+            {"role": "user",   "content": prompt}
+        ]
 
-    def create_feedback(self, materials_text, responses_text):
+    def materials_prompt_tokens(self, curriculum_text, docs) -> int:
+        """교재 생성 프롬프트의 토큰 수 (로컬 토크나이저 기준)"""
+        return count_message_tokens(self._materials_messages(curriculum_text, docs))
+
+    def _feedback_messages(self, materials_text, responses_text):
         tmpl = env.get_template("feedback.txt")
         prompt = tmpl.render(materials_text=materials_text, responses_text=responses_text)
-        
-        # Langfuse trace 시작 (임시 주석 처리)
-        # trace = Trace(
-        #     name="create_feedback",
-        #     user_id="some_user_id",  # 필요시 아동 ID 등
-        #     langfuse=langfuse
-        # )
-        # span = trace.span(
-        #     name="openai-feedback-call",
-        #     input=prompt
-        # )
-        resp = openai.chat.completions.create(
-            model=self.dep_curriculum,
-            messages=[
-                {"role": "system", "content": "피드백 생성 AI"},
-                {"role": "user",   "content": prompt}
-            ]
-        )
-        output = resp.choices[0].message.content.strip()
-        print("[Langfuse Output]", repr(output))  # 값이 정확히 뭔지 확인
-        # span.output = str(output)  # 혹시 모르니 str로 변환
-        # span.end()
-        return output
+        return [
+            {"role": "system", "content": "피드백 생성 AI"},
+            {"role": "user",   "content": prompt}
+        ]
 
-    def create_overall_feedback(self, name, age, history):
-        """학생의 학습 이력과 피드백을 바탕으로 종합 피드백 생성"""
+    def _overall_feedback_messages(self, name, age, history, summary=None):
         tmpl = env.get_template("feedback_summary.txt")
-        prompt = tmpl.render(name=name, age=age, history=history)
-
-        # Langfuse trace 시작 (임시 주석 처리)
-        # trace = Trace(
-        #     name="create_overall_feedback",
-        #     user_id=name,  # 필요시 child_id 등으로 변경
-        #     langfuse=langfuse
-        # )
-        # span = trace.span(
-        #     name="openai-overall-feedback-call",
-        #     input=prompt
-        # )
-        resp = openai.chat.completions.create(
-            model=self.dep_curriculum,
-            messages=[
-                {"role": "system", "content": "종합 피드백 생성 AI"},
-                {"role": "user",   "content": prompt}
-            ]
-        )
-        output = resp.choices[0].message.content.strip()
-        # span.output = output
-        # span.end()
-        return output
+        prompt = tmpl.render(name=name, age=age, history=history, summary=summary)
+        return [
+            {"role": "system", "content": "종합 피드백 생성 AI"},
+            {"role": "user",   "content": prompt}
+        ]
+
+    def _history_summary_messages(self, history, previous_summary, max_chars):
+        tmpl = env.get_template("history_summary.txt")
+        prompt = tmpl.render(history=history, previous_summary=previous_summary, max_chars=max_chars)
+        return [
+            {"role": "system", "content": "학습 이력 요약 AI"},
+            {"role": "user",   "content": prompt}
+        ]
+
+    def _summary_merge_messages(self, summaries, max_chars):
+        tmpl = env.get_template("history_summary_merge.txt")
+        prompt = tmpl.render(summaries=summaries, max_chars=max_chars)
+        return [
+            {"role": "system", "content": "학습 이력 요약 AI"},
+            {"role": "user",   "content": prompt}
+        ]
 
-    def generate_next_material(self, child_id, lesson_id, last_responses=None):
-        """이전 학습 반영하여 다음 교재 생성"""
+    def _next_material_messages(self, child_id, lesson_id, last_responses, previous_materials=None, profile=None):
         tmpl = env.get_template("next_material.txt")
-        prompt = tmpl.render(child_id=child_id, lesson_id=lesson_id, last_responses=last_responses)
-        resp = openai.chat.completions.create(
-            model=self.dep_curriculum,
-            messages=[
-                {"role": "system", "content": "다음 교재 생성 AI"},
-                {"role": "user",   "content": prompt}
-            ]
-        )
-        return resp.choices[0].message.content.strip() 
\ No newline at end of file
+        prompt = tmpl.render(child_id=child_id, lesson_id=lesson_id, last_responses=last_responses,
+                             previous_materials=previous_materials, profile=profile)
+        return [
+            {"role": "system", "content": "다음 교재 생성 AI"},
+            {"role": "user",   "content": prompt}
+        ]
+
+    # ---- 동기 API ----
+
+    def get_embedding(self, text: str) -> list:
+        """텍스트를 임베딩 벡터로 변환"""
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(text, self.dep_embed)
+            if cached is not None:
+                return cached
+        response = self._embed(text)
+        embedding = response.data[0].embedding
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(text, self.dep_embed, embedding)
+        return embedding
+
+    def _split_cached_embeddings(self, texts):
+        """캐시에 있는 임베딩은 채우고, 새로 계산해야 할 인덱스 목록을 반환"""
+        results = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            if self.embedding_cache is not None:
+                results[i] = self.embedding_cache.get(text, self.dep_embed)
+            if results[i] is None:
+                missing.append(i)
+        return results, missing
+
+    def _batches(self, indices):
+        for start in range(0, len(indices), self.embed_batch_size):
+            yield indices[start:start + self.embed_batch_size]
+
+    def _fill_embeddings(self, texts, results, batch, response):
+        for idx, item in zip(batch, sorted(response.data, key=lambda d: d.index)):
+            results[idx] = item.embedding
+            if self.embedding_cache is not None:
+                self.embedding_cache.put(texts[idx], self.dep_embed, item.embedding)
+
+    def get_embeddings(self, texts: list) -> list:
+        """여러 텍스트를 배치 단위 embeddings.create 호출로 한꺼번에 임베딩"""
+        results, missing = self._split_cached_embeddings(texts)
+        for batch in self._batches(missing):
+            response = self._embed([texts[i] for i in batch])
+            self._fill_embeddings(texts, results, batch, response)
+        return results
+
+    def generate_materials(self, curriculum_text: str, docs: list, name: Optional[str] = None):
+        """커리큘럼 및 유사 자료를 바탕으로 교재 및 평가 문제 생성 (name으로 이름 자리표시자 치환)"""
+        messages = self._materials_messages(curriculum_text, docs)
+        key = self._lesson_key(curriculum_text, docs)
+        content = self._cached_lesson(key)
+        if content is None:
+            content = self._chat(messages)
+            self._cache_lesson(key, content)
+        return split_materials(personalize(content, name))
+
+    @staticmethod
+    def _lesson_key(curriculum_text, docs) -> str:
+        """교재 캐시 키: 이름 없는 커리큘럼(나이, 관심사) + 검색된 자료 id"""
+        doc_ids = ",".join(sorted(str(getattr(d, "id", "")) for d in docs))
+        return f"{curriculum_text}\x00{doc_ids}"
+
+    def _cached_lesson(self, key):
+        if self.lesson_cache is None:
+            return None
+        return self.lesson_cache.get(key, self.dep_curriculum)
+
+    def _cache_lesson(self, key, content):
+        if self.lesson_cache is not None:
+            self.lesson_cache.put(key, self.dep_curriculum, content)
+
+    def create_feedback(self, materials_text, responses_text):
+        return self._chat(self._feedback_messages(materials_text, responses_text))
+
+    def create_overall_feedback(self, name, age, history, summary=None):
+        """학생의 학습 이력과 피드백을 바탕으로 종합 피드백 생성"""
+        return self._chat(self._overall_feedback_messages(name, age, history, summary))
+
+    def generate_next_material(self, child_id, lesson_id, last_responses=None, previous_materials=None, profile=None):
+        """이전 학습 반영하여 다음 교재 생성 (generate_materials와 같은 (교재, 정답 목록) 형태로 반환)"""
+        content = self._chat(self._next_material_messages(child_id, lesson_id, last_responses, previous_materials, profile))
+        return split_materials(content)
+
+    # ---- 비동기 API (이벤트 루프 비차단) ----
+
+    async def aget_embedding(self, text: str) -> list:
+        """get_embedding의 비동기 버전"""
+        if self.embedding_cache is not None:
+            cached = await self.embedding_cache.aget(text, self.dep_embed)
+            if cached is not None:
+                return cached
+        response = await self._aembed(text)
+        embedding = response.data[0].embedding
+        if self.embedding_cache is not None:
+            await self.embedding_cache.aput(text, self.dep_embed, embedding)
+        return embedding
+
+    async def aget_embeddings(self, texts: list) -> list:
+        """get_embeddings의 비동기 버전 (캐시 조회/저장은 스레드에서)"""
+        results, missing = await asyncio.to_thread(self._split_cached_embeddings, texts)
+        for batch in self._batches(missing):
+            response = await self._aembed([texts[i] for i in batch])
+            await asyncio.to_thread(self._fill_embeddings, texts, results, batch, response)
+        return results
+
+    async def agenerate_materials(self, curriculum_text: str, docs: list, name: Optional[str] = None,
+                                  use_cache: bool = True):
+        """generate_materials의 비동기 버전 (use_cache=False면 교재 캐시를 건너뛰고 항상 새로 생성)"""
+        messages = self._materials_messages(curriculum_text, docs)
+        key = self._lesson_key(curriculum_text, docs)
+        content = self._cached_lesson(key) if use_cache else None
+        if content is None:
+            content = await self._achat(messages)
+            if use_cache:
+                self._cache_lesson(key, content)
+        return split_materials(personalize(content, name))
+
+    async def acreate_feedback(self, materials_text, responses_text):
+        """create_feedback의 비동기 버전"""
+        return await self._achat(self._feedback_messages(materials_text, responses_text))
+
+    async def acreate_overall_feedback(self, name, age, history, summary=None):
+        """create_overall_feedback의 비동기 버전"""
+        return await self._achat(self._overall_feedback_messages(name, age, history, summary))
+
+    async def asummarize_history(self, history, previous_summary=None, max_chars=1500):
+        """학습 이력 일부를 (기존 요약이 있으면 합쳐서) 요약"""
+        return await self._achat(self._history_summary_messages(history, previous_summary, max_chars))
+
+    async def amerge_summaries(self, summaries, max_chars=1500):
+        """기간별 요약 여러 개를 하나로 합침"""
+        return await self._achat(self._summary_merge_messages(summaries, max_chars))
+
+    async def agenerate_next_material(self, child_id, lesson_id, last_responses=None, previous_materials=None, profile=None):
+        """generate_next_material의 비동기 버전"""
+        content = await self._achat(self._next_material_messages(child_id, lesson_id, last_responses, previous_materials, profile))
+        return split_materials(content)
+
+    # ---- 스트리밍 API (SSE 엔드포인트용) ----
+
+    async def _astream_chat(self, messages):
+        if self.scheduler is not None:
+            # 스트리밍 응답에는 usage가 없으므로 추정치로만 예약한다
+            await self.scheduler.acquire(self.dep_curriculum, count_message_tokens(messages) + self.completion_token_estimate)
+        # 현재 API 버전은 stream_options(include_usage)를 지원하지 않아 토큰 수는 기록하지 않는다
+        with self._llm_span(self.dep_curriculum, "chat_stream", messages) as span, \
+                metrics.observe_llm(self.dep_curriculum, "chat_stream"):
+            start = time.perf_counter()
+            first = True
+            output_chars = 0
+            stream = await self.async_client.chat.completions.create(
+                model=self.dep_curriculum,
+                messages=messages,
+                stream=True
+            )
+            async for chunk in stream:
+                # Azure는 첫 청크에 choices 없이 필터 결과만 보내기도 한다
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        first_token = time.perf_counter() - start
+                        metrics.observe_first_token(self.dep_curriculum, first_token)
+                        span.set(first_token_ms=round(first_token * 1000, 3))
+                        first = False
+                    output_chars += len(chunk.choices[0].delta.content)
+                    span.set(output_chars=output_chars)
+                    yield chunk.choices[0].delta.content
+
+    async def astream_materials(self, curriculum_text: str, docs: list, name: Optional[str] = None):
+        """교재 생성 토큰 스트림 (정답 분리는 호출 측에서 처리)"""
+        key = self._lesson_key(curriculum_text, docs)
+        cached = self._cached_lesson(key)
+        if cached is not None:
+            yield personalize(cached, name)
+            return
+        chunks = []
+
+        async def tokens():
+            async for token in self._astream_chat(self._materials_messages(curriculum_text, docs)):
+                chunks.append(token)
+                yield token
+
+        async for token in personalize_stream(tokens(), name):
+            yield token
+        self._cache_lesson(key, "".join(chunks).strip())
+
+    async def astream_feedback(self, materials_text, responses_text):
+        """피드백 생성 토큰 스트림"""
+        async for token in self._astream_chat(self._feedback_messages(materials_text, responses_text)):
+            yield token
+
+    async def astream_overall_feedback(self, name, age, history, summary=None):
+        """종합 피드백 생성 토큰 스트림"""
+        async for token in self._astream_chat(self._overall_feedback_messages(name, age, history, summary)):
+            yield token
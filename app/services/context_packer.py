@@ -0,0 +1,88 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.services.tokens import count_tokens, truncate_to_tokens
+from app.services.vector_db_service import RetrievedDoc
+
+# 프롬프트에 넣을 메타데이터 필드. 정답 원문(materials_text), 학생/교재 id, seq/ts 등은
+# 교재 생성에 도움이 되지 않고 토큰만 차지하므로 뺀다.
+PROMPT_METADATA_FIELDS = ("type",)
+
+# 남은 예산이 이보다 작으면 문서를 잘라 넣지 않고 버린다
+MIN_DOC_TOKENS = 32
+
+
+@dataclass
+class PackedContext:
+    docs: List[RetrievedDoc] = field(default_factory=list)
+    raw_tokens: int = 0       # 패킹 전 materials.txt에 들어갔을 유사 자료 토큰 수
+    packed_tokens: int = 0    # 패킹 후 토큰 수
+    dropped: int = 0
+    truncated: int = 0
+
+
+def render_doc_line(doc: RetrievedDoc) -> str:
+    """materials.txt의 유사 자료 한 줄과 같은 형태"""
+    return f"- {doc.document} ({doc.metadata})"
+
+
+class ContextPacker:
+    """
+    검색된 유사 자료를 배포별 토큰 예산 안에 들어가도록 정리하는 단계.
+
+    1) 필요 없는 메타데이터 필드 제거
+    2) 거리(유사도) 순으로 정렬해 가까운 문서부터 채움
+    3) 문서 하나가 doc_max_tokens를 넘으면 자르고, 예산을 넘는 문서는 남은 만큼 자르거나 버림
+    """
+
+    def __init__(self, default_budget: int = 1200, budgets: Optional[Dict[str, int]] = None,
+                 doc_max_tokens: int = 300, metadata_fields=PROMPT_METADATA_FIELDS):
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+        self.doc_max_tokens = doc_max_tokens
+        self.metadata_fields = metadata_fields
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.raw_tokens_total = 0
+        self.packed_tokens_total = 0
+
+    def budget_for(self, deployment: str) -> int:
+        return self.budgets.get(deployment, self.default_budget)
+
+    def pack(self, docs: List[RetrievedDoc], deployment: str) -> PackedContext:
+        budget = self.budget_for(deployment)
+        result = PackedContext(raw_tokens=sum(count_tokens(render_doc_line(d)) for d in docs))
+        used = 0
+        for doc in sorted(docs, key=lambda d: d.distance):
+            metadata = {k: v for k, v in doc.metadata.items() if k in self.metadata_fields}
+            text = truncate_to_tokens(doc.document, self.doc_max_tokens)
+            truncated = text != doc.document
+            packed = RetrievedDoc(id=doc.id, document=text, metadata=metadata, distance=doc.distance)
+            cost = count_tokens(render_doc_line(packed))
+            if used + cost > budget:
+                overhead = cost - count_tokens(text)
+                remaining = budget - used - overhead
+                if remaining < MIN_DOC_TOKENS:
+                    result.dropped += 1
+                    continue
+                packed.document = truncate_to_tokens(text, remaining)
+                truncated = True
+                cost = count_tokens(render_doc_line(packed))
+            result.docs.append(packed)
+            result.truncated += int(truncated)
+            used += cost
+        result.packed_tokens = used
+        with self._lock:
+            self.requests += 1
+            self.raw_tokens_total += result.raw_tokens
+            self.packed_tokens_total += result.packed_tokens
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "raw_context_tokens": self.raw_tokens_total,
+            "packed_context_tokens": self.packed_tokens_total,
+            "saved_tokens": self.raw_tokens_total - self.packed_tokens_total,
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class EmbeddingCache:
+    """
+    텍스트 내용 기반(content-addressed) 임베딩 캐시.
+
+    - 1단계: 프로세스 내 LRU (OrderedDict)
+    - 2단계: SQLite 디스크 캐시 (float32 BLOB), 전체 크기 기준으로 오래된 항목부터 제거
+    키는 sha256(배포명 + 텍스트)이므로 같은 커리큘럼 텍스트는 다시 임베딩하지 않는다.
+    디스크 적중 시 last_access 갱신은 모아 두었다가 touch_batch개마다(또는 put 때) 한 번에 쓴다.
+    비동기 경로에서는 aget/aput을 써서 SQLite 접근이 이벤트 루프를 막지 않게 한다.
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_entries: int = 1024, max_disk_bytes: int = 256 * 1024 * 1024,
+                 touch_batch: int = 64):
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.touch_batch = touch_batch
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    deployment TEXT,
+                    vector BLOB,
+                    size INTEGER,
+                    last_access REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+            self._conn.commit()
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            self._disk_bytes = row[0]
+        else:
+            self._disk_bytes = 0
+
+    @staticmethod
+    def make_key(text: str, deployment: str) -> str:
+        return hashlib.sha256(f"{deployment}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return vector
+
+    def get(self, text: str, deployment: str) -> Optional[List[float]]:
+        key = self.make_key(text, deployment)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        return self._get_disk(key)
+
+    async def aget(self, text: str, deployment: str) -> Optional[List[float]]:
+        """메모리 적중은 바로 반환하고, 디스크 조회만 스레드로 넘긴다"""
+        key = self.make_key(text, deployment)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        if self._conn is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return await asyncio.to_thread(self._get_disk, key)
+
+    async def aput(self, text: str, deployment: str, embedding: List[float]):
+        await asyncio.to_thread(self.put, text, deployment, embedding)
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            if self._conn is not None:
+                row = self._conn.execute("SELECT vector FROM embeddings WHERE key=?", (key,)).fetchone()
+                if row:
+                    self._touched[key] = time.time()
+                    if len(self._touched) >= self.touch_batch:
+                        self._flush_touches()
+                        self._conn.commit()
+                    vector = array("f")
+                    vector.frombytes(row[0])
+                    vector = vector.tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, text: str, deployment: str, embedding: List[float]):
+        key = self.make_key(text, deployment)
+        with self._lock:
+            self._remember(key, list(embedding))
+            if self._conn is None:
+                return
+            blob = array("f", embedding).tobytes()
+            old = self._conn.execute("SELECT size FROM embeddings WHERE key=?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, deployment, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, deployment, blob, len(blob), time.time())
+            )
+            self._disk_bytes += len(blob) - (old[0] if old else 0)
+            self._touched.pop(key, None)
+            self._flush_touches()
+            self._evict_disk()
+            self._conn.commit()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_access=? WHERE key=?",
+                                   [(ts, key) for key, ts in self._touched.items()])
+            self._touched.clear()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """디스크 캐시가 한도를 넘으면 최근 사용이 오래된 항목부터 90%까지 제거"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        target = int(self.max_disk_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM embeddings WHERE key=?", (key,))
+            self._memory.pop(key, None)
+            self._disk_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
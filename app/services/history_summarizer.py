@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+class HistorySummarizer:
+    """
+    긴 학습 이력을 고정 크기 프롬프트로 압축하는 누적(rolling) 요약 엔진.
+
+    history는 최신순(streamlit get_history의 ORDER BY date DESC)으로 들어온다고 가정한다.
+    최근 recent_window개 항목은 그대로 프롬프트에 넣고, 그보다 오래된 항목은 아동별로 저장된 요약 하나로 대신한다.
+    - 저장된 요약이 있으면: 그 이후 새로 오래된 쪽으로 밀려난 항목만 기존 요약에 합친다.
+    - 저장된 요약이 없거나 이력이 달라졌으면(cold start): 청크 단위로 나눠 요약한 뒤(map) 다시 합친다(reduce).
+    """
+
+    def __init__(self, azure_service, path: str, recent_window: int = 5, chunk_size: int = 10,
+                 summary_max_chars: int = 1500, item_max_chars: int = 600):
+        self.azure_service = azure_service
+        self.recent_window = recent_window
+        self.chunk_size = chunk_size
+        self.summary_max_chars = summary_max_chars
+        self.item_max_chars = item_max_chars
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS history_summaries (
+                child_key TEXT PRIMARY KEY,
+                covered INTEGER,
+                prefix_hash TEXT,
+                summary TEXT,
+                updated_at REAL
+            )
+        """)
+        self._conn.commit()
+        self.incremental_merges = 0
+        self.cold_starts = 0
+
+    @staticmethod
+    def _prefix_hash(items: list) -> str:
+        body = json.dumps(items, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def _trim_item(self, item: dict) -> dict:
+        """피드백은 끝부분(총점, 종합 의견)이 중요하므로 뒤쪽을 남기고 자른다"""
+        feedback = item.get("feedback") or ""
+        if len(feedback) > self.item_max_chars:
+            feedback = "…" + feedback[-self.item_max_chars:]
+        return {**item, "feedback": feedback}
+
+    def _load(self, child_key: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT covered, prefix_hash, summary FROM history_summaries WHERE child_key=?", (child_key,)
+            ).fetchone()
+
+    def _save(self, child_key: str, covered: int, prefix_hash: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history_summaries (child_key, covered, prefix_hash, summary, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (child_key, covered, prefix_hash, summary, time.time())
+            )
+            self._conn.commit()
+
+    async def compact(self, child_key: str, history: List[dict]) -> Tuple[Optional[str], List[dict]]:
+        """(오래된 이력 요약, 그대로 보낼 최근 이력) 반환"""
+        recent = [self._trim_item(item) for item in history[:self.recent_window]]
+        if len(history) <= self.recent_window:
+            return None, recent
+        # 오래된 항목을 시간순으로 (누적 요약은 앞쪽부터 쌓인다)
+        older = list(reversed(history[self.recent_window:]))
+        trimmed = [self._trim_item(item) for item in older]
+
+        row = await asyncio.to_thread(self._load, child_key)
+        if row and row[0] <= len(older) and self._prefix_hash(older[:row[0]]) == row[1]:
+            covered, _, summary = row
+            if covered == len(older):
+                return summary, recent
+            summary = await self._merge(summary, trimmed[covered:])
+            self.incremental_merges += 1
+        else:
+            summary = await self._map_reduce(trimmed)
+            self.cold_starts += 1
+        await asyncio.to_thread(self._save, child_key, len(older), self._prefix_hash(older), summary)
+        return summary, recent
+
+    async def _merge(self, summary: str, items: list) -> str:
+        for start in range(0, len(items), self.chunk_size):
+            summary = await self.azure_service.asummarize_history(
+                items[start:start + self.chunk_size], previous_summary=summary, max_chars=self.summary_max_chars
+            )
+        return summary
+
+    async def _map_reduce(self, items: list) -> str:
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        summaries = await asyncio.gather(*[
+            self.azure_service.asummarize_history(chunk, max_chars=self.summary_max_chars) for chunk in chunks
+        ])
+        # 요약이 하나로 모일 때까지 chunk_size개씩 계층적으로 합친다
+        while len(summaries) > 1:
+            groups = [summaries[i:i + self.chunk_size] for i in range(0, len(summaries), self.chunk_size)]
+            summaries = await asyncio.gather(*[
+                self._merge_group(group) for group in groups
+            ])
+        return summaries[0]
+
+    async def _merge_group(self, group: list) -> str:
+        if len(group) == 1:
+            return group[0]
+        return await self.azure_service.amerge_summaries(group, max_chars=self.summary_max_chars)
+
+    def stats(self) -> dict:
+        return {"incremental_merges": self.incremental_merges, "cold_starts": self.cold_starts}
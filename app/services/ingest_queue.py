@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import openai
+
+from app.services.llm_scheduler import set_priority, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error: Exception) -> bool:
+    """백엔드 쪽 장애(연결 실패/시간 초과, 429, 5xx). 특정 항목 탓이 아니므로 배치를 나눠 봐야 소용없다"""
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, openai.APIConnectionError,
+                              openai.RateLimitError, openai.InternalServerError))
+
+
+class IngestQueue:
+    """
+    평가 응답 벡터 색인용 write-behind 큐 (SQLite에 영속화).
+
+    enqueue()는 응답을 로컬 SQLite에 기록만 하고 바로 반환한다.
+    백그라운드 워커가 대기 중인 항목을 batch_size개씩 꺼내 배치 임베딩 후
+    vector_service.add_assessments로 한 번에 upsert 한다.
+    - seq/ts는 enqueue 시점에 발급해 payload에 싣는다. 재시도로 늦게 색인된 예전 제출이 최신 평가가 되지 않는다.
+    - 실패한 배치는 반씩 나눠 다시 시도해 실패 항목만 골라내고, 그 항목은 지수 백오프로 재시도한다.
+      백엔드 장애(is_transient)이거나 나눈 양쪽이 모두 실패하면 더 나누지 않고 배치 전체를 백오프한다.
+      max_attempts를 넘긴 항목은 dead로 남긴다.
+    - 프로세스가 죽어도 남은 항목은 다음 기동 때 이어서 처리된다.
+    - flush()는 호출 시점까지 들어온 항목이 모두 반영될 때까지 기다린다 (테스트/정합성 확인용).
+    """
+
+    def __init__(self, vector_service, azure_service, path: str, batch_size: int = 32,
+                 poll_interval: float = 1.0, max_attempts: int = 8,
+                 backoff_base: float = 1.0, backoff_max: float = 300.0):
+        self.vector_service = vector_service
+        self.azure_service = azure_service
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                enqueued_at REAL,
+                next_attempt_at REAL,
+                last_error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_pending ON ingest_queue(status, next_attempt_at)")
+        self._conn.commit()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    # ---- 생산자 ----
+
+    def enqueue(self, item: dict) -> int:
+        """item: {student_id, lesson_id, responses}. 큐 항목 id 반환"""
+        if "seq" not in item:
+            seq, ts = self.vector_service.assessment_index.allocate(item["student_id"])
+            item = {**item, "seq": seq, "ts": ts}
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO ingest_queue (payload, enqueued_at, next_attempt_at) VALUES (?, ?, ?)",
+                (json.dumps(item, ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+            item_id = cur.lastrowid
+        if self._wakeup is not None:
+            # aenqueue는 스레드에서 호출되므로 asyncio.Event는 루프 쪽에서 깨운다
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return item_id
+
+    async def aenqueue(self, item: dict) -> int:
+        return await asyncio.to_thread(self.enqueue, item)
+
+    # ---- 워커 ----
+
+    def start(self):
+        """실행 중인 이벤트 루프에서 워커 시작 (앱 startup 훅에서 호출)"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+    def _claim(self) -> list:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, payload, attempts, enqueued_at FROM ingest_queue "
+                "WHERE status='pending' AND next_attempt_at<=? ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+
+    def _complete(self, ids: List[int]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM ingest_queue WHERE id=?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def _fail(self, rows: list, error: str):
+        now = time.time()
+        with self._lock:
+            for item_id, _, attempts, _ in rows:
+                attempts += 1
+                status = "dead" if attempts >= self.max_attempts else "pending"
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+                self._conn.execute(
+                    "UPDATE ingest_queue SET attempts=?, status=?, next_attempt_at=?, last_error=? WHERE id=?",
+                    (attempts, status, now + delay, error, item_id)
+                )
+            self._conn.commit()
+
+    async def _process_batch(self, rows: list):
+        items = [json.loads(payload) for _, payload, _, _ in rows]
+        texts = [" ".join(item["responses"]) for item in items]
+        embeddings = await self.azure_service.aget_embeddings(texts)
+        await asyncio.to_thread(self.vector_service.add_assessments, items, self.azure_service, embeddings)
+
+    async def _try_batch(self, rows: list) -> Optional[Exception]:
+        """배치 한 번 시도. 실패하면 예외를 돌려준다"""
+        try:
+            await self._process_batch(rows)
+            return None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            return e
+
+    async def _process_rows(self, rows: list, error: Optional[Exception] = None) -> list:
+        """
+        배치 처리. 실패하면 반으로 나눠 각각 다시 시도해 문제 항목만 골라낸다
+        (한 항목 때문에 같은 배치의 정상 항목까지 dead가 되지 않도록). 성공한 행 목록 반환
+        error: 이 행들로 이미 한 번 실패한 경우의 예외 (다시 시도하지 않고 바로 나눈다)
+        """
+        if error is None:
+            error = await self._try_batch(rows)
+            if error is None:
+                return rows
+        if len(rows) == 1 or is_transient(error):
+            logger.warning("ingest batch of %d failed, backing off: %s", len(rows), error)
+            await asyncio.to_thread(self._fail, rows, str(error))
+            return []
+        mid = len(rows) // 2
+        halves = [rows[:mid], rows[mid:]]
+        errors = [await self._try_batch(half) for half in halves]
+        if all(errors):
+            # 양쪽 다 실패하면 특정 항목 문제로 보기 어렵다. 더 나누지 않고 배치 전체를 백오프
+            logger.warning("ingest batch of %d failed in both halves, backing off: %s", len(rows), errors[0])
+            await asyncio.to_thread(self._fail, rows, str(errors[0]))
+            return []
+        done = []
+        for half, half_error in zip(halves, errors):
+            done += half if half_error is None else await self._process_rows(half, half_error)
+        return done
+
+    async def _drain_once(self) -> bool:
+        """재시도 시각이 된 항목 한 배치 처리. 처리할 항목이 없었으면 False"""
+        rows = await asyncio.to_thread(self._claim)
+        if not rows:
+            return False
+        done = await self._process_rows(rows)
+        if not done:
+            return True
+        await asyncio.to_thread(self._complete, [row[0] for row in done])
+        self.last_lag_seconds = time.time() - min(row[3] for row in done)
+        self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+        self.processed += len(done)
+        self.batches += 1
+        return True
+
+    async def _run(self):
+        # 색인은 사용자가 기다리지 않는 작업이므로 LLM 스케줄러에서 후순위로 처리
+        set_priority(BACKGROUND)
+        while True:
+            if await self._drain_once():
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---- 정합성/관측 ----
+
+    def _pending_through(self, last_id: int) -> tuple:
+        """last_id까지의 대기 항목 수, 그중 지금 바로 처리할 수 있는(백오프 중이 아닌) 항목 수"""
+        with self._lock:
+            pending, ready = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(next_attempt_at<=?), 0) FROM ingest_queue WHERE status='pending' AND id<=?",
+                (time.time(), last_id)
+            ).fetchone()
+        return pending, ready
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        지금까지 enqueue된 항목이 모두 색인(또는 dead 처리)될 때까지 대기.
+        시간 초과이거나 남은 항목이 모두 백오프 대기 중이면 False
+        """
+        with self._lock:
+            last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM ingest_queue").fetchone()[0]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pending, ready = await asyncio.to_thread(self._pending_through, last_id)
+            if not pending:
+                return True
+            if not ready:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if self._task is None or self._task.done():
+                # 워커 없이 쓰는 경우(스크립트, 테스트)에는 직접 처리
+                if not await self._drain_once():
+                    await asyncio.sleep(0.05)
+                continue
+            self._wakeup.set()
+            await asyncio.sleep(0.05)
+
+    def stats(self) -> dict:
+        with self._lock:
+            backlog, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(enqueued_at) FROM ingest_queue WHERE status='pending'"
+            ).fetchone()
+            dead = self._conn.execute("SELECT COUNT(*) FROM ingest_queue WHERE status='dead'").fetchone()[0]
+        return {
+            "backlog": backlog,
+            "dead": dead,
+            "oldest_pending_age_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failed_batches": self.failures,
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "worker_running": self._task is not None and not self._task.done(),
+        }
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+
+class JobStore:
+    """
+    오래 걸리는 생성 요청용 작업 기록 (SQLite).
+
+    POST는 작업을 기록하고 id만 바로 돌려주며, 실제 생성은 서버 백그라운드에서 끝까지 진행한다.
+    결과는 SQLite에 남으므로 클라이언트 연결이 끊겨도 다시 조회할 수 있고,
+    끝난 작업은 ttl_seconds가 지나면 지운다.
+    - 실행 중인 작업은 만든 프로세스(owner)가 lease_seconds 단위로 임대를 갱신한다.
+      임대가 끝난 작업(프로세스가 죽었거나 재시작됨)만 다른 프로세스가 넘겨받아 다시 실행하므로,
+      uvicorn 워커가 여러 개이거나 순차 재시작 중이어도 살아 있는 작업을 중복 실행하지 않는다.
+    - wait()는 작업이 끝날 때까지(최대 timeout초) 기다리는 long-poll 용도다.
+      같은 프로세스의 작업은 완료 즉시 깨우고, 다른 워커가 실행 중인 작업은 poll_interval마다 행을 다시 읽는다.
+    - a로 시작하는 메서드는 SQLite 접근을 스레드에서 실행한다 (이벤트 루프에서 호출용).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 3600, lease_seconds: float = 30, poll_interval: float = 0.5):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT,
+                status TEXT,
+                request TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                lease_until REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_until)")
+        self._conn.commit()
+        # job_id -> [완료 이벤트, 기다리는 요청 수] (같은 프로세스에서 기다리는 long-poll 요청을 깨운다)
+        self._events = {}
+        self._task: Optional[asyncio.Task] = None
+        self.created = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        self.resumed = 0
+
+    def _event(self, job_id: str) -> asyncio.Event:
+        entry = self._events.get(job_id)
+        if entry is None:
+            entry = self._events[job_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release(self, job_id: str, event: asyncio.Event):
+        """기다리던 요청이 하나 끝남. 기다리는 요청이 없으면 이벤트를 버린다"""
+        entry = self._events.get(job_id)
+        if entry is not None and entry[0] is event:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._events[job_id]
+
+    def create(self, kind: str, request: dict) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, request, created_at, owner, lease_until) "
+                "VALUES (?, ?, 'running', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(request, ensure_ascii=False), now, self.owner, now + self.lease_seconds)
+            )
+            self._conn.commit()
+        self.created += 1
+        return job_id
+
+    async def acreate(self, kind: str, request: dict) -> str:
+        return await asyncio.to_thread(self.create, kind, request)
+
+    def _finish(self, job_id: str, status: str, result: Optional[dict], error: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, finished_at=? WHERE job_id=?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    async def _afinish(self, job_id: str, status: str, result: Optional[dict], error: Optional[str]):
+        await asyncio.to_thread(self._finish, job_id, status, result, error)
+        # 이벤트는 루프 쪽에서 깨운다
+        entry = self._events.pop(job_id, None)
+        if entry is not None:
+            entry[0].set()
+
+    async def acomplete(self, job_id: str, result: dict):
+        await self._afinish(job_id, "done", result, None)
+        self.completed += 1
+
+    async def afail(self, job_id: str, error: str):
+        await self._afinish(job_id, "error", None, error)
+        self.failed += 1
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind, status, result, error, created_at, finished_at FROM jobs WHERE job_id=?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        kind, status, result, error, created_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "finished_at": finished_at,
+        }
+
+    async def aget(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """작업이 끝나거나 timeout이 지날 때까지 기다린 뒤 현재 상태 반환"""
+        if timeout <= 0:
+            return await self.aget(job_id)
+        deadline = time.monotonic() + timeout
+        # 이벤트를 먼저 만들고 상태를 확인해야 그 사이에 끝난 작업을 놓치지 않는다
+        event = self._event(job_id)
+        try:
+            while True:
+                job = await self.aget(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] != "running" or remaining <= 0:
+                    return job
+                # 다른 워커가 실행 중인 작업은 이 프로세스의 이벤트로 깨울 수 없으므로 주기적으로 다시 읽는다
+                try:
+                    await asyncio.wait_for(asyncio.shield(event.wait()), timeout=min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._release(job_id, event)
+
+    def heartbeat(self) -> int:
+        """이 프로세스가 실행 중인 작업의 임대 연장"""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET lease_until=? WHERE owner=? AND status='running'",
+                (time.time() + self.lease_seconds, self.owner)
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def claim_expired(self) -> list:
+        """임대가 끝난 작업을 이 프로세스로 넘겨받는다. [(job_id, kind, request), ...] (다시 실행해 결과를 채운다)"""
+        now = time.time()
+        with self._lock:
+            # 여러 워커가 동시에 넘겨받지 않도록 조회와 갱신을 한 쓰기 트랜잭션으로 묶는다
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT job_id, kind, request FROM jobs WHERE status='running' AND lease_until < ?", (now,)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET owner=?, lease_until=? WHERE job_id=?",
+                    [(self.owner, now + self.lease_seconds, row[0]) for row in rows]
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        self.resumed += len(rows)
+        return [(job_id, kind, json.loads(request)) for job_id, kind, request in rows]
+
+    # ---- 임대 갱신 워커 ----
+
+    def start(self, resume: Callable[[str, str, dict], None]):
+        """
+        실행 중인 이벤트 루프에서 워커 시작 (앱 startup 훅에서 호출).
+        lease_seconds/3마다 임대를 연장하고, 임대가 끝난 작업은 넘겨받아 resume(job_id, kind, request)로 다시 실행하며,
+        보관 기간이 지난 작업을 지운다.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(resume))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, resume):
+        while True:
+            await asyncio.to_thread(self.heartbeat)
+            for job_id, kind, request in await asyncio.to_thread(self.claim_expired):
+                resume(job_id, kind, request)
+            await asyncio.to_thread(self.sweep)
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    def sweep(self) -> int:
+        """끝난 지 ttl_seconds가 지난 작업 삭제"""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                                     (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+        self.expired += cur.rowcount
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status='running'").fetchone()[0]
+        return {
+            "created": self.created,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired,
+            "resumed": self.resumed,
+            "running": running,
+        }
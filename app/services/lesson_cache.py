@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class LessonCache:
+    """
+    생성된 교재(generate_materials 응답) 캐시.
+
+    키는 sha256(배포명 + 이름을 뺀 커리큘럼과 검색 자료 id)이며 항목마다 TTL이 적용된다.
+    variants > 0 이면 같은 키에 대해 서로 다른 교재를 최대 N개까지 모은 뒤 번갈아 제공하고,
+    N개를 한 바퀴 모두 제공하면 가장 오래된 것을 버려 다음 요청에서 새로 생성하게 한다.
+    (아이들이 같은 조합으로 요청해도 다양한 교재를 받도록)
+    """
+
+    def __init__(self, ttl_seconds: float = 21600, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, variants: int = 3):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.variants = variants
+        # key -> {"variants": [(content, created_at)], "served": int}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(prompt: str, deployment: str) -> str:
+        return hashlib.sha256(f"{deployment}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, deployment: str) -> Optional[str]:
+        key = self.make_key(prompt, deployment)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._drop_expired(key, entry)
+            wanted = max(self.variants, 1)
+            if len(entry["variants"]) < wanted:
+                # 변형 수가 부족하면 새로 생성하도록 miss 처리
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            content = entry["variants"][entry["served"] % wanted][0]
+            entry["served"] += 1
+            if self.variants and entry["served"] >= wanted:
+                # 한 바퀴 다 제공했으면 가장 오래된 변형을 은퇴시켜 다음엔 재생성
+                self._remove_variant(entry, 0)
+                entry["served"] = 0
+            self.hits += 1
+            return content
+
+    def put(self, prompt: str, deployment: str, content: str):
+        key = self.make_key(prompt, deployment)
+        with self._lock:
+            entry = self._entries.setdefault(key, {"variants": [], "served": 0})
+            self._entries.move_to_end(key)
+            if self.variants:
+                if any(c == content for c, _ in entry["variants"]):
+                    return
+                entry["variants"].append((content, time.time()))
+                while len(entry["variants"]) > self.variants:
+                    self._remove_variant(entry, 0)
+            else:
+                while entry["variants"]:
+                    self._remove_variant(entry, 0)
+                entry["variants"].append((content, time.time()))
+            self._bytes += len(content.encode("utf-8"))
+            self._evict()
+
+    def _remove_variant(self, entry, idx):
+        content, _ = entry["variants"].pop(idx)
+        self._bytes -= len(content.encode("utf-8"))
+
+    def _drop_expired(self, key, entry):
+        now = time.time()
+        fresh = [v for v in entry["variants"] if now - v[1] < self.ttl_seconds]
+        if len(fresh) != len(entry["variants"]):
+            self.expired += len(entry["variants"]) - len(fresh)
+            self._bytes -= sum(len(c.encode("utf-8")) for c, t in entry["variants"] if now - t >= self.ttl_seconds)
+            entry["variants"] = fresh
+            entry["served"] = 0
+        if not fresh:
+            del self._entries[key]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= sum(len(c.encode("utf-8")) for c, _ in entry["variants"])
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,200 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+def bucket_key(age: int, interests: list) -> str:
+    """(나이, 정렬된 관심사) 버킷 키"""
+    return f"{age}|{json.dumps(sorted(interests), ensure_ascii=False)}"
+
+
+class LessonPool:
+    """
+    인기 (나이, 관심사) 버킷별로 미리 만들어 둔 교재 풀 (SQLite).
+
+    - bucket_children: 버킷별 일 단위로 요청한 아동. 최근 요청한 서로 다른 아이가 많은 버킷을 골라 풀을 채운다
+                       (한 아이가 여러 번 요청해도 한 명으로 센다).
+    - lesson_pool:     버킷별 교재. 서로 다른 아이들에게 재사용하되 max_serves번 나간 교재는 퇴역시킨다.
+    - pool_served:     아동별로 이미 받은 풀 교재 (같은 아이에게 같은 교재를 다시 주지 않음)
+    - pool_builds:     일 단위 풀 교재 생성 수. 요청이 부르는 채우기는 하루 daily_build_budget개까지만 만든다.
+    풀 채우기(LLM 호출)는 app/workflow/lesson_pool_builder.py가 담당한다.
+    """
+
+    def __init__(self, path: str, per_bucket: int = 5, max_serves: int = 50, min_children: int = 10,
+                 window_days: int = 7, max_refill: int = 2, daily_build_budget: int = 100):
+        self.per_bucket = per_bucket
+        self.max_serves = max_serves
+        self.min_children = min_children
+        self.window_days = window_days
+        # 요청 한 번이 부르는 채우기에서 만들 최대 교재 수
+        self.max_refill = max_refill
+        self.daily_build_budget = daily_build_budget
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bucket_children (
+                bucket TEXT,
+                day TEXT,
+                child_id TEXT,
+                age INTEGER,
+                interests TEXT,
+                PRIMARY KEY (bucket, day, child_id)
+            );
+            CREATE TABLE IF NOT EXISTS pool_builds (
+                day TEXT PRIMARY KEY,
+                count INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS lesson_pool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bucket TEXT,
+                lesson_id TEXT,
+                lesson TEXT,
+                materials_text TEXT,
+                serves INTEGER DEFAULT 0,
+                created_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_lesson_pool_bucket ON lesson_pool(bucket);
+            CREATE TABLE IF NOT EXISTS pool_served (
+                child_id TEXT,
+                pool_id INTEGER,
+                served_at REAL,
+                PRIMARY KEY (child_id, pool_id)
+            );
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.exhausted = 0
+        self.added = 0
+        self.retired = 0
+        self.budget_denied = 0
+
+    # ---- 요청 통계 ----
+
+    def record_request(self, child_id: str, age: int, interests: list):
+        bucket = bucket_key(age, interests)
+        day = time.strftime("%Y-%m-%d")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO bucket_children (bucket, day, child_id, age, interests) VALUES (?, ?, ?, ?, ?)",
+                (bucket, day, child_id, age, json.dumps(sorted(interests), ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def _cutoff(self) -> str:
+        return time.strftime("%Y-%m-%d", time.localtime(time.time() - self.window_days * 86400))
+
+    def popular_buckets(self, top_n: int = 20, min_children: Optional[int] = None) -> List[Tuple[int, list, int]]:
+        """최근 window_days일 동안 요청한 서로 다른 아이 수 기준 상위 버킷 [(나이, 관심사, 아이 수), ...]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT age, interests, COUNT(DISTINCT child_id) AS children FROM bucket_children WHERE day >= ? "
+                "GROUP BY bucket HAVING children >= ? ORDER BY children DESC LIMIT ?",
+                (self._cutoff(), self.min_children if min_children is None else min_children, top_n)
+            ).fetchall()
+        return [(age, json.loads(interests), children) for age, interests, children in rows]
+
+    def is_popular(self, age: int, interests: list) -> bool:
+        with self._lock:
+            children = self._conn.execute(
+                "SELECT COUNT(DISTINCT child_id) FROM bucket_children WHERE bucket=? AND day >= ?",
+                (bucket_key(age, interests), self._cutoff())
+            ).fetchone()[0]
+        return children >= self.min_children
+
+    def reserve_builds(self, count: int) -> int:
+        """오늘 남은 생성 예산에서 최대 count개를 예약하고 예약된 개수를 반환"""
+        if count <= 0:
+            return 0
+        day = time.strftime("%Y-%m-%d")
+        with self._lock:
+            row = self._conn.execute("SELECT count FROM pool_builds WHERE day=?", (day,)).fetchone()
+            used = row[0] if row else 0
+            granted = max(0, min(count, self.daily_build_budget - used))
+            if granted < count:
+                self.budget_denied += count - granted
+            if granted:
+                self._conn.execute(
+                    "INSERT INTO pool_builds (day, count) VALUES (?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET count = count + excluded.count",
+                    (day, granted)
+                )
+                self._conn.execute("DELETE FROM pool_builds WHERE day < ?", (self._cutoff(),))
+                self._conn.commit()
+            return granted
+
+    # ---- 풀 ----
+
+    def add(self, age: int, interests: list, lesson_id: str, lesson: str, materials_text: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO lesson_pool (bucket, lesson_id, lesson, materials_text, created_at) VALUES (?, ?, ?, ?, ?)",
+                (bucket_key(age, interests), lesson_id, lesson, materials_text, time.time())
+            )
+            self._conn.commit()
+            self.added += 1
+
+    def available(self, age: int, interests: list) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM lesson_pool WHERE bucket=?", (bucket_key(age, interests),)
+            ).fetchone()[0]
+
+    def needs_refill(self, age: int, interests: list) -> int:
+        """인기 버킷이면 per_bucket까지 모자란 개수(한 번에 최대 max_refill개), 아니면 0"""
+        if not self.is_popular(age, interests):
+            return 0
+        return min(self.max_refill, max(0, self.per_bucket - self.available(age, interests)))
+
+    def take(self, child_id: str, age: int, interests: list) -> Optional[dict]:
+        """이 아이가 아직 받지 않은 풀 교재 하나를 꺼낸다. 없으면 None"""
+        bucket = bucket_key(age, interests)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, lesson_id, lesson, materials_text, serves FROM lesson_pool p WHERE bucket=? "
+                "AND NOT EXISTS (SELECT 1 FROM pool_served s WHERE s.child_id=? AND s.pool_id=p.id) "
+                "ORDER BY serves, id LIMIT 1",
+                (bucket, child_id)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                has_any = self._conn.execute("SELECT 1 FROM lesson_pool WHERE bucket=? LIMIT 1", (bucket,)).fetchone()
+                if has_any:
+                    # 풀은 있지만 이 아이가 모두 받아 봄
+                    self.exhausted += 1
+                return None
+            pool_id, lesson_id, lesson, materials_text, serves = row
+            self._conn.execute(
+                "INSERT OR IGNORE INTO pool_served (child_id, pool_id, served_at) VALUES (?, ?, ?)",
+                (child_id, pool_id, time.time())
+            )
+            if serves + 1 >= self.max_serves:
+                self._conn.execute("DELETE FROM lesson_pool WHERE id=?", (pool_id,))
+                self._conn.execute("DELETE FROM pool_served WHERE pool_id=?", (pool_id,))
+                self.retired += 1
+            else:
+                self._conn.execute("UPDATE lesson_pool SET serves = serves + 1 WHERE id=?", (pool_id,))
+            self._conn.commit()
+            self.hits += 1
+        return {"lesson_id": lesson_id, "lesson": lesson, "materials_text": materials_text}
+
+    def stats(self) -> dict:
+        with self._lock:
+            lessons, buckets = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT bucket) FROM lesson_pool"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "exhausted": self.exhausted,
+            "added": self.added,
+            "retired": self.retired,
+            "budget_denied": self.budget_denied,
+            "lessons": lessons,
+            "buckets": buckets,
+        }
@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+class LessonStore:
+    """
+    lesson_id로 교재와 정답(materials_text)을 찾는 서버 측 저장소.
+
+    - 1단계: 프로세스 내 LRU (방금 생성한 교재는 곧 평가 제출로 다시 조회됨)
+    - 2단계: SQLite (WAL)
+    클라이언트는 평가 제출 때 정답 원문 대신 lesson_id만 보내면 된다.
+    """
+
+    def __init__(self, path: str, memory_entries: int = 512):
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lessons (
+                lesson_id TEXT PRIMARY KEY,
+                child_id TEXT,
+                lesson TEXT,
+                materials_text TEXT,
+                created_at REAL
+            )
+        """)
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, lesson_id: str, entry: dict):
+        self._memory[lesson_id] = entry
+        self._memory.move_to_end(lesson_id)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def save(self, child_id: str, lesson: str, materials_text: str) -> str:
+        """교재 저장 후 새 lesson_id 반환"""
+        lesson_id = str(uuid.uuid4())
+        entry = {"lesson_id": lesson_id, "child_id": child_id, "lesson": lesson, "materials_text": materials_text}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO lessons (lesson_id, child_id, lesson, materials_text, created_at) VALUES (?, ?, ?, ?, ?)",
+                (lesson_id, child_id, lesson, materials_text, time.time())
+            )
+            self._conn.commit()
+            self._remember(lesson_id, entry)
+        return lesson_id
+
+    def get(self, lesson_id: str) -> Optional[dict]:
+        """{lesson_id, child_id, lesson, materials_text} 또는 None"""
+        with self._lock:
+            entry = self._memory.get(lesson_id)
+            if entry is not None:
+                self._memory.move_to_end(lesson_id)
+                self.memory_hits += 1
+                return entry
+            row = self._conn.execute(
+                "SELECT child_id, lesson, materials_text FROM lessons WHERE lesson_id=?", (lesson_id,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            entry = {"lesson_id": lesson_id, "child_id": row[0], "lesson": row[1], "materials_text": row[2]}
+            self._remember(lesson_id, entry)
+            self.disk_hits += 1
+            return entry
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,244 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# 우선순위 클래스 (숫자가 작을수록 먼저)
+INTERACTIVE = 0   # /init_profile, /submit_assessment 등 아이가 기다리는 요청
+BACKGROUND = 1    # /overall_feedback, 선행 생성 등 기다려도 되는 작업
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# 엔드포인트에서 설정하면 같은 요청 안의 모든 LLM 호출이 이 우선순위로 스케줄된다.
+current_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+def set_priority(priority: int):
+    """현재 요청(컨텍스트)의 LLM 호출 우선순위 지정"""
+    current_priority.set(priority)
+
+
+class TokenBucket:
+    """분당 rate를 초 단위로 채우는 토큰 버킷. rate가 0 이하면 제한 없음"""
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = max(rate_per_minute * burst_seconds / 60.0, 1.0) if rate_per_minute > 0 else 0.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_minute <= 0
+
+    def _refill(self, now: float):
+        if self.unlimited:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_minute / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """amount만큼 꺼낼 수 있을 때까지 남은 시간(초)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # 버킷보다 큰 요청은 버킷이 가득 찼을 때 보낸다 (영원히 못 보내는 일이 없도록)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.rate_per_minute
+
+    def take(self, amount: float) -> float:
+        """실제로 꺼낸 양 반환 (버킷보다 큰 요청은 capacity만큼)"""
+        if self.unlimited:
+            return amount
+        taken = min(amount, self.capacity)
+        self.tokens -= taken
+        return taken
+
+    def adjust(self, delta: float):
+        """예약량과 실제 사용량 차이 반영 (음수가 되면 다음 요청이 그만큼 기다린다)"""
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class Reservation:
+    def __init__(self, deployment: str, tokens: int, priority: int, waited: float, taken: Optional[float] = None):
+        self.deployment = deployment
+        self.tokens = tokens
+        # TPM 버킷에서 실제로 꺼낸 양 (settle은 이 값 기준으로 보정)
+        self.taken = tokens if taken is None else taken
+        self.priority = priority
+        self.waited = waited
+
+
+class _DeploymentState:
+    def __init__(self, rpm: float, tpm: float, burst_seconds: float):
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.waiters = []  # (priority, seq) 힙
+        self.wakers = {}   # ticket -> 대기자를 깨우는 함수
+
+
+class LLMScheduler:
+    """
+    배포(deployment)별 RPM/TPM 토큰 버킷과 우선순위 대기열.
+
+    모든 completion/embedding 호출은 보내기 전에 acquire()로 예약하고,
+    응답의 usage로 settle()하여 추정치와 실제 사용량의 차이를 보정한다.
+    같은 배포에서는 항상 우선순위가 높은(값이 작은) 요청부터, 같은 우선순위는 도착 순으로 내보낸다.
+    대기열 맨 앞 요청만 버킷이 찰 때까지 시간을 재며 기다리고, 나머지는 앞 요청이 나가거나
+    취소될 때 깨워진다 (폴링하지 않음).
+    """
+
+    def __init__(self, limits: Optional[Dict[str, dict]] = None, default_rpm: float = 0, default_tpm: float = 0,
+                 burst_seconds: float = 10.0):
+        self.limits = limits or {}
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.burst_seconds = burst_seconds
+        self._deployments: Dict[str, _DeploymentState] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._granted = {p: 0 for p in PRIORITY_NAMES}
+        self._wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+
+    def _state(self, deployment: str) -> _DeploymentState:
+        state = self._deployments.get(deployment)
+        if state is None:
+            limit = self.limits.get(deployment, {})
+            state = _DeploymentState(
+                rpm=limit.get("rpm", self.default_rpm),
+                tpm=limit.get("tpm", self.default_tpm),
+                burst_seconds=self.burst_seconds,
+            )
+            self._deployments[deployment] = state
+        return state
+
+    def _enqueue(self, deployment: str, priority: int, waker):
+        ticket = (priority, next(self._seq))
+        with self._lock:
+            state = self._state(deployment)
+            heapq.heappush(state.waiters, ticket)
+            state.wakers[ticket] = waker
+            if state.waiters[0] == ticket:
+                # 새 요청이 맨 앞을 차지했으면 이전 맨 앞 요청은 다음 깨움까지 기다리면 된다
+                self._wake_head(state)
+        return ticket
+
+    @staticmethod
+    def _wake_head(state: _DeploymentState):
+        if state.waiters:
+            state.wakers[state.waiters[0]]()
+
+    def _try_grant(self, deployment: str, ticket, tokens: int):
+        """
+        (대기 시간, 꺼낸 토큰 수). 예약에 성공하면 대기 시간 0,
+        맨 앞이 아니면 None (앞 요청이 나갈 때 깨워짐), 버킷이 모자라면 찰 때까지의 시간
+        """
+        with self._lock:
+            state = self._state(deployment)
+            if state.waiters[0] != ticket:
+                return None, 0  # 앞선(우선순위 높은) 요청이 먼저 나가야 함
+            now = time.monotonic()
+            wait = max(state.requests.wait_time(1, now), state.tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait, 0
+            state.requests.take(1)
+            taken = state.tokens.take(tokens)
+            heapq.heappop(state.waiters)
+            del state.wakers[ticket]
+            self._wake_head(state)
+            return 0.0, taken
+
+    def _cancel(self, deployment: str, ticket):
+        with self._lock:
+            state = self._state(deployment)
+            if ticket in state.waiters:
+                state.waiters.remove(ticket)
+                heapq.heapify(state.waiters)
+                del state.wakers[ticket]
+                self._wake_head(state)
+
+    def _record(self, priority: int, waited: float):
+        with self._lock:
+            self._granted[priority] += 1
+            self._wait_total[priority] += waited
+            self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+    async def acquire(self, deployment: str, tokens: int, priority: Optional[int] = None) -> Reservation:
+        priority = current_priority.get() if priority is None else priority
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        ticket = self._enqueue(deployment, priority, lambda: loop.call_soon_threadsafe(wakeup.set))
+        try:
+            while True:
+                wakeup.clear()
+                wait, taken = self._try_grant(deployment, ticket, tokens)
+                if wait == 0:
+                    break
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._cancel(deployment, ticket)
+            raise
+        waited = time.monotonic() - started
+        self._record(priority, waited)
+        return Reservation(deployment, tokens, priority, waited, taken)
+
+    def acquire_sync(self, deployment: str, tokens: int, priority: Optional[int] = None) -> Reservation:
+        priority = current_priority.get() if priority is None else priority
+        started = time.monotonic()
+        wakeup = threading.Event()
+        ticket = self._enqueue(deployment, priority, wakeup.set)
+        try:
+            while True:
+                wakeup.clear()
+                wait, taken = self._try_grant(deployment, ticket, tokens)
+                if wait == 0:
+                    break
+                wakeup.wait(timeout=wait)
+        except BaseException:
+            self._cancel(deployment, ticket)
+            raise
+        waited = time.monotonic() - started
+        self._record(priority, waited)
+        return Reservation(deployment, tokens, priority, waited, taken)
+
+    def settle(self, reservation: Reservation, actual_tokens: Optional[int]):
+        """응답 usage 기준으로 TPM 버킷 보정 (실제로 꺼낸 양과의 차이만큼)"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            state = self._state(reservation.deployment)
+            state.tokens.adjust(reservation.taken - actual_tokens)
+            # 토큰이 돌아왔으면 맨 앞 대기자가 더 일찍 나갈 수 있다
+            self._wake_head(state)
+
+    def stats(self) -> dict:
+        with self._lock:
+            queues = {}
+            for deployment, state in self._deployments.items():
+                depth = {name: 0 for name in PRIORITY_NAMES.values()}
+                for priority, _ in state.waiters:
+                    depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+                queues[deployment] = {
+                    "queue_depth": depth,
+                    "rpm_available": None if state.requests.unlimited else round(state.requests.tokens, 1),
+                    "tpm_available": None if state.tokens.unlimited else round(state.tokens.tokens, 1),
+                }
+            waits = {
+                PRIORITY_NAMES[p]: {
+                    "granted": self._granted[p],
+                    "avg_wait_seconds": self._wait_total[p] / self._granted[p] if self._granted[p] else 0.0,
+                    "max_wait_seconds": self._wait_max[p],
+                }
+                for p in PRIORITY_NAMES
+            }
+        return {"deployments": queues, "waits": waits}
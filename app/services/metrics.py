@@ -0,0 +1,127 @@
+"""
+Prometheus 지표.
+
+- 노드별 실행 시간/오류 (timed_node)
+- LLM 호출별 지연/오류, 스트리밍 첫 토큰 지연
+- 응답 usage 기준 프롬프트/완성/캐시 토큰 수
+- 캐시 적중률 등 각 구성 요소의 stats()는 스크랩 시점에만 읽는다 (요청 경로 부담 없음)
+prometheus_client가 없으면 모든 기록은 아무 일도 하지 않고 /metrics는 503을 돌려준다.
+"""
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # prometheus_client 미설치
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# LLM 호출은 수백 ms ~ 수십 초, 노드는 ms 단위도 있으므로 범위를 넓게 잡는다
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, value=1):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    registry = CollectorRegistry()
+    NODE_LATENCY = Histogram("edu_node_latency_seconds", "LangGraph 노드 실행 시간", ["node"],
+                             buckets=LATENCY_BUCKETS, registry=registry)
+    NODE_ERRORS = Counter("edu_node_errors_total", "LangGraph 노드 예외 수", ["node", "error"], registry=registry)
+    LLM_LATENCY = Histogram("edu_llm_request_latency_seconds", "Azure OpenAI 호출 시간 (스케줄러 대기 제외)",
+                            ["deployment", "operation"], buckets=LATENCY_BUCKETS, registry=registry)
+    LLM_FIRST_TOKEN = Histogram("edu_llm_stream_first_token_seconds", "스트리밍 첫 토큰까지 시간",
+                                ["deployment"], buckets=LATENCY_BUCKETS, registry=registry)
+    LLM_ERRORS = Counter("edu_llm_errors_total", "Azure OpenAI 호출 오류 수", ["deployment", "operation", "error"],
+                         registry=registry)
+    LLM_TOKENS = Counter("edu_llm_tokens_total", "응답 usage 기준 토큰 수 (prompt/completion/cached)",
+                         ["deployment", "kind"], registry=registry)
+else:
+    registry = None
+    NODE_LATENCY = NODE_ERRORS = LLM_LATENCY = LLM_FIRST_TOKEN = LLM_ERRORS = LLM_TOKENS = _NoopMetric()
+
+
+def observe_node(node: str, seconds: float):
+    NODE_LATENCY.labels(node).observe(seconds)
+
+
+def count_node_error(node: str, error: Exception):
+    NODE_ERRORS.labels(node, type(error).__name__).inc()
+
+
+@contextmanager
+def observe_llm(deployment: str, operation: str):
+    """with observe_llm(dep, "chat"): ... 블록의 시간과 예외를 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        LLM_ERRORS.labels(deployment, operation, type(e).__name__).inc()
+        raise
+    finally:
+        LLM_LATENCY.labels(deployment, operation).observe(time.perf_counter() - start)
+
+
+def observe_first_token(deployment: str, seconds: float):
+    LLM_FIRST_TOKEN.labels(deployment).observe(seconds)
+
+
+def record_usage(deployment: str, usage):
+    """resp.usage에서 프롬프트/완성/캐시된 프롬프트 토큰 수 기록"""
+    if usage is None:
+        return
+    LLM_TOKENS.labels(deployment, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(deployment, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    LLM_TOKENS.labels(deployment, "cached").inc(cached or 0)
+
+
+def _flatten(prefix: str, value, out: list):
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else str(key), inner, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out.append((prefix, float(value)))
+
+
+class StatsCollector:
+    """스크랩할 때 stats 함수(예: /stats 응답 생성)를 불러 숫자 값을 edu_stat{component, stat} 게이지로 내보낸다"""
+
+    def __init__(self, stats_fn):
+        self.stats_fn = stats_fn
+
+    def collect(self):
+        gauge = GaugeMetricFamily("edu_stat", "구성 요소 stats() 값 (캐시 적중률, 대기열 길이 등)", labels=["component", "stat"])
+        try:
+            stats = self.stats_fn()
+        except Exception as e:
+            print(f"[metrics] stats collection failed: {e}")
+            stats = {}
+        for component, values in stats.items():
+            flat = []
+            _flatten("", values, flat)
+            for stat, value in flat:
+                gauge.add_metric([component, stat], value)
+        yield gauge
+
+
+def register_stats(stats_fn):
+    if PROMETHEUS_AVAILABLE:
+        registry.register(StatsCollector(stats_fn))
+
+
+def render_latest() -> bytes:
+    if not PROMETHEUS_AVAILABLE:
+        return b""
+    return generate_latest(registry)
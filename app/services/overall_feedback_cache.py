@@ -0,0 +1,69 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class OverallFeedbackCache:
+    """
+    아동별 종합 피드백 캐시.
+
+    아동마다 마지막으로 생성한 종합 피드백과 그때의 입력 해시(name, age, history)를 하나씩 보관한다.
+    이력 항목이나 피드백이 새로 생기면 해시가 달라지므로 그때만 무효화된다.
+    stale-while-revalidate 모드에서는 해시가 달라도 이전 피드백을 바로 돌려주고,
+    호출 측이 백그라운드에서 새로 생성해 store()한다.
+    """
+
+    def __init__(self, stale_while_revalidate: bool = True, max_children: int = 10000):
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_children = max_children
+        # child_key -> {"digest", "feedback", "started_at"}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_digest(name: str, age: int, history: list) -> str:
+        body = json.dumps({"name": name, "age": age, "history": history}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def lookup(self, child_key: str, digest: str) -> Tuple[Optional[str], bool]:
+        """(피드백, 최신 여부) 반환. 캐시가 없거나 SWR이 꺼진 상태에서 해시가 다르면 (None, False)"""
+        with self._lock:
+            entry = self._entries.get(child_key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(child_key)
+            if entry["digest"] == digest:
+                self.hits += 1
+                return entry["feedback"], True
+            if self.stale_while_revalidate:
+                self.stale_hits += 1
+                return entry["feedback"], False
+            self.misses += 1
+            return None, False
+
+    def store(self, child_key: str, digest: str, feedback: str, started_at: float):
+        """started_at: 생성을 시작한 시각. 더 늦게 시작한 생성 결과를 오래된 결과로 덮어쓰지 않는다"""
+        with self._lock:
+            entry = self._entries.get(child_key)
+            if entry is not None and entry["started_at"] > started_at:
+                return
+            self._entries[child_key] = {"digest": digest, "feedback": feedback, "started_at": started_at}
+            self._entries.move_to_end(child_key)
+            while len(self._entries) > self.max_children:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "children": len(self._entries),
+        }
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def profile_key(profile) -> tuple:
+    """교재 내용에 영향을 주는 프로필 항목 (나이, 관심사 집합)"""
+    return (profile.age, tuple(sorted(profile.interests)))
+
+
+class PrefetchStore:
+    """
+    아동별 다음 교재 선생성(speculative prefetch) 슬롯.
+
+    평가 제출 뒤 백그라운드에서 만든 다음 교재를 아동당 하나씩 TTL과 함께 보관하고,
+    그 아동의 다음 교재 생성 요청에서 프로필(나이, 관심사)이 같으면 바로 꺼내 준다.
+    - 아동의 최근 프로필은 교재 생성 요청 때 remember()로 기억해 두고, 선생성 프롬프트에 쓴다.
+    - 같은 아동의 선생성이 겹치면 begin()이 발급한 세대 번호가 최신인 결과만 저장한다.
+    - 만료/교체/프로필 불일치/용량 초과로 버려진 슬롯은 각각 집계해 선생성 비용 대비 효과를 볼 수 있게 한다.
+    - 만료된 슬롯은 put() 때 정리한다. 슬롯은 저장 순서대로 있으므로 앞에서부터 만료된 것만 꺼낸다.
+    """
+
+    def __init__(self, ttl_seconds: float = 1800, max_children: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_children = max_children
+        # child_id -> {"response", "profile_key", "created_at"}
+        self._slots = OrderedDict()
+        self._profiles = OrderedDict()
+        self._generation = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.stored = 0
+        self.served = 0
+        self.misses = 0
+        self.expired = 0
+        self.replaced = 0
+        self.mismatched = 0
+        self.superseded = 0
+        self.evicted = 0
+        self.failed = 0
+
+    def remember(self, profile):
+        with self._lock:
+            self._profiles[profile.child_id] = profile
+            self._profiles.move_to_end(profile.child_id)
+            while len(self._profiles) > self.max_children:
+                self._profiles.popitem(last=False)
+
+    def profile(self, child_id: str):
+        with self._lock:
+            return self._profiles.get(child_id)
+
+    def begin(self, child_id: str) -> int:
+        """선생성 시작. put()에 넘길 세대 번호 반환"""
+        with self._lock:
+            generation = self._generation.get(child_id, 0) + 1
+            self._generation[child_id] = generation
+            self.started += 1
+            return generation
+
+    def put(self, child_id: str, generation: int, profile, response):
+        with self._lock:
+            if self._generation.get(child_id) != generation:
+                self.superseded += 1
+                return
+            self._generation.pop(child_id, None)
+            if child_id in self._slots:
+                self.replaced += 1
+            self._sweep_locked(time.time())
+            self._slots[child_id] = {"response": response, "profile_key": profile_key(profile), "created_at": time.time()}
+            self._slots.move_to_end(child_id)
+            self.stored += 1
+            while len(self._slots) > self.max_children:
+                self._slots.popitem(last=False)
+                self.evicted += 1
+
+    def fail(self, child_id: str, generation: int):
+        with self._lock:
+            if self._generation.get(child_id) == generation:
+                self._generation.pop(child_id, None)
+            self.failed += 1
+
+    def take(self, profile) -> Optional[object]:
+        """프로필이 같고 만료되지 않은 선생성 교재를 꺼낸다 (한 번 쓰면 슬롯을 비움)"""
+        with self._lock:
+            entry = self._slots.pop(profile.child_id, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry["created_at"] > self.ttl_seconds:
+                self.expired += 1
+                self.misses += 1
+                return None
+            if entry["profile_key"] != profile_key(profile):
+                self.mismatched += 1
+                self.misses += 1
+                return None
+            self.served += 1
+            return entry["response"]
+
+    def _sweep_locked(self, now: float) -> int:
+        expired = 0
+        while self._slots:
+            entry = next(iter(self._slots.values()))
+            if now - entry["created_at"] <= self.ttl_seconds:
+                break
+            self._slots.popitem(last=False)
+            expired += 1
+        self.expired += expired
+        return expired
+
+    def sweep(self) -> int:
+        """만료된 슬롯 정리. 정리한 개수 반환"""
+        with self._lock:
+            return self._sweep_locked(time.time())
+
+    def stats(self) -> dict:
+        lookups = self.served + self.misses
+        wasted = self.expired + self.replaced + self.mismatched + self.superseded + self.evicted
+        return {
+            "started": self.started,
+            "stored": self.stored,
+            "served": self.served,
+            "misses": self.misses,
+            "hit_ratio": self.served / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "replaced": self.replaced,
+            "mismatched": self.mismatched,
+            "superseded": self.superseded,
+            "evicted": self.evicted,
+            "failed": self.failed,
+            # 만든 뒤 쓰이지 못한 선생성 비율 (선생성 비용 조정용)
+            "waste_ratio": wasted / self.started if self.started else 0.0,
+            "slots": len(self._slots),
+        }
@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+import json
+
+
+def normalize_payload(value):
+    """문자열 앞뒤 공백 제거, 빈 문자열 항목 제거 등으로 같은 의미의 입력을 같은 키로 만든다"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {k: normalize_payload(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [normalize_payload(v) for v in value]
+        return [v for v in items if v != ""]
+    return value
+
+
+def make_key(kind: str, payload: dict) -> str:
+    body = json.dumps(normalize_payload(payload), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{kind}\x00{body}".encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    동일 입력으로 동시에 들어온 요청을 하나의 실행으로 합친다.
+
+    첫 요청(leader)만 실제로 실행하고, 실행 중에 같은 키로 들어온 요청은 그 결과를 함께 받는다.
+    실행은 별도 태스크로 돌고 shield로 감싸므로, 요청 하나가 끊겨도 다른 대기자의 실행은 취소되지 않는다.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 대기자가 모두 떠난 경우에도 "exception never retrieved" 경고 방지
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "executions": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / total if total else 0.0,
+            "inflight": len(self._inflight),
+        }
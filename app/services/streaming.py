@@ -0,0 +1,53 @@
+import json
+from app.services.azure_openai_service import ANSWER_SEPARATOR
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Server-Sent Events 한 건을 직렬화"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class AnswerSeparatorSplitter:
+    """
+    스트리밍 토큰에서 정답 구분자(---정답---)를 점진적으로 감지한다.
+
+    구분자가 여러 토큰에 걸쳐 올 수 있으므로, 구분자의 앞부분과 일치하는 꼬리는
+    다음 토큰이 올 때까지 내보내지 않는다. 구분자 이후 텍스트(정답)는 따로 모아 둔다.
+    """
+
+    def __init__(self, separator: str = ANSWER_SEPARATOR):
+        self.separator = separator
+        self.found = False
+        self._pending = ""
+        self._answers = []
+
+    def feed(self, text: str) -> str:
+        """토큰을 넣고, 지금 바로 내보내도 되는 지문/문제 텍스트를 반환"""
+        if self.found:
+            self._answers.append(text)
+            return ""
+        self._pending += text
+        idx = self._pending.find(self.separator)
+        if idx >= 0:
+            emit = self._pending[:idx]
+            self._answers.append(self._pending[idx + len(self.separator):])
+            self._pending = ""
+            self.found = True
+            return emit
+        keep = 0
+        for k in range(min(len(self.separator) - 1, len(self._pending)), 0, -1):
+            if self._pending.endswith(self.separator[:k]):
+                keep = k
+                break
+        emit = self._pending[:len(self._pending) - keep]
+        self._pending = self._pending[len(self._pending) - keep:]
+        return emit
+
+    def flush(self) -> str:
+        """스트림 종료 시 보류 중이던 텍스트 반환 (구분자가 끝내 오지 않은 경우)"""
+        emit, self._pending = self._pending, ""
+        return emit
+
+    @property
+    def answers(self) -> str:
+        return "".join(self._answers).strip()
@@ -0,0 +1,48 @@
+"""
+로컬 토큰 수 추정.
+
+tiktoken이 설치되어 있으면 실제 토크나이저(cl100k_base)를 쓰고,
+없으면 문자 종류 기반 근사치(한글 등 비ASCII 1자 ≈ 1토큰, ASCII 4자 ≈ 1토큰)를 쓴다.
+"""
+import math
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken 미설치 또는 인코딩 파일 다운로드 불가
+    _encoding = None
+
+# chat 메시지 하나당 역할/구분자에 쓰이는 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+
+def count_message_tokens(messages: list) -> int:
+    return sum(count_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages) + 2
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """텍스트를 max_tokens 토큰 이하로 자른다 (잘렸으면 끝에 … 표시)"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens - 1]) + "…"
+    # 근사 토크나이저는 문자 길이에 대해 단조 증가하므로 이진 탐색으로 자를 위치를 찾는다
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens - 1:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + "…"
@@ -0,0 +1,370 @@
+"""
+로컬 트레이싱 (외부 수집 서버 없이 JSONL/SQLite 파일로 내보냄).
+
+- 워크플로우 요청 하나 = trace 하나, 그 아래 노드별/LLM 호출별 span
+- 현재 span은 ContextVar로 전달되므로 LangGraph 병렬 노드, asyncio.to_thread 안에서도 부모가 이어진다
+- 요청이 끝난 뒤에도 도는 백그라운드 태스크는 detached_context()에서 만들어 요청 trace에 섞이지 않게 한다
+- 샘플링은 trace 시작 시 한 번 결정한다. 샘플링되지 않은 요청의 span()은 아무것도 기록하지 않는다
+- 끝난 trace는 메모리 버퍼에 넣기만 하고, 백그라운드 워커가 모아서 파일에 쓴다 (요청 경로에서 I/O 없음)
+
+조회는 etc/trace_query.py 참고.
+"""
+import asyncio
+import heapq
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import List, Optional
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "attrs", "status", "error")
+    recording = True
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attrs: dict):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.attrs = attrs
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, end: float) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """샘플링되지 않았거나 trace 밖에서 호출된 경우"""
+    recording = False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        # 병렬 노드/스레드에서 동시에 추가되지만 list.append는 원자적이다
+        self.spans: List[dict] = []
+        # trace가 끝난 뒤 도착한 span(늦게 끝난 스레드 등)은 더 붙이지 않는다
+        self.closed = False
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def detached_context():
+    """현재 span을 비운 컨텍스트 사본. 요청보다 오래 사는 백그라운드 태스크는 이 안에서 만든다"""
+    ctx = copy_context()
+    ctx.run(_current_span.set, None)
+    return ctx
+
+
+class Tracer:
+    """
+    trace()/span() 컨텍스트 매니저로 span을 만들고, 끝난 trace를 exporter에 넘긴다.
+    sample_rate: 0이면 끄기, 1이면 모든 요청 기록.
+    """
+
+    def __init__(self, exporter: Optional["BatchExporter"] = None, sample_rate: float = 0.1):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.started = 0
+        self.sampled = 0
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """워크플로우 요청 하나의 루트 span"""
+        self.started += 1
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            # 바깥 trace가 있더라도 이 요청은 기록하지 않는다
+            token = _current_span.set(None)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _reset(token)
+            return
+        self.sampled += 1
+        trace = Trace(name)
+        root = Span(trace, name, None, attrs)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.status = "error"
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _reset(token)
+            end = time.time()
+            trace.closed = True
+            self.exporter.submit({
+                "trace_id": trace.trace_id,
+                "span_id": root.span_id,
+                "name": name,
+                "start": root.start,
+                "duration_ms": round((end - root.start) * 1000, 3),
+                "status": root.status,
+                "error": root.error,
+                "attrs": root.attrs,
+                "spans": list(trace.spans),
+            })
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """현재 trace 아래 자식 span. trace 밖이거나 샘플링되지 않았으면 NOOP_SPAN"""
+        parent = _current_span.get()
+        if parent is None or parent.trace.closed:
+            yield NOOP_SPAN
+            return
+        span = Span(parent.trace, name, parent.span_id, attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _reset(token)
+            if not span.trace.closed:
+                span.trace.spans.append(span.to_dict(time.time()))
+
+    def stats(self) -> dict:
+        stats = {"started": self.started, "sampled": self.sampled, "sample_rate": self.sample_rate}
+        if self.exporter is not None:
+            stats.update(self.exporter.stats())
+        return stats
+
+
+def _reset(token):
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # 스트리밍 제너레이터가 다른 컨텍스트에서 닫힌 경우
+        pass
+
+
+# ---- 내보내기 ----
+
+class JsonlSink:
+    """trace 하나당 한 줄"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, traces: List[dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for trace in traces:
+                f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+
+    def slowest(self, limit: int = 10, name: Optional[str] = None, since: Optional[float] = None) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            traces = (json.loads(line) for line in f if line.strip())
+            traces = (t for t in traces if (name is None or t["name"] == name) and (since is None or t["start"] >= since))
+            return heapq.nlargest(limit, traces, key=lambda t: t["duration_ms"])
+
+    def close(self):
+        pass
+
+
+class SqliteSink:
+    """traces/spans 테이블 (느린 trace 조회용 duration 인덱스)"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS traces (
+                trace_id TEXT PRIMARY KEY,
+                span_id TEXT,
+                name TEXT,
+                start REAL,
+                duration_ms REAL,
+                status TEXT,
+                error TEXT,
+                attrs TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spans (
+                trace_id TEXT,
+                span_id TEXT,
+                parent_id TEXT,
+                name TEXT,
+                start REAL,
+                duration_ms REAL,
+                status TEXT,
+                error TEXT,
+                attrs TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_traces_duration ON traces(duration_ms)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_trace ON spans(trace_id)")
+        self._conn.commit()
+
+    def write(self, traces: List[dict]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(t["trace_id"], t["span_id"], t["name"], t["start"], t["duration_ms"], t["status"], t["error"],
+                  json.dumps(t["attrs"], ensure_ascii=False)) for t in traces]
+            )
+            self._conn.executemany(
+                "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(t["trace_id"], s["span_id"], s["parent_id"], s["name"], s["start"], s["duration_ms"],
+                  s["status"], s["error"], json.dumps(s["attrs"], ensure_ascii=False))
+                 for t in traces for s in t["spans"]]
+            )
+            self._conn.commit()
+
+    def slowest(self, limit: int = 10, name: Optional[str] = None, since: Optional[float] = None) -> List[dict]:
+        sql = "SELECT * FROM traces WHERE 1=1"
+        params = []
+        if name is not None:
+            sql += " AND name = ?"
+            params.append(name)
+        if since is not None:
+            sql += " AND start >= ?"
+            params.append(since)
+        sql += " ORDER BY duration_ms DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            spans = {}
+            for row in rows:
+                spans[row[0]] = [{
+                    "span_id": s[1], "parent_id": s[2], "name": s[3], "start": s[4],
+                    "duration_ms": s[5], "status": s[6], "error": s[7], "attrs": json.loads(s[8]),
+                } for s in self._conn.execute("SELECT * FROM spans WHERE trace_id = ? ORDER BY start", (row[0],))]
+        return [{
+            "trace_id": row[0], "span_id": row[1], "name": row[2], "start": row[3], "duration_ms": row[4],
+            "status": row[5], "error": row[6], "attrs": json.loads(row[7]), "spans": spans[row[0]],
+        } for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_sink(kind: str, path: str):
+    if kind == "sqlite":
+        return SqliteSink(path)
+    if kind == "jsonl":
+        return JsonlSink(path)
+    raise ValueError(f"알 수 없는 트레이스 저장 형식: {kind}")
+
+
+class BatchExporter:
+    """
+    submit()은 메모리 버퍼에 추가만 한다 (버퍼가 가득 차면 버리고 dropped 증가).
+    start()로 띄운 워커가 flush_interval마다, 또는 batch_size개가 모이면 스레드에서 sink.write로 쓴다.
+    """
+
+    def __init__(self, sink, batch_size: int = 64, flush_interval: float = 2.0, max_buffer: int = 10000):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def submit(self, trace: dict):
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append(trace)
+
+    def _take(self) -> List[dict]:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _write(self, batch: List[dict]):
+        try:
+            self.sink.write(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.failures += 1
+            self.dropped += len(batch)
+            print(f"[trace] export failed ({len(batch)} traces): {e}")
+
+    def flush(self):
+        """버퍼에 남은 trace를 모두 쓴다 (종료 시, 워커 없이 쓰는 스크립트용)"""
+        while self._buffer:
+            self._write(self._take())
+
+    def start(self):
+        """실행 중인 이벤트 루프에서 워커 시작 (앱 startup 훅에서 호출)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            waited = 0.0
+            while len(self._buffer) < self.batch_size and waited < self.flush_interval:
+                await asyncio.sleep(0.1)
+                waited += 0.1
+            while self._buffer:
+                await asyncio.to_thread(self._write, self._take())
+
+    def stats(self) -> dict:
+        return {"buffered": len(self._buffer), "exported": self.exported,
+                "dropped": self.dropped, "export_failures": self.failures}
+
+
+def slowest_traces(kind: str, path: str, limit: int = 10, name: Optional[str] = None,
+                   since: Optional[float] = None) -> List[dict]:
+    """저장된 trace 중 duration_ms가 큰 순서로 limit개"""
+    sink = create_sink(kind, path)
+    try:
+        return sink.slowest(limit, name, since)
+    finally:
+        sink.close()
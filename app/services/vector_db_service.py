@@ -1,58 +1,187 @@
-from chromadb import PersistentClient
+import logging
 import os
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 from app.services.azure_openai_service import AzureOpenAIService
-import openai
+from app.services.assessment_index import AssessmentIndex
+from app.services.vector_store import create_vector_store
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RetrievedDoc:
+    """검색 결과 한 건 (distance는 컬렉션 거리 공간 기준, 작을수록 유사)"""
+    id: str
+    document: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    distance: float = 0.0
+
+
+def mmr_select(query: list, candidates: list, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal Marginal Relevance: 질의와 유사하면서 이미 고른 문서와는 덜 겹치는 순서로 k개 선택.
+    candidates는 임베딩 목록, 반환값은 선택된 인덱스 목록.
+    """
+    if not candidates:
+        return []
+    docs = np.asarray(candidates, dtype=np.float32)
+    docs = docs / (np.linalg.norm(docs, axis=1, keepdims=True) + 1e-12)
+    q = np.asarray(query, dtype=np.float32)
+    q = q / (np.linalg.norm(q) + 1e-12)
+    relevance = docs @ q
+    pairwise = docs @ docs.T
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(candidates)):
+        redundancy = pairwise[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
 
 class VectorDBService:
-    def __init__(self, persist_directory):
-        self.client = PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(name="learning")
+    def __init__(self, persist_directory, recent_assessments: int = 10, backend: str = "chroma", hnsw: bool = False):
+        # 저장소 구현은 VectorStore 인터페이스 뒤에 숨긴다 (chroma | mmap)
+        self.store = create_vector_store(backend, persist_directory, hnsw=hnsw)
+        # 학생별 최신/최근 평가 id 보조 인덱스 (벡터 데이터와 같은 디렉터리에 보관)
+        self.assessment_index = AssessmentIndex(
+            os.path.join(persist_directory, "assessment_index.sqlite3"), recent_n=recent_assessments
+        )
         # self.dep_curriculum = os.getenv("AZURE_OPENAI_DEPLOY_CURRICULUM")  # Uncomment if needed
 
-    def add_assessment(self, student_id: str, lesson_id: str, responses: list, materials_text: str, azure_service):
+    def add_assessment(self, student_id: str, lesson_id: str, responses: list, azure_service, embedding: list = None):
         print(f"add_assessment called: student_id={student_id}, lesson_id={lesson_id}, responses={responses}")
-        embedding = azure_service.get_embedding(" ".join(responses))
-        metadata = {"student_id": student_id, "lesson_id": lesson_id, "type": "assessment", "materials_text": materials_text}
-        self.collection.add(
+        # 비동기 경로에서는 임베딩을 미리 계산해서 넘겨준다
+        if embedding is None:
+            embedding = azure_service.get_embedding(" ".join(responses))
+        seq, ts = self.assessment_index.allocate(student_id)
+        doc_id = f"{student_id}_{lesson_id}_resp"
+        # 교재 정답은 lesson_id로 LessonStore에서 찾으므로 메타데이터에 복사하지 않는다
+        metadata = {"student_id": student_id, "lesson_id": lesson_id, "type": "assessment", "seq": seq, "ts": ts}
+        # 같은 교재를 다시 제출하면 최신 응답으로 덮어쓴다 (add는 기존 id를 무시함)
+        self.store.upsert(
             documents=[" ".join(responses)],
             embeddings=[embedding],
-            ids=[f"{student_id}_{lesson_id}_resp"],
+            ids=[doc_id],
             metadatas=[metadata]
         )
+        self.assessment_index.record([(student_id, doc_id, seq, ts)])
         print("add_assessment finished")
 
-    def query_similar(self, embedding: list, top_k: int = 5) -> list:
-        """유사 자료  조회"""
-        res = self.collection.query(
-            query_embeddings=[embedding],
-            n_results=top_k
-        )
-        return list(zip(res['documents'], res['metadatas']))
-
-    def create_feedback(self, prompt: str):
-        resp = openai.chat.completions.create(
-            model=self.dep_curriculum,
-            messages=[
-                {"role": "system", "content": "다음 교재 생성 AI"},
-                {"role": "user",   "content": prompt}
-            ]
+    def add_assessments(self, items: list, azure_service, embeddings: list = None):
+        """
+        여러 평가 응답을 한 번에 저장.
+        items: [{student_id, lesson_id, responses, seq?, ts?}, ...]
+        seq/ts가 있으면 그대로 쓴다 (IngestQueue가 제출 시점에 발급). 없으면 지금 발급한다.
+        임베딩은 배치 호출 한 번(입력 제한 단위로 분할)으로 계산하고 저장소에는 upsert 한 번으로 기록한다.
+        """
+        if not items:
+            return
+        logger.debug("add_assessments: %d items", len(items))
+        texts = [" ".join(item["responses"]) for item in items]
+        if embeddings is None:
+            embeddings = azure_service.get_embeddings(texts)
+        # 같은 배치 안의 중복 id는 seq가 가장 큰 제출만 남긴다 (upsert는 배치 내 중복 id를 허용하지 않음)
+        batch = {}
+        for item, text, embedding in zip(items, texts, embeddings):
+            doc_id = f"{item['student_id']}_{item['lesson_id']}_resp"
+            if "seq" in item:
+                seq, ts = item["seq"], item["ts"]
+            else:
+                seq, ts = self.assessment_index.allocate(item["student_id"])
+            if doc_id in batch and batch[doc_id][2]["seq"] > seq:
+                continue
+            metadata = {"student_id": item["student_id"], "lesson_id": item["lesson_id"], "type": "assessment", "seq": seq, "ts": ts}
+            batch[doc_id] = (text, embedding, metadata)
+        # 재시도로 늦게 도착한 예전 제출이 이미 저장된 더 새 제출을 덮어쓰지 않도록 한다
+        stored = self.store.get(ids=list(batch.keys()))
+        for doc_id, meta in zip(stored["ids"], stored["metadatas"]):
+            if (meta or {}).get("seq", 0) > batch[doc_id][2]["seq"]:
+                del batch[doc_id]
+        if not batch:
+            return
+        self.store.upsert(
+            ids=list(batch.keys()),
+            documents=[v[0] for v in batch.values()],
+            embeddings=[v[1] for v in batch.values()],
+            metadatas=[v[2] for v in batch.values()]
         )
-        # This method should return the response from the OpenAI chat completion
-        return resp
+        self.assessment_index.record([
+            (meta["student_id"], doc_id, meta["seq"], meta["ts"]) for doc_id, (_, _, meta) in batch.items()
+        ])
+
+    def query_similar(self, embedding: list, top_k: int = 5, where: Optional[dict] = None,
+                      max_distance: Optional[float] = None, mmr: bool = False, fetch_k: Optional[int] = None,
+                      mmr_lambda: float = 0.5) -> List[RetrievedDoc]:
+        """
+        유사 자료 조회.
+        - where: 메타데이터 사전 필터 (예: {"type": "assessment"})
+        - max_distance: 이 거리보다 먼 문서는 버림
+        - mmr: 후보 fetch_k개(기본 top_k*4)를 가져와 MMR로 중복을 줄여 top_k개 선택
+        """
+        count = self.store.count()
+        if count == 0:
+            return []
+        n_results = min(fetch_k or (top_k * 4 if mmr else top_k), count)
+        res = self.store.query(embedding, n_results, where=where, include_embeddings=mmr)
+        hits = [
+            RetrievedDoc(id=doc_id, document=doc, metadata=meta or {}, distance=dist)
+            for doc_id, doc, meta, dist in zip(res["ids"], res["documents"], res["metadatas"], res["distances"])
+        ]
+        candidates = list(range(len(hits)))
+        if max_distance is not None:
+            candidates = [i for i in candidates if hits[i].distance <= max_distance]
+        if mmr and candidates:
+            embeddings = res["embeddings"]
+            picked = mmr_select(embedding, [embeddings[i] for i in candidates], top_k, mmr_lambda)
+            candidates = [candidates[i] for i in picked]
+        return [hits[i] for i in candidates[:top_k]]
 
     def get_latest_assessment(self, student_id: str):
-        """특정 학생의 가장 최근 평가 응답을 반환"""
+        """특정 학생의 가장 최근 평가 응답을 반환 (보조 인덱스로 O(1) 조회)"""
+        assessment_id = self.assessment_index.latest(student_id)
+        if assessment_id is not None:
+            results = self.store.get(ids=[assessment_id])
+            if results["ids"]:
+                return {
+                    "responses": results["documents"][0],
+                    "metadata": results["metadatas"][0]
+                }
+        return self._scan_latest_assessment(student_id)
+
+    def get_recent_assessments(self, student_id: str, n: int = None) -> list:
+        """특정 학생의 최근 평가 응답 목록 (최신순, 최대 recent_assessments개)"""
+        ids = self.assessment_index.recent(student_id, n)
+        if not ids:
+            return []
+        results = self.store.get(ids=ids)
+        by_id = {
+            doc_id: {"responses": doc, "metadata": meta}
+            for doc_id, doc, meta in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    def _scan_latest_assessment(self, student_id: str):
+        """인덱스가 없던 시절 데이터용: 전체를 읽고 seq/ts가 가장 큰 항목을 고른 뒤 인덱스에 기록"""
         where = {
             "$and": [
                 {"student_id": student_id},
                 {"type": "assessment"}
             ]
         }
-        results = self.collection.get(where=where)
+        results = self.store.get(where=where)
         if not results["ids"]:
             return None
-        latest_idx = -1
+        latest_idx = max(
+            range(len(results["ids"])),
+            key=lambda i: (results["metadatas"][i].get("seq", 0), results["metadatas"][i].get("ts", 0))
+        )
+        metadata = results["metadatas"][latest_idx]
+        self.assessment_index.record([
+            (student_id, results["ids"][latest_idx], metadata.get("seq", 0), metadata.get("ts", 0))
+        ])
         return {
             "responses": results["documents"][latest_idx],
-            "metadata": results["metadatas"][latest_idx]
-        }
\ No newline at end of file
+            "metadata": metadata
+        }
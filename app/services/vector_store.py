@@ -0,0 +1,321 @@
+"""
+벡터 저장소 백엔드.
+
+VectorDBService는 VectorStore 인터페이스만 사용하며, VECTOR_BACKEND 설정으로 구현을 고른다.
+- chroma: chromadb.PersistentClient 컬렉션 (기본값)
+- mmap:   메모리 매핑된 float32 행렬 + 추가 전용 메타데이터 로그를 쓰는 프로세스 내 저장소 (읽기 위주 경로용)
+
+query() 결과는 질의 하나에 대한 평탄한 dict: {"ids", "documents", "metadatas", "distances"[, "embeddings"]}
+거리는 두 백엔드 모두 제곱 L2 거리(Chroma 기본값)다.
+"""
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class VectorStore(ABC):
+    """벡터 저장소 인터페이스 (메서드를 다 구현하지 않은 백엔드는 생성 시점에 TypeError)"""
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: List[list], documents: List[str], metadatas: List[dict]):
+        ...
+
+    @abstractmethod
+    def query(self, embedding: list, n_results: int, where: Optional[dict] = None, include_embeddings: bool = False) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> dict:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, persist_directory: str, collection_name: str = "learning"):
+        from chromadb import PersistentClient
+        self.client = PersistentClient(path=persist_directory)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def query(self, embedding, n_results, where=None, include_embeddings=False):
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        res = self.collection.query(query_embeddings=[embedding], n_results=n_results, where=where, include=include)
+        # Chroma 결과는 질의별 중첩 리스트이므로 첫 번째 질의 결과만 꺼낸다
+        flat = {key: res[key][0] for key in ["ids"] + include}
+        return flat
+
+    def get(self, ids=None, where=None):
+        res = self.collection.get(ids=ids, where=where)
+        return {"ids": res["ids"], "documents": res["documents"], "metadatas": res["metadatas"]}
+
+    def count(self):
+        return self.collection.count()
+
+
+def matches_where(metadata: dict, where: Optional[dict]) -> bool:
+    """Chroma where 문법 중 동등 비교, $eq/$ne/$in, $and/$or 지원"""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            for op, operand in cond.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+class MmapVectorStore(VectorStore):
+    """
+    프로세스 내 메모리 매핑 벡터 저장소.
+
+    - vectors.f32:   [capacity x dim] float32 연속 행렬 (np.memmap). 가득 차면 두 배로 늘린다.
+    - records.jsonl: 행별 id / document / 메타데이터 추가 전용 로그 (같은 행은 뒤 기록이 우선).
+                     기록 수가 행 수의 두 배를 넘으면 현재 상태로 다시 써서 줄인다.
+    - header.json:   dim, count, capacity
+    메모리에는 컬럼형으로 들고 있고, 쓰기는 바뀐 행의 벡터/노름/로그만 추가하므로 문서 수와 무관하다.
+    top-k는 전체 행렬에 대한 NumPy 내적으로 계산하고, hnsw=True이고 hnswlib이 있으면 HNSW 인덱스를 쓴다.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, hnsw: bool = False):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._records_path = os.path.join(directory, "records.jsonl")
+        self._header_path = os.path.join(directory, "header.json")
+        self.dim = 0
+        self.capacity = 0
+        self._count = 0
+        self._matrix = None
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._columns: Dict[str, list] = {}
+        self._log_records = 0
+        if os.path.exists(self._header_path):
+            self._load()
+        self._row_of = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        # 행별 ||v||^2 (capacity 길이, 앞 count개만 유효)
+        self._sq_norms = np.zeros(self.capacity, dtype=np.float32)
+        if self._count:
+            rows = self._matrix[:self._count]
+            self._sq_norms[:self._count] = np.einsum("ij,ij->i", rows, rows)
+        self._hnsw = None
+        if hnsw:
+            self._hnsw = self._build_hnsw()
+
+    # ---- 영속화 ----
+
+    def _load(self):
+        with open(self._header_path, encoding="utf-8") as f:
+            header = json.load(f)
+        self.dim, self._count, self.capacity = header["dim"], header["count"], header["capacity"]
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._ids = [None] * self._count
+        self._documents = [None] * self._count
+        if os.path.exists(self._records_path):
+            with open(self._records_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    row = record["row"]
+                    self._log_records += 1
+                    # header 기록 전에 중단된 쓰기의 행은 버린다
+                    if row >= self._count:
+                        continue
+                    self._ids[row] = record["id"]
+                    self._documents[row] = record["document"]
+                    self._set_metadata(row, record["metadata"])
+
+    def _set_metadata(self, row: int, metadata: dict):
+        for column in self._columns.values():
+            column[row] = None
+        for key, value in (metadata or {}).items():
+            column = self._columns.setdefault(key, [None] * len(self._ids))
+            column[row] = value
+
+    def _write_json(self, path, data):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _record_line(self, row: int) -> str:
+        record = {"row": row, "id": self._ids[row], "document": self._documents[row], "metadata": self._metadata(row)}
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def _compact(self):
+        """로그를 현재 상태(행마다 한 줄)로 다시 쓴다"""
+        tmp = self._records_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row in range(self._count):
+                f.write(self._record_line(row))
+        os.replace(tmp, self._records_path)
+        self._log_records = self._count
+
+    def _persist(self, rows):
+        """바뀐 행만 로그에 추가. 벡터 → 로그 → header 순서로 써서 중간에 멈춰도 header 기준으로 일관된다"""
+        self._matrix.flush()
+        with open(self._records_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(self._record_line(row))
+        self._log_records += len(rows)
+        self._write_json(self._header_path, {"dim": self.dim, "count": self._count, "capacity": self.capacity})
+        if self._log_records > 2 * max(self._count, self.INITIAL_CAPACITY):
+            self._compact()
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+        new_capacity = max(self.INITIAL_CAPACITY, self.capacity * 2)
+        while new_capacity < needed:
+            new_capacity *= 2
+        tmp_path = self._vectors_path + ".tmp"
+        grown = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(new_capacity, self.dim))
+        if self._matrix is not None:
+            grown[:self._count] = self._matrix[:self._count]
+            del self._matrix
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._vectors_path)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+        norms = np.zeros(new_capacity, dtype=np.float32)
+        norms[:self._count] = self._sq_norms[:self._count]
+        self._sq_norms = norms
+        self.capacity = new_capacity
+
+    def _build_hnsw(self):
+        try:
+            import hnswlib
+        except ImportError:
+            print("[vector_store] hnswlib이 없어 NumPy 전수 검색으로 동작합니다. (pip install -r requirements-optional.txt)")
+            return None
+        index = hnswlib.Index(space="l2", dim=self.dim or 1)
+        index.init_index(max_elements=max(self.capacity, self.INITIAL_CAPACITY), ef_construction=200, M=16)
+        if self._count:
+            index.add_items(np.asarray(self._matrix[:self._count]), np.arange(self._count))
+        index.set_ef(64)
+        return index
+
+    @property
+    def hnsw_active(self) -> bool:
+        """HNSW 인덱스를 실제로 쓰는지 (hnsw=True여도 hnswlib이 없으면 False)"""
+        return self._hnsw is not None
+
+    # ---- VectorStore ----
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            if self.dim == 0:
+                self.dim = vectors.shape[1]
+                if self._hnsw is not None:
+                    self._hnsw = self._build_hnsw()
+            rows = []
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    row = self._count
+                    self._ensure_capacity(row + 1)
+                    self._row_of[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._documents.append(document)
+                    for column in self._columns.values():
+                        column.append(None)
+                    self._count += 1
+                else:
+                    self._documents[row] = document
+                self._set_metadata(row, metadata)
+                rows.append(row)
+            self._matrix[rows] = vectors
+            self._sq_norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+            if self._hnsw is not None:
+                if self._hnsw.get_max_elements() < self._count:
+                    self._hnsw.resize_index(self.capacity)
+                self._hnsw.add_items(vectors, np.asarray(rows))
+            self._persist(sorted(set(rows)))
+
+    def _metadata(self, row: int) -> dict:
+        return {key: column[row] for key, column in self._columns.items() if column[row] is not None}
+
+    def _rows_where(self, where):
+        return [row for row in range(self._count) if matches_where(self._metadata(row), where)]
+
+    def query(self, embedding, n_results, where=None, include_embeddings=False):
+        with self._lock:
+            result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            if include_embeddings:
+                result["embeddings"] = []
+            if self._count == 0:
+                return result
+            q = np.asarray(embedding, dtype=np.float32)
+            if self._hnsw is not None and not where:
+                labels, dists = self._hnsw.knn_query(q, k=min(n_results, self._count))
+                rows, distances = labels[0], dists[0]
+            else:
+                candidates = np.arange(self._count) if not where else np.asarray(self._rows_where(where), dtype=np.int64)
+                if len(candidates) == 0:
+                    return result
+                # ||a - q||^2 = ||a||^2 + ||q||^2 - 2 a·q
+                scores = self._sq_norms[candidates] + float(q @ q) - 2.0 * (self._matrix[candidates] @ q)
+                k = min(n_results, len(candidates))
+                top = np.argpartition(scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+                top = top[np.argsort(scores[top])]
+                rows, distances = candidates[top], scores[top]
+            for row, distance in zip(rows, distances):
+                row = int(row)
+                result["ids"].append(self._ids[row])
+                result["documents"].append(self._documents[row])
+                result["metadatas"].append(self._metadata(row))
+                result["distances"].append(float(distance))
+                if include_embeddings:
+                    result["embeddings"].append(np.asarray(self._matrix[row]).tolist())
+            return result
+
+    def get(self, ids=None, where=None):
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+                rows = [row for row in rows if matches_where(self._metadata(row), where)]
+            else:
+                rows = self._rows_where(where)
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._documents[row] for row in rows],
+                "metadatas": [self._metadata(row) for row in rows],
+            }
+
+    def count(self):
+        return self._count
+
+
+def create_vector_store(backend: str, persist_directory: str, hnsw: bool = False) -> VectorStore:
+    if backend == "chroma":
+        return ChromaVectorStore(persist_directory)
+    if backend == "mmap":
+        return MmapVectorStore(os.path.join(persist_directory, "mmap_store"), hnsw=hnsw)
+    raise ValueError(f"알 수 없는 벡터 저장소 백엔드입니다: {backend}")
@@ -2,9 +2,13 @@ from langgraph.graph import StateGraph, START, END
 from app.workflow.nodes import (
     init_profile_node,
     fetch_course_node,
+    pack_context_node,
     generate_materials_node,
     submit_assessment_node,
     create_feedback_node,
+    build_feedback_response_node,
+    submit_assessments_node,
+    create_feedbacks_node,
     create_overall_feedback_node
 )
 from app.models.schemas import EducationWorkflowState
@@ -16,12 +20,14 @@ def create_init_profile_graph() -> StateGraph:
     # 노드 추가
     graph.add_node("init_profile", init_profile_node)
     graph.add_node("fetch_course", fetch_course_node)
+    graph.add_node("pack_context", pack_context_node)
     graph.add_node("generate_materials", generate_materials_node)
     
     # 엣지 연결
     graph.add_edge(START, "init_profile")
     graph.add_edge("init_profile", "fetch_course")
-    graph.add_edge("fetch_course", "generate_materials")
+    graph.add_edge("fetch_course", "pack_context")
+    graph.add_edge("pack_context", "generate_materials")
     graph.add_edge("generate_materials", END)
     
     return graph.compile()
@@ -33,14 +39,27 @@ def create_assessment_graph() -> StateGraph:
     # 노드 추가
     graph.add_node("submit_assessment", submit_assessment_node)
     graph.add_node("create_feedback", create_feedback_node)
+    graph.add_node("build_feedback_response", build_feedback_response_node)
     
-    # 엣지 연결
+    # 엣지 연결: 저장과 피드백 생성은 서로 의존하지 않으므로 동시에 시작하고, 둘 다 끝나면 합류
     graph.add_edge(START, "submit_assessment")
-    graph.add_edge("submit_assessment", "create_feedback")
-    graph.add_edge("create_feedback", END)
+    graph.add_edge(START, "create_feedback")
+    graph.add_edge(["submit_assessment", "create_feedback"], "build_feedback_response")
+    graph.add_edge("build_feedback_response", END)
     
     return graph.compile()
 
+def create_bulk_assessment_graph() -> StateGraph:
+    """평가 일괄 제출 및 피드백 생성 워크플로우"""
+    graph = StateGraph(state_schema=EducationWorkflowState)
+    graph.add_node("submit_assessments", submit_assessments_node)
+    graph.add_node("create_feedbacks", create_feedbacks_node)
+    # 일괄 저장과 피드백 생성도 병렬로 실행
+    graph.add_edge(START, "submit_assessments")
+    graph.add_edge(START, "create_feedbacks")
+    graph.add_edge(["submit_assessments", "create_feedbacks"], END)
+    return graph.compile()
+
 def create_overall_feedback_graph() -> StateGraph:
     """학습 이력 기반 종합 피드백 워크플로우"""
     graph = StateGraph(state_schema=EducationWorkflowState)
@@ -0,0 +1,105 @@
+"""
+교재 풀 빌더.
+
+최근 요청 통계에서 인기 (나이, 관심사) 버킷을 골라 버킷마다 교재를 per_bucket개까지 미리 만들어 둔다.
+교재는 /init_profile과 같은 경로(커리큘럼 → 임베딩/유사 자료 조회 → 컨텍스트 패킹 → 생성)로 만들되,
+같은 버킷 안에서 서로 다른 교재가 나오도록 교재 캐시는 쓰지 않는다.
+
+    python -m app.workflow.lesson_pool_builder --top 20 --per-bucket 5
+"""
+import argparse
+import asyncio
+import logging
+
+from app.models.schemas import ChildProfileInput, EducationWorkflowState
+from app.services.azure_openai_service import NAME_PLACEHOLDER
+from app.services.lesson_pool import bucket_key
+from app.services.llm_scheduler import set_priority, BACKGROUND
+from app.workflow.nodes import (
+    azure_service,
+    lesson_pool,
+    lesson_store,
+    init_profile_node,
+    fetch_course_node,
+    pack_context_node,
+)
+
+logger = logging.getLogger(__name__)
+
+# 같은 버킷을 동시에 두 번 채우지 않도록 진행 중인 버킷 기록
+_refilling = set()
+
+
+async def build_lesson(age: int, interests: list) -> dict:
+    # 풀 교재는 특정 아이를 위한 것이 아니므로 이름 자리표시자를 그대로 남겨 두고 꺼낼 때 치환한다 (main._take_ready_lesson)
+    profile = ChildProfileInput(child_id=f"pool:{bucket_key(age, interests)}", name=NAME_PLACEHOLDER, age=age, interests=interests)
+    state = EducationWorkflowState(child_profile=profile)
+    state = await init_profile_node(state)
+    state = await fetch_course_node(state)
+    state = await pack_context_node(state)
+    lesson, materials = await azure_service.agenerate_materials(state.curriculum, state.related_docs or [], use_cache=False)
+    materials_text = "\n".join(materials)
+    lesson_id = await asyncio.to_thread(lesson_store.save, profile.child_id, lesson, materials_text)
+    return {"lesson_id": lesson_id, "lesson": lesson, "materials_text": materials_text}
+
+
+async def fill_bucket(age: int, interests: list, count: int, concurrency: int = 2) -> int:
+    """버킷에 교재 count개 추가. 실제로 추가한 개수 반환"""
+    bucket = bucket_key(age, interests)
+    if count <= 0 or bucket in _refilling:
+        return 0
+    _refilling.add(bucket)
+    # 풀 채우기는 사용자가 기다리지 않는 작업
+    set_priority(BACKGROUND)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            try:
+                item = await build_lesson(age, interests)
+            except Exception:
+                logger.exception("lesson pool build failed for %s", bucket)
+                return 0
+            await asyncio.to_thread(lesson_pool.add, age, interests, **item)
+            return 1
+
+    try:
+        added = sum(await asyncio.gather(*[one() for _ in range(count)]))
+    finally:
+        _refilling.discard(bucket)
+    logger.info("lesson pool %s: +%d", bucket, added)
+    return added
+
+
+async def refill(age: int, interests: list) -> int:
+    """인기 버킷인데 풀이 모자라면 채운다 (교재 요청 뒤 백그라운드에서 호출, 하루 생성 예산 안에서만)"""
+    need = await asyncio.to_thread(lesson_pool.needs_refill, age, interests)
+    if need <= 0 or bucket_key(age, interests) in _refilling:
+        return 0
+    granted = await asyncio.to_thread(lesson_pool.reserve_builds, need)
+    return await fill_bucket(age, interests, granted)
+
+
+async def build(top_n: int = 20, per_bucket: int = None, min_children: int = None, concurrency: int = 2) -> dict:
+    """인기 버킷 상위 top_n개를 per_bucket개까지 채운다 (운영자가 직접 돌리는 작업이라 일일 예산은 적용하지 않음)"""
+    per_bucket = per_bucket or lesson_pool.per_bucket
+    buckets = lesson_pool.popular_buckets(top_n, min_children)
+    added = {}
+    for age, interests, children in buckets:
+        need = per_bucket - lesson_pool.available(age, interests)
+        logger.info("lesson pool bucket age=%s interests=%s children=%s need=%s", age, interests, children, max(0, need))
+        added[bucket_key(age, interests)] = await fill_bucket(age, interests, need, concurrency)
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="인기 (나이, 관심사) 버킷 교재 풀 미리 생성")
+    parser.add_argument("--top", type=int, default=20, help="채울 인기 버킷 수")
+    parser.add_argument("--per-bucket", type=int, default=None, help="버킷당 교재 수 (기본: LESSON_POOL_PER_BUCKET)")
+    parser.add_argument("--min-children", type=int, default=None, help="최근 요청한 아이 수가 이보다 적은 버킷은 제외")
+    parser.add_argument("--concurrency", type=int, default=2, help="버킷당 동시 생성 수")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    result = asyncio.run(build(args.top, args.per_bucket, args.min_children, args.concurrency))
+    print(f"[lesson_pool] done: {sum(result.values())} lessons added to {len(result)} buckets")
+    print(lesson_pool.stats())
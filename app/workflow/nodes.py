@@ -1,4 +1,9 @@
 import os
+import json
+import logging
+import time
+import asyncio
+import functools
 from dotenv import load_dotenv
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
@@ -7,47 +12,209 @@ load_dotenv(dotenv_path)
 import uuid
 from app.services.azure_openai_service import AzureOpenAIService
 from app.services.vector_db_service import VectorDBService
-from app.models.schemas import EducationWorkflowState, LearningResponse, FeedbackResponse, OverallFeedbackResponse
+from app.services.embedding_cache import EmbeddingCache
+from app.services.lesson_cache import LessonCache
+from app.services.llm_scheduler import LLMScheduler
+from app.services.history_summarizer import HistorySummarizer
+from app.services.context_packer import ContextPacker
+from app.services.ingest_queue import IngestQueue
+from app.services.lesson_pool import LessonPool
+from app.services.lesson_store import LessonStore
+from app.services import metrics
+from app.services.tracing import Tracer, BatchExporter, create_sink
+from app.models.schemas import EducationWorkflowState, LearningResponse, FeedbackResponse, OverallFeedbackResponse, BulkFeedbackItem, BulkFeedbackResponse
+
+# 요청마다 찍히는 진단 로그는 debug 레벨로 (기본 설정에서는 출력되지 않음)
+logger = logging.getLogger(__name__)
 
 key = os.getenv("AZURE_OPENAI_API_KEY")
 if not key:
     raise RuntimeError("환경변수 AZURE_OPENAI_API_KEY가 설정되어 있지 않습니다.")
+embedding_cache = EmbeddingCache(
+    path=os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db"),
+    memory_entries=int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "1024")),
+    max_disk_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256")) * 1024 * 1024,
+)
+lesson_cache = LessonCache(
+    ttl_seconds=float(os.getenv("LESSON_CACHE_TTL_SECONDS", "21600")),
+    max_entries=int(os.getenv("LESSON_CACHE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("LESSON_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    variants=int(os.getenv("LESSON_CACHE_VARIANTS", "3")),  # 0이면 단일 캐시, N이면 N개 변형 순환
+)
+# 배포별 분당 요청/토큰 한도. 예) LLM_RATE_LIMITS='{"gpt-4o": {"rpm": 60, "tpm": 80000}}'
+# 한도를 지정하지 않은 배포는 LLM_DEFAULT_RPM/TPM을 쓰며, 0이면 제한 없이 우선순위 순서만 지킨다.
+llm_scheduler = LLMScheduler(
+    limits=json.loads(os.getenv("LLM_RATE_LIMITS", "{}")),
+    default_rpm=float(os.getenv("LLM_DEFAULT_RPM", "0")),
+    default_tpm=float(os.getenv("LLM_DEFAULT_TPM", "0")),
+)
+# 요청별 trace (노드/LLM 호출 span). TRACE_EXPORTER=jsonl|sqlite|none, 내보내기 워커는 main.py startup에서 시작
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl")
+tracer = Tracer(
+    exporter=BatchExporter(
+        create_sink(TRACE_EXPORTER, os.getenv("TRACE_PATH", "./traces.db" if TRACE_EXPORTER == "sqlite" else "./traces.jsonl")),
+        batch_size=int(os.getenv("TRACE_BATCH_SIZE", "64")),
+        flush_interval=float(os.getenv("TRACE_FLUSH_INTERVAL", "2.0")),
+        max_buffer=int(os.getenv("TRACE_MAX_BUFFER", "10000")),
+    ) if TRACE_EXPORTER != "none" else None,
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.1")),
+)
 azure_service = AzureOpenAIService(
     endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     key=key,
     dep_curriculum=os.getenv("AZURE_OPENAI_DEPLOY_CURRICULUM"),
     dep_embed=os.getenv("AZURE_OPENAI_DEPLOY_EMBED"),
+    embedding_cache=embedding_cache,
+    lesson_cache=lesson_cache,
+    embed_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "16")),
+    http_pool={
+        "max_connections": int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        "max_keepalive_connections": int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        "keepalive_expiry": float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+        "http2": os.getenv("HTTP2_ENABLED", "false").lower() == "true",
+    },
+    scheduler=llm_scheduler,
+    completion_token_estimate=int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "1000")),
+    tracer=tracer,
+)
+vector_service = VectorDBService(
+    persist_directory=os.getenv("CHROMA_DB_PATH", "./chroma_db"),
+    recent_assessments=int(os.getenv("RECENT_ASSESSMENTS", "10")),
+    backend=os.getenv("VECTOR_BACKEND", "chroma"),  # chroma | mmap
+    hnsw=os.getenv("VECTOR_HNSW", "false").lower() == "true",  # mmap 백엔드에서 hnswlib 사용 (설치된 경우)
+)
+# 유사 자료 검색 설정 (거리 기준은 컬렉션의 거리 공간, 기본 l2)
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_MAX_DISTANCE = float(os.getenv("RETRIEVAL_MAX_DISTANCE")) if os.getenv("RETRIEVAL_MAX_DISTANCE") else None
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "true").lower() == "true"
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+RETRIEVAL_WHERE = json.loads(os.getenv("RETRIEVAL_WHERE")) if os.getenv("RETRIEVAL_WHERE") else None
+# 교재 생성 프롬프트에 넣을 유사 자료의 토큰 예산 (배포별 지정 가능)
+# 예) CONTEXT_TOKEN_BUDGETS='{"gpt-4o-mini": 800}'
+context_packer = ContextPacker(
+    default_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200")),
+    budgets=json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}")),
+    doc_max_tokens=int(os.getenv("CONTEXT_DOC_MAX_TOKENS", "300")),
+)
+# 오래된 학습 이력은 아동별 누적 요약으로 대체해 종합 피드백 프롬프트 크기를 고정한다
+history_summarizer = HistorySummarizer(
+    azure_service,
+    path=os.getenv("HISTORY_SUMMARY_PATH", "./history_summaries.db"),
+    recent_window=int(os.getenv("HISTORY_RECENT_WINDOW", "5")),
+    chunk_size=int(os.getenv("HISTORY_SUMMARY_CHUNK", "10")),
+    summary_max_chars=int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1500")),
+    item_max_chars=int(os.getenv("HISTORY_ITEM_MAX_CHARS", "600")),
 )
-vector_service = VectorDBService(persist_directory=os.getenv("CHROMA_DB_PATH", "./chroma_db"))
+# 평가 응답 색인 write-behind 큐 (워커는 main.py startup에서 시작)
+ingest_queue = IngestQueue(
+    vector_service,
+    azure_service,
+    path=os.getenv("INGEST_QUEUE_PATH", "./ingest_queue.db"),
+    batch_size=int(os.getenv("INGEST_BATCH_SIZE", "32")),
+    poll_interval=float(os.getenv("INGEST_POLL_INTERVAL", "1.0")),
+    max_attempts=int(os.getenv("INGEST_MAX_ATTEMPTS", "8")),
+)
+# lesson_id -> 교재/정답 저장소 (평가 제출 때 정답 원문을 다시 받지 않도록)
+lesson_store = LessonStore(
+    path=os.getenv("LESSON_STORE_PATH", "./lesson_store.db"),
+    memory_entries=int(os.getenv("LESSON_STORE_MEMORY_ENTRIES", "512")),
+)
+# 인기 (나이, 관심사) 버킷별 미리 생성한 교재 풀 (채우기는 app/workflow/lesson_pool_builder.py)
+LESSON_POOL_ENABLED = os.getenv("LESSON_POOL_ENABLED", "true").lower() == "true"
+lesson_pool = LessonPool(
+    path=os.getenv("LESSON_POOL_PATH", "./lesson_pool.db"),
+    per_bucket=int(os.getenv("LESSON_POOL_PER_BUCKET", "5")),
+    max_serves=int(os.getenv("LESSON_POOL_MAX_SERVES", "50")),
+    min_children=int(os.getenv("LESSON_POOL_MIN_CHILDREN", "10")),  # 최근 요청한 서로 다른 아이 수
+    window_days=int(os.getenv("LESSON_POOL_WINDOW_DAYS", "7")),
+    max_refill=int(os.getenv("LESSON_POOL_MAX_REFILL", "2")),
+    daily_build_budget=int(os.getenv("LESSON_POOL_DAILY_BUILD_BUDGET", "100")),
+)
+# 일괄 제출 시 동시에 진행할 피드백 생성 호출 수
+FEEDBACK_CONCURRENCY = int(os.getenv("FEEDBACK_CONCURRENCY", "8"))
+
+# 모든 노드는 async로 동작한다 (workflow.ainvoke 로 실행).
+# LLM 호출은 비동기 클라이언트를, 동기 API뿐인 Chroma 호출은 스레드로 넘겨 이벤트 루프를 막지 않는다.
+# 병렬 브랜치에서 실행되는 노드는 상태 객체 대신 바뀐 필드만 담은 dict를 반환해야 한다
+# (같은 super-step에서 두 노드가 전체 상태를 돌려주면 필드 갱신이 충돌함).
 
-def init_profile_node(state: EducationWorkflowState) -> EducationWorkflowState:
+def timed_node(fn):
+    """노드 실행 시간을 state.node_timings[<노드 이름>], Prometheus 지표, trace span에 기록"""
+    name = fn.__name__.removesuffix("_node")
+
+    @functools.wraps(fn)
+    async def wrapper(state: EducationWorkflowState):
+        start = time.perf_counter()
+        try:
+            with tracer.span(f"node.{name}"):
+                result = await fn(state)
+        except Exception as e:
+            metrics.count_node_error(name, e)
+            raise
+        finally:
+            metrics.observe_node(name, time.perf_counter() - start)
+        elapsed = time.perf_counter() - start
+        if isinstance(result, dict):
+            return {**result, "node_timings": {name: elapsed}}
+        result.node_timings = {**(result.node_timings or {}), name: elapsed}
+        return result
+    return wrapper
+
+@timed_node
+async def init_profile_node(state: EducationWorkflowState) -> EducationWorkflowState:
     """아동 프로필 기반 초기 커리큘럼 생성"""
     if state.child_profile:
         curriculum_text = azure_service.get_initial_curriculum(state.child_profile)
         state.curriculum = curriculum_text
     return state
 
-def fetch_course_node(state: EducationWorkflowState) -> EducationWorkflowState:
+@timed_node
+async def fetch_course_node(state: EducationWorkflowState) -> EducationWorkflowState:
     """커리큘럼 임베딩 및 유사 자료 조회"""
     if state.curriculum:
-        embedding = azure_service.get_embedding(state.curriculum)
-        docs = vector_service.query_similar(embedding)
+        embedding = await azure_service.aget_embedding(state.curriculum)
+        docs = await asyncio.to_thread(
+            vector_service.query_similar,
+            embedding,
+            top_k=RETRIEVAL_TOP_K,
+            where=RETRIEVAL_WHERE,
+            max_distance=RETRIEVAL_MAX_DISTANCE,
+            mmr=RETRIEVAL_MMR,
+            mmr_lambda=RETRIEVAL_MMR_LAMBDA
+        )
         state.embedding = embedding
         state.related_docs = docs
     return state
 
-def generate_materials_node(state: EducationWorkflowState) -> EducationWorkflowState:
+@timed_node
+async def pack_context_node(state: EducationWorkflowState) -> EducationWorkflowState:
+    """유사 자료를 토큰 예산에 맞게 정리 (불필요한 메타데이터 제거, 순위별 자르기)"""
+    if state.related_docs is not None:
+        packed = context_packer.pack(state.related_docs, azure_service.dep_curriculum)
+        state.related_docs = packed.docs
+        state.context_tokens = {
+            "raw_context": packed.raw_tokens,
+            "packed_context": packed.packed_tokens,
+            "prompt": azure_service.materials_prompt_tokens(state.curriculum, packed.docs),
+        }
+        logger.debug("[context_pack] docs=%d dropped=%d truncated=%d tokens=%s",
+                     len(packed.docs), packed.dropped, packed.truncated, state.context_tokens)
+    return state
+
+@timed_node
+async def generate_materials_node(state: EducationWorkflowState) -> EducationWorkflowState:
     """맞춤 교재 및 평가 문제 생성"""
-    if state.curriculum and state.related_docs and state.child_profile:
-        lesson, materials = azure_service.generate_materials(state.curriculum, state.related_docs)
-        lesson_id = azure_service.save_lesson(state.child_profile.child_id, lesson, state.related_docs)
+    # 관련 자료가 하나도 없어도(빈 컬렉션, 거리 컷오프) 교재는 생성한다
+    if state.curriculum and state.related_docs is not None and state.child_profile:
+        lesson, materials = await azure_service.agenerate_materials(state.curriculum, state.related_docs, state.child_profile.name)
+        # 문제 텍스트로 합치기
+        materials_text = "\n".join(materials)
+        lesson_id = await asyncio.to_thread(lesson_store.save, state.child_profile.child_id, lesson, materials_text)
         
         state.lesson = lesson
         state.materials = materials
         state.lesson_id = lesson_id
         
-        # 문제 텍스트로 합치기
-        materials_text = "\n".join(materials)
         state.learning_response = LearningResponse(
             lesson=lesson,
             materials_text=materials_text,
@@ -55,41 +222,84 @@ def generate_materials_node(state: EducationWorkflowState) -> EducationWorkflowS
         )
     return state
 
-def submit_assessment_node(state: EducationWorkflowState) -> EducationWorkflowState:
-    """평가 응답 저장"""
-    if state.assessment_input:
-        vector_service.add_assessment(
-            student_id=state.assessment_input.child_id,
-            lesson_id=state.assessment_input.lesson_id,
-            responses=[state.assessment_input.responses_text],
-            materials_text=state.assessment_input.materials_text,
-            azure_service=azure_service
-        )
-        state.responses = state.assessment_input.responses_text
-    return state
+@timed_node
+async def submit_assessment_node(state: EducationWorkflowState) -> dict:
+    """평가 응답 저장 (write-behind 큐에 기록만 하고, 임베딩/색인은 백그라운드 워커가 처리)"""
+    if not state.assessment_input:
+        return {}
+    await ingest_queue.aenqueue({
+        "student_id": state.assessment_input.child_id,
+        "lesson_id": state.assessment_input.lesson_id,
+        "responses": [state.assessment_input.responses_text],
+    })
+    return {"responses": state.assessment_input.responses_text}
 
-def create_feedback_node(state: EducationWorkflowState) -> EducationWorkflowState:
-    """피드백 및 다음 교재 생성"""
-    if state.responses and state.assessment_input:
-        feedback = azure_service.create_feedback(
-            state.assessment_input.materials_text,
-            state.responses
-        )
-        state.feedback = feedback
-        state.feedback_response = FeedbackResponse(
-            feedback=feedback
-        )
-    return state
+@timed_node
+async def create_feedback_node(state: EducationWorkflowState) -> dict:
+    """피드백 생성 (저장 브랜치와 병렬로 실행되므로 입력에서 바로 응답을 읽는다)"""
+    if not state.assessment_input:
+        return {}
+    feedback = await azure_service.acreate_feedback(
+        state.assessment_input.materials_text,
+        state.assessment_input.responses_text
+    )
+    return {"feedback": feedback}
+
+@timed_node
+async def build_feedback_response_node(state: EducationWorkflowState) -> dict:
+    """저장/피드백 브랜치가 모두 끝난 뒤 응답 생성"""
+    if not state.feedback:
+        return {}
+    return {"feedback_response": FeedbackResponse(feedback=state.feedback)}
+
+@timed_node
+async def submit_assessments_node(state: EducationWorkflowState) -> dict:
+    """여러 평가 응답을 배치 임베딩 + 단일 upsert로 저장"""
+    if state.assessment_inputs:
+        texts = [a.responses_text for a in state.assessment_inputs]
+        embeddings = await azure_service.aget_embeddings(texts)
+        items = [
+            {
+                "student_id": a.child_id,
+                "lesson_id": a.lesson_id,
+                "responses": [a.responses_text],
+            }
+            for a in state.assessment_inputs
+        ]
+        await asyncio.to_thread(vector_service.add_assessments, items, azure_service, embeddings)
+    return {}
+
+@timed_node
+async def create_feedbacks_node(state: EducationWorkflowState) -> dict:
+    """평가 응답별 피드백을 제한된 동시성으로 생성"""
+    if state.assessment_inputs:
+        semaphore = asyncio.Semaphore(FEEDBACK_CONCURRENCY)
+
+        async def one(assessment):
+            async with semaphore:
+                try:
+                    feedback = await azure_service.acreate_feedback(assessment.materials_text, assessment.responses_text)
+                    return BulkFeedbackItem(child_id=assessment.child_id, lesson_id=assessment.lesson_id, feedback=feedback)
+                except Exception as e:
+                    # 한 건 실패가 전체 일괄 제출을 망치지 않도록 개별 오류로 기록
+                    return BulkFeedbackItem(child_id=assessment.child_id, lesson_id=assessment.lesson_id, error=str(e))
+
+        results = await asyncio.gather(*[one(a) for a in state.assessment_inputs])
+        return {"bulk_feedback_response": BulkFeedbackResponse(results=list(results))}
+    return {}
 
-def create_overall_feedback_node(state: EducationWorkflowState) -> EducationWorkflowState:
+@timed_node
+async def create_overall_feedback_node(state: EducationWorkflowState) -> EducationWorkflowState:
     """학습 이력 기반 종합 피드백 생성"""
     # 필요한 정보: 이름, 나이, 이력 리스트(history)
     if state.child_profile and hasattr(state, 'history') and state.history:
-        # history: [{interests, topic, feedback}, ...] 형태로 가정
-        feedback = azure_service.create_overall_feedback(
+        # history: [{interests, topic, feedback}, ...] 형태로 가정 (최신순)
+        summary, recent = await history_summarizer.compact(state.child_profile.child_id, state.history)
+        feedback = await azure_service.acreate_overall_feedback(
             name=state.child_profile.name,
             age=state.child_profile.age,
-            history=state.history
+            history=recent,
+            summary=summary
         )
         state.overall_feedback_response = OverallFeedbackResponse(feedback=feedback)
     return state
@@ -0,0 +1,94 @@
+"""
+/overall_feedback 엔드포인트 동시성 벤치마크.
+
+가짜 OpenAI 서버(etc/fake_openai_server.py)를 띄우고 FastAPI 앱에 동시 요청을 보내
+동시 요청 수에 따라 처리량이 늘어나는지(=이벤트 루프가 막히지 않는지) 확인한다.
+완전히 비동기라면 처리량은 대략 동시성 / LLM 지연 에 비례한다.
+
+요청마다 child_id와 이력을 바꿔 보내므로 요청 병합(SingleFlight)과 종합 피드백 캐시에
+걸리지 않고 매번 실제 LLM 호출까지 간다. --same-payload를 주면 예전처럼 같은 요청을 보내
+병합/캐시 적중 시의 처리량을 잰다.
+
+    python etc/bench_async_concurrency.py --latency 0.5 --levels 1 4 16 64
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import fake_openai_server
+
+
+_request_seq = itertools.count()
+
+
+def make_payload(same_payload: bool) -> dict:
+    n = 0 if same_payload else next(_request_seq)
+    return {
+        "child_id": f"bench-{n}",
+        "name": "벤치",
+        "age": 8,
+        "history": [{"interests": "공룡", "topic": f"공룡 이야기 {n}", "feedback": "잘했어요"}],
+    }
+
+
+async def run_level(client, concurrency: int, rounds: int, same_payload: bool):
+    async def one():
+        resp = await client.post("/overall_feedback", json=make_payload(same_payload))
+        resp.raise_for_status()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*[one() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return concurrency * rounds / elapsed
+
+
+async def main(args):
+    import httpx
+    import main as api
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        print(f"{'concurrency':>12} {'req/s':>10} {'ideal req/s':>12} {'efficiency':>11}")
+        for level in args.levels:
+            rps = await run_level(client, level, args.rounds, args.same_payload)
+            ideal = level / args.latency
+            print(f"{level:>12} {rps:>10.1f} {ideal:>12.1f} {rps / ideal:>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--same-payload", action="store_true", help="모든 요청에 같은 본문 사용 (병합/캐시 적중 측정)")
+    args = parser.parse_args()
+
+    fake_openai_server.start_in_thread(args.port, args.latency)
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{args.port}"
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    os.environ["AZURE_OPENAI_DEPLOY_CURRICULUM"] = "fake-chat"
+    os.environ["AZURE_OPENAI_DEPLOY_EMBED"] = "fake-embed"
+    # 모든 저장소를 임시 디렉터리에 둔다 (저장소 루트에 DB가 남지 않도록)
+    store_dir = tempfile.mkdtemp(prefix="bench_")
+    trace_file = "traces.db" if os.getenv("TRACE_EXPORTER") == "sqlite" else "traces.jsonl"
+    for key, name in [
+        ("CHROMA_DB_PATH", "chroma_db"),
+        ("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+        ("HISTORY_SUMMARY_PATH", "history_summaries.db"),
+        ("INGEST_QUEUE_PATH", "ingest_queue.db"),
+        ("LESSON_STORE_PATH", "lesson_store.db"),
+        ("LESSON_POOL_PATH", "lesson_pool.db"),
+        ("JOB_STORE_PATH", "jobs.db"),
+        ("TRACE_PATH", trace_file),
+    ]:
+        os.environ.setdefault(key, os.path.join(store_dir, name))
+    asyncio.run(main(args))
@@ -0,0 +1,155 @@
+"""
+스트림릿 SQLite 접근 방식 동시성 벤치마크.
+
+여러 세션(스레드)이 동시에 이력 조회/추가/피드백 갱신을 섞어 실행하면서
+- legacy: 연결 하나를 모든 세션이 공유, rollback journal, 문장마다 커밋 (기존 streamlit_app.py 방식)
+- wal:    streamlit_db.ChildEduDB (WAL, 세션별 연결, 준비된 문장 캐시, history(id, date) 인덱스)
+- wal+batch: 같은 구성에서 쓰기 한 번에 이력 5건을 batch()로 묶어 커밋
+의 처리량, 읽기/쓰기 지연(p50/p95), 잠금 대기 시간과 잠금 오류 수를 비교한다.
+
+    python etc/bench_streamlit_db.py --sessions 1 4 16 --ops 300 --history 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from streamlit_db import ChildEduDB
+
+
+class LegacyDB:
+    """기존 streamlit_app.py와 같은 접근 방식. 공유 연결 사용은 락으로 직렬화하고, 그 대기 시간을 잰다"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                id TEXT, lesson_id TEXT, date TEXT, title TEXT, content TEXT, materials_text TEXT, feedback TEXT,
+                PRIMARY KEY (id, lesson_id)
+            )
+        """)
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.lock_wait = 0.0
+
+    @contextmanager
+    def _locked(self):
+        start = time.perf_counter()
+        with self.lock:
+            self.lock_wait += time.perf_counter() - start
+            yield
+
+    def add_history(self, id, lesson_id, date, title, content, materials_text, feedback=None):
+        with self._locked():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO history (id, lesson_id, date, title, content, materials_text, feedback) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (id, lesson_id, date, title, content, materials_text, feedback)
+            )
+            self.conn.commit()
+
+    def get_history(self, id):
+        with self._locked():
+            return self.conn.execute(
+                "SELECT lesson_id, date, title, content, materials_text, feedback FROM history WHERE id=? ORDER BY date DESC", (id,)
+            ).fetchall()
+
+    def update_feedback(self, id, lesson_id, feedback):
+        with self._locked():
+            self.conn.execute("UPDATE history SET feedback=? WHERE id=? AND lesson_id=?", (feedback, id, lesson_id))
+            self.conn.commit()
+
+
+def lesson_row(child, i):
+    return (child, str(uuid.uuid4()), f"2025-01-01 00:{i // 60:02d}:{i % 60:02d}", f"(공룡, 우주) {i}", "지문 " * 200, "정답 " * 20)
+
+
+def seed(db, children, history):
+    for child in children:
+        for i in range(history):
+            db.add_history(*lesson_row(child, i))
+
+
+def run(db, sessions, ops, children, write_ratio, batched):
+    reads, writes, errors = [], [], [0]
+    lock = threading.Lock()
+
+    def session(n):
+        rng = random.Random(n)
+        child = children[n % len(children)]
+        local_reads, local_writes = [], []
+        for i in range(ops):
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    if batched:
+                        with db.batch():
+                            for j in range(5):
+                                db.add_history(*lesson_row(child, 10000 + n * ops + i * 5 + j))
+                    else:
+                        db.add_history(*lesson_row(child, 10000 + n * ops + i))
+                    local_writes.append(time.perf_counter() - start)
+                else:
+                    db.get_history(child)
+                    local_reads.append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            reads.extend(local_reads)
+            writes.extend(local_writes)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, reads, writes, errors[0]
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main(args):
+    children = [f"child{i}" for i in range(args.children)]
+    print(f"{'mode':>10} {'sessions':>8} {'ops/s':>9} {'read p50':>9} {'read p95':>9} {'write p95':>10} {'lock wait(s)':>12} {'errors':>7}")
+    for mode in ["legacy", "wal", "wal+batch"]:
+        for sessions in args.sessions:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.db")
+                db = LegacyDB(path) if mode == "legacy" else ChildEduDB(path)
+                if mode == "wal+batch":
+                    with db.batch():
+                        seed(db, children, args.history)
+                else:
+                    seed(db, children, args.history)
+                if mode == "legacy":
+                    db.lock_wait = 0.0
+                elapsed, reads, writes, errors = run(db, sessions, args.ops, children, args.write_ratio, mode == "wal+batch")
+                # WAL 모드의 잠금 대기는 SQLite busy 대기로 나타나므로, 가장 빠른 쓰기 대비 초과 시간으로 추정
+                lock_wait = db.lock_wait if mode == "legacy" else sum(writes) - len(writes) * (min(writes) if writes else 0)
+                print(f"{mode:>10} {sessions:>8} {(len(reads) + len(writes)) / elapsed:>9.0f} {pct(reads, 0.5):>9.2f} "
+                      f"{pct(reads, 0.95):>9.2f} {pct(writes, 0.95):>10.2f} {lock_wait:>12.2f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ops", type=int, default=300, help="세션당 작업 수")
+    parser.add_argument("--children", type=int, default=8)
+    parser.add_argument("--history", type=int, default=200, help="아이별 초기 이력 수")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+"""
+벡터 저장소 백엔드 벤치마크 (chroma vs mmap vs mmap+hnsw).
+
+같은 무작위 임베딩을 각 백엔드에 적재한 뒤, 백엔드마다 새 프로세스에서
+기동 시간(저장소 열기), 질의 지연(p50/p95), 상주 메모리(RSS)를 측정한다.
+
+    python etc/bench_vector_store.py --docs 20000 --dim 1536 --queries 200
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BACKENDS = [("chroma", False), ("mmap", False), ("mmap", True)]
+
+
+def rss_mb() -> float:
+    """현재 프로세스 RSS (리눅스 /proc 기준, 없으면 0)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def load(args):
+    import numpy as np
+    from app.services.vector_store import create_vector_store
+
+    rng = np.random.default_rng(0)
+    store = create_vector_store(args.backend, args.path, hnsw=args.hnsw)
+    for start in range(0, args.docs, 1000):
+        n = min(1000, args.docs - start)
+        vectors = rng.standard_normal((n, args.dim), dtype=np.float32)
+        ids = [f"doc{start + i}" for i in range(n)]
+        store.upsert(
+            ids=ids,
+            embeddings=vectors.tolist(),
+            documents=[f"문서 {i}" for i in ids],
+            metadatas=[{"type": "assessment", "student_id": f"s{(start + i) % 100}"} for i in range(n)],
+        )
+
+
+def measure(args):
+    import numpy as np
+    from app.services.vector_store import create_vector_store
+
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    store = create_vector_store(args.backend, args.path, hnsw=args.hnsw)
+    startup = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    latencies = []
+    for _ in range(args.queries):
+        q = rng.standard_normal(args.dim, dtype=np.float32).tolist()
+        t = time.perf_counter()
+        store.query(q, n_results=args.top_k)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+    print(json.dumps({
+        "startup_s": startup,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "rss_mb": rss_mb() - base_rss,
+        "count": store.count(),
+        "hnsw": getattr(store, "hnsw_active", False),
+    }))
+
+
+def run_child(mode, backend, hnsw, path, args):
+    cmd = [sys.executable, __file__, "--mode", mode, "--backend", backend, "--path", path,
+           "--docs", str(args.docs), "--dim", str(args.dim), "--queries", str(args.queries), "--top-k", str(args.top_k)]
+    if hnsw:
+        cmd.append("--hnsw")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return out.strip().splitlines()[-1] if out.strip() else ""
+
+
+def main(args):
+    print(f"{'backend':>12} {'startup(s)':>11} {'p50(ms)':>9} {'p95(ms)':>9} {'rss(MB)':>9}")
+    for backend, hnsw in BACKENDS:
+        name = backend + ("+hnsw" if hnsw else "")
+        if hnsw and importlib.util.find_spec("hnswlib") is None:
+            # 없는 채로 돌리면 전수 검색 결과가 hnsw 이름으로 찍힌다
+            print(f"{name:>12} 건너뜀: hnswlib 미설치 (pip install -r requirements-optional.txt)")
+            continue
+        with tempfile.TemporaryDirectory() as path:
+            try:
+                run_child("load", backend, hnsw, path, args)
+                result = json.loads(run_child("measure", backend, hnsw, path, args))
+            except (subprocess.CalledProcessError, ValueError) as e:
+                print(f"{name:>12} 실패: {e}")
+                continue
+            if hnsw and not result["hnsw"]:
+                print(f"{name:>12} 실패: HNSW 인덱스가 만들어지지 않았습니다 (전수 검색으로 동작)")
+                continue
+            print(f"{name:>12} {result['startup_s']:>11.3f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['rss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["bench", "load", "measure"], default="bench")
+    parser.add_argument("--backend", default="chroma")
+    parser.add_argument("--hnsw", action="store_true")
+    parser.add_argument("--path")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+    if args.mode == "load":
+        load(args)
+    elif args.mode == "measure":
+        measure(args)
+    else:
+        main(args)
@@ -0,0 +1,100 @@
+"""
+벤치마크용 로컬 가짜 Azure OpenAI 서버.
+
+실제 API 대신 고정 지연(FAKE_OPENAI_LATENCY 초) 후 응답을 돌려준다.
+AzureOpenAIService의 endpoint를 이 서버 주소로 지정하면 과금 없이 동시성을 측정할 수 있다.
+
+    python etc/fake_openai_server.py --port 8900 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import json
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_OPENAI_LATENCY", "0.5"))
+EMBED_DIM = 1536
+
+# 실제 교재처럼 이름 자리표시자를 넣는다 (4자 단위 스트리밍에서 토큰 경계에 걸친다)
+FAKE_LESSON = "【문제 1】 [이름]의 가짜 문제입니다.\n① 가\n② 나\n③ 다\n④ 라\n---정답---\n【문제 1】 정답: (1) 가"
+
+app = FastAPI(title="fake azure openai")
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+    if body.get("stream"):
+        return StreamingResponse(_stream_chunks(deployment), media_type="text/event-stream")
+    await asyncio.sleep(LATENCY)
+    prompt = body["messages"][-1]["content"]
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": FAKE_LESSON},
+        }],
+        "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(FAKE_LESSON) // 2,
+                  "total_tokens": (len(prompt) + len(FAKE_LESSON)) // 2},
+    }
+
+
+async def _stream_chunks(deployment: str):
+    """첫 토큰까지 LATENCY/5, 이후 나머지 지연을 토큰에 나눠 흘려보낸다"""
+    tokens = [FAKE_LESSON[i:i + 4] for i in range(0, len(FAKE_LESSON), 4)]
+    await asyncio.sleep(LATENCY / 5)
+    for token in tokens:
+        chunk = {
+            "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": deployment,
+            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        await asyncio.sleep(LATENCY * 0.8 / len(tokens))
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/deployments/{deployment}/embeddings")
+async def embeddings(deployment: str, request: Request):
+    body = await request.json()
+    await asyncio.sleep(LATENCY / 5)
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    data = []
+    for i, text in enumerate(inputs):
+        seed = (hash(text) % 1000) / 1000.0
+        data.append({"object": "embedding", "index": i,
+                     "embedding": [seed + j / EMBED_DIM for j in range(EMBED_DIM)]})
+    return {"object": "list", "data": data, "model": deployment,
+            "usage": {"prompt_tokens": 1, "total_tokens": 1}}
+
+
+def start_in_thread(port: int, latency: float = None):
+    """백그라운드 스레드에서 가짜 서버를 띄우고 준비될 때까지 대기"""
+    global LATENCY
+    if latency is not None:
+        LATENCY = latency
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    args = parser.parse_args()
+    LATENCY = args.latency
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
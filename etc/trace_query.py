@@ -0,0 +1,44 @@
+"""
+로컬 trace 파일에서 가장 느린 요청 조회.
+
+    python etc/trace_query.py                                  # ./traces.jsonl 상위 10개
+    python etc/trace_query.py --exporter sqlite --path traces.db --name init_profile --hours 24 --spans
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.tracing import slowest_traces
+
+
+def print_spans(spans, parent_ids, depth):
+    for span in sorted((s for s in spans if s["parent_id"] in parent_ids), key=lambda s: s["start"]):
+        status = "" if span["status"] == "ok" else f"  [{span['error']}]"
+        attrs = " ".join(f"{k}={v}" for k, v in span["attrs"].items())
+        print(f"{'  ' * depth}- {span['name']:<28} {span['duration_ms']:>10.1f} ms  {attrs}{status}")
+        print_spans(spans, {span["span_id"]}, depth + 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="느린 trace 조회")
+    parser.add_argument("--exporter", choices=["jsonl", "sqlite"], default=os.getenv("TRACE_EXPORTER", "jsonl"))
+    parser.add_argument("--path", default=None, help="trace 파일 (기본: TRACE_PATH 또는 ./traces.jsonl|./traces.db)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--name", default=None, help="워크플로우 이름 (예: init_profile, submit_assessment_stream)")
+    parser.add_argument("--hours", type=float, default=None, help="최근 N시간 안의 trace만")
+    parser.add_argument("--spans", action="store_true", help="노드/LLM 호출 span까지 출력")
+    args = parser.parse_args()
+
+    path = args.path or os.getenv("TRACE_PATH") or ("./traces.db" if args.exporter == "sqlite" else "./traces.jsonl")
+    since = time.time() - args.hours * 3600 if args.hours else None
+    for trace in slowest_traces(args.exporter, path, args.limit, args.name, since):
+        started = datetime.fromtimestamp(trace["start"]).strftime("%Y-%m-%d %H:%M:%S")
+        status = "" if trace["status"] == "ok" else f"  [{trace['error']}]"
+        print(f"{trace['duration_ms']:>10.1f} ms  {trace['name']:<26} {started}  {trace['trace_id']}{status}")
+        if args.spans:
+            # 최상위 span의 부모는 루트 span
+            print_spans(trace["spans"], {trace["span_id"]}, 1)
@@ -1,21 +1,162 @@
-from fastapi import FastAPI, Body
-from app.models.schemas import ChildProfileInput, LearningResponse, AssessmentInput, FeedbackResponse, EducationWorkflowState, FeedbackHistoryItem, OverallFeedbackRequest
-from app.workflow.graph import create_init_profile_graph, create_assessment_graph, create_overall_feedback_graph
+from fastapi import FastAPI, Body, HTTPException
+from fastapi.responses import StreamingResponse, Response
+from app.models.schemas import ChildProfileInput, LearningResponse, AssessmentInput, FeedbackResponse, EducationWorkflowState, FeedbackHistoryItem, OverallFeedbackRequest, BulkAssessmentInput, BulkFeedbackResponse
+from app.workflow.graph import create_init_profile_graph, create_assessment_graph, create_bulk_assessment_graph, create_overall_feedback_graph
+from app.workflow import lesson_pool_builder
+from app.workflow.nodes import azure_service, embedding_cache, ingest_queue, lesson_pool, lesson_store, LESSON_POOL_ENABLED, lesson_cache, llm_scheduler, history_summarizer, context_packer, tracer, init_profile_node, fetch_course_node, pack_context_node, submit_assessment_node
+from app.services.llm_scheduler import set_priority, BACKGROUND
+from app.services.singleflight import SingleFlight, make_key
+from app.services.overall_feedback_cache import OverallFeedbackCache
+from app.services.prefetch_store import PrefetchStore
+from app.services.job_store import JobStore
+from app.services import metrics
+from app.services.tracing import detached_context
+from app.services.azure_openai_service import split_materials, personalize
+from app.services.streaming import sse_event, AnswerSeparatorSplitter
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
+import time
 from pydantic import BaseModel
 from typing import List
 
 # 환경변수 로드
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="어린이 맞춤형 교재 생성기 API")
 
-# LangGraph 워크플로우 초기화
+# LangGraph 워크플로우 초기화 (노드가 async이므로 ainvoke로 실행)
 init_profile_workflow = create_init_profile_graph()
 assessment_workflow = create_assessment_graph()
+bulk_assessment_workflow = create_bulk_assessment_graph()
 overall_feedback_workflow = create_overall_feedback_graph()
 
+# 같은 입력으로 동시에 들어온 워크플로우 요청(스트림릿 재실행, 중복 클릭 등)은 한 번만 실행
+workflow_coalescer = SingleFlight()
+
+# 아동별 종합 피드백 캐시 (이력이 바뀌면 무효화, 기본은 stale-while-revalidate)
+overall_feedback_cache = OverallFeedbackCache(
+    stale_while_revalidate=os.getenv("OVERALL_FEEDBACK_SWR", "true").lower() == "true",
+)
+# 평가 제출 뒤 미리 만들어 두는 아동별 다음 교재 슬롯
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+prefetch_store = PrefetchStore(
+    ttl_seconds=float(os.getenv("PREFETCH_TTL_SECONDS", "1800")),
+    max_children=int(os.getenv("PREFETCH_MAX_CHILDREN", "10000")),
+)
+# 작업(job) API 기록: 결과는 클라이언트 연결과 무관하게 남고 TTL 뒤 삭제
+job_store = JobStore(
+    path=os.getenv("JOB_STORE_PATH", "./jobs.db"),
+    ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", "3600")),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "30")),  # 이 시간 동안 갱신이 없으면 다른 프로세스가 넘겨받아 다시 실행
+)
+# long-poll 한 번에 기다리는 최대 시간(초)
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", "30"))
+# 백그라운드 작업 참조 보관 (GC로 태스크가 사라지지 않도록)
+background_tasks = set()
+
+# 워크플로우별 실행 시간 집계: 실제 소요(wall) vs 노드 시간 합계 (병렬화 효과 확인용)
+workflow_timings = {}
+
+def record_timings(workflow: str, wall: float, node_timings: dict):
+    node_sum = sum(node_timings.values())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[timing] %s wall=%.3fs node_sum=%.3fs nodes=%s", workflow, wall, node_sum,
+                     {k: round(v, 3) for k, v in node_timings.items()})
+    agg = workflow_timings.setdefault(workflow, {"runs": 0, "wall": 0.0, "node_sum": 0.0, "nodes": {}})
+    agg["runs"] += 1
+    agg["wall"] += wall
+    agg["node_sum"] += node_sum
+    for name, elapsed in node_timings.items():
+        agg["nodes"][name] = agg["nodes"].get(name, 0.0) + elapsed
+
+def timing_stats() -> dict:
+    """워크플로우별 평균 소요 시간 (초)"""
+    return {
+        workflow: {
+            "runs": agg["runs"],
+            "avg_wall": round(agg["wall"] / agg["runs"], 4),
+            "avg_node_sum": round(agg["node_sum"] / agg["runs"], 4),
+            "avg_nodes": {name: round(total / agg["runs"], 4) for name, total in list(agg["nodes"].items())},
+        }
+        # collect_stats는 스레드에서 돌므로 이벤트 루프가 키를 추가하는 중에도 안전하게 복사본을 돈다
+        for workflow, agg in list(workflow_timings.items())
+    }
+
+async def run_workflow(name: str, workflow, state: EducationWorkflowState) -> dict:
+    """워크플로우 실행 후 노드별 소요 시간 기록 (샘플링된 요청은 trace로도 내보냄)"""
+    start = time.perf_counter()
+    with tracer.trace(name):
+        final_state = await workflow.ainvoke(state)
+    record_timings(name, time.perf_counter() - start, final_state.get("node_timings") or {})
+    return final_state
+
+def spawn_background(coro):
+    # 요청의 trace/span을 물려받지 않도록 span을 비운 컨텍스트에서 태스크를 만든다
+    task = detached_context().run(asyncio.create_task, coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@app.on_event("startup")
+async def start_workers():
+    ingest_queue.start()
+    if tracer.exporter is not None:
+        tracer.exporter.start()
+    # 임대가 끝난 작업(죽었거나 재시작된 프로세스의 작업)은 저장된 요청으로 다시 실행
+    job_store.start(lambda job_id, kind, request: spawn_background(_run_job(job_id, kind, request)))
+
+@app.on_event("shutdown")
+async def close_clients():
+    await ingest_queue.stop()
+    await job_store.stop()
+    if tracer.exporter is not None:
+        await tracer.exporter.stop()
+    await azure_service.aclose()
+
+def collect_stats() -> dict:
+    """스케줄러 대기열/대기 시간, 캐시 적중률, 요청 병합 현황 (SQLite 조회가 많으므로 스레드에서 호출)"""
+    return {
+        "scheduler": llm_scheduler.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "lesson_cache": lesson_cache.stats(),
+        "coalescing": workflow_coalescer.stats(),
+        "overall_feedback_cache": overall_feedback_cache.stats(),
+        "history_summarizer": history_summarizer.stats(),
+        "context_packing": context_packer.stats(),
+        "ingest_queue": ingest_queue.stats(),
+        "workflow_timings": timing_stats(),
+        "prefetch": prefetch_store.stats(),
+        "lesson_pool": lesson_pool.stats(),
+        "lesson_store": lesson_store.stats(),
+        "jobs": job_store.stats(),
+        "tracing": tracer.stats(),
+    }
+
+# /metrics 스크랩 시 위 값들을 edu_stat 게이지로 함께 내보낸다
+metrics.register_stats(collect_stats)
+
+@app.get("/stats")
+async def stats():
+    return await asyncio.to_thread(collect_stats)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 스크랩 엔드포인트 (노드/LLM 지연, 토큰 수, 캐시 적중률)"""
+    if not metrics.PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus_client가 설치되어 있지 않습니다.")
+    # 스크랩 시 collect_stats가 함께 돌므로 이벤트 루프 밖에서 렌더링
+    return Response(content=await asyncio.to_thread(metrics.render_latest), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.post("/ingest/flush")
+async def flush_ingest(timeout: float = 30.0):
+    """대기 중인 평가 응답 색인이 끝날 때까지 대기 (테스트/운영 정합성 확인용)"""
+    done = await ingest_queue.flush(timeout=timeout)
+    return {"flushed": done, **ingest_queue.stats()}
+
 @app.post("/init_profile", response_model=LearningResponse)
 async def init_profile(profile: ChildProfileInput):
     """
@@ -23,15 +164,30 @@ async def init_profile(profile: ChildProfileInput):
     2) 초기 학습 커리큘럼 생성
     3) 교재 및 문제 생성 후 반환
     """
+    return await workflow_coalescer.do(make_key("init_profile", profile.dict()), lambda: _run_init_profile(profile))
+
+async def _run_init_profile(profile: ChildProfileInput) -> LearningResponse:
+    ready = await _take_ready_lesson(profile)
+    if ready is not None:
+        return ready
     # LangGraph 워크플로우 실행
     initial_state = EducationWorkflowState(child_profile=profile)
-    final_state = init_profile_workflow.invoke(initial_state)
+    final_state = await run_workflow("init_profile", init_profile_workflow, initial_state)
     
     if final_state.get("learning_response"):
         return final_state["learning_response"]
     else:
         raise Exception("교재 생성에 실패했습니다.")
 
+async def _resolve_materials(assessment: AssessmentInput) -> AssessmentInput:
+    """정답 텍스트를 보내지 않은 제출은 lesson_id로 저장된 교재에서 채운다"""
+    if assessment.materials_text is not None:
+        return assessment
+    stored = await asyncio.to_thread(lesson_store.get, assessment.lesson_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"교재를 찾을 수 없습니다: {assessment.lesson_id}")
+    return assessment.copy(update={"materials_text": stored["materials_text"]})
+
 @app.post("/submit_assessment", response_model=FeedbackResponse)
 async def submit_assessment(assessment: AssessmentInput):
     """
@@ -39,31 +195,265 @@ async def submit_assessment(assessment: AssessmentInput):
     2) 피드백 생성
     3) 다음 교재 생성
     """
+    assessment = await _resolve_materials(assessment)
+    return await workflow_coalescer.do(make_key("submit_assessment", assessment.dict()), lambda: _run_submit_assessment(assessment))
+
+async def _run_submit_assessment(assessment: AssessmentInput) -> FeedbackResponse:
     # LangGraph 워크플로우 실행
     initial_state = EducationWorkflowState(assessment_input=assessment)
-    final_state = assessment_workflow.invoke(initial_state)
+    final_state = await run_workflow("submit_assessment", assessment_workflow, initial_state)
     
     if final_state.get("feedback_response"):
+        start_prefetch(assessment)
         return final_state["feedback_response"]
     else:
         raise Exception("피드백 생성에 실패했습니다.")
 
-@app.post("/overall_feedback")
-async def overall_feedback(req: OverallFeedbackRequest):
-    # print("[DEBUG] /overall_feedback request body:", req)
+def start_prefetch(assessment: AssessmentInput):
+    """방금 제출한 응답을 반영한 다음 교재를 백그라운드에서 미리 생성 (아동 프로필을 아는 경우만)"""
+    if not PREFETCH_ENABLED:
+        return
+    profile = prefetch_store.profile(assessment.child_id)
+    if profile is None:
+        return
+    spawn_background(_prefetch_next_lesson(assessment, profile, prefetch_store.begin(assessment.child_id)))
+
+async def _prefetch_next_lesson(assessment: AssessmentInput, profile: ChildProfileInput, generation: int):
+    # 아무도 기다리지 않는 추측성 생성이므로 가장 낮은 우선순위로 스케줄
+    set_priority(BACKGROUND)
+    try:
+        with tracer.trace("prefetch_next_lesson", child_id=assessment.child_id):
+            lesson, materials = await azure_service.agenerate_next_material(
+                assessment.child_id,
+                assessment.lesson_id,
+                last_responses=assessment.responses_text,
+                previous_materials=assessment.materials_text,
+                profile=profile,
+            )
+        materials_text = "\n".join(materials)
+        lesson_id = await asyncio.to_thread(lesson_store.save, assessment.child_id, lesson, materials_text)
+        response = LearningResponse(lesson=lesson, materials_text=materials_text, lesson_id=lesson_id)
+        prefetch_store.put(assessment.child_id, generation, profile, response)
+    except Exception:
+        logger.exception("prefetch of next lesson for %s failed", assessment.child_id)
+        prefetch_store.fail(assessment.child_id, generation)
+
+@app.post("/submit_assessments", response_model=BulkFeedbackResponse)
+async def submit_assessments(bulk: BulkAssessmentInput):
+    """
+    반 전체 제출처럼 여러 평가 응답을 한 번에 처리
+    1) 응답 임베딩을 배치로 계산하고 한 번의 upsert로 저장
+    2) 피드백은 제한된 동시성으로 병렬 생성 (결과는 제출 순서대로)
+    """
+    if not bulk.assessments:
+        return BulkFeedbackResponse(results=[])
+    bulk.assessments = [await _resolve_materials(a) for a in bulk.assessments]
+    initial_state = EducationWorkflowState(assessment_inputs=bulk.assessments)
+    final_state = await run_workflow("submit_assessments", bulk_assessment_workflow, initial_state)
+
+    if final_state.get("bulk_feedback_response"):
+        return final_state["bulk_feedback_response"]
+    else:
+        raise Exception("피드백 생성에 실패했습니다.")
+
+def _overall_feedback_state(req: OverallFeedbackRequest) -> EducationWorkflowState:
     # 워크플로우 상태 준비
     state = EducationWorkflowState()
     # child_profile은 최소한 이름, 나이 필요
     state.child_profile = ChildProfileInput(
-        child_id="dummy",  # 필요시 req에 추가
+        child_id=_overall_feedback_child_key(req),
         name=req.name,
         age=req.age,
         interests=[]  # 필요시 req에 추가
     )
     state.history = [item.dict() for item in req.history]
+    return state
+
+@app.post("/overall_feedback")
+async def overall_feedback(req: OverallFeedbackRequest):
+    # print("[DEBUG] /overall_feedback request body:", req)
+    # 종합 피드백은 기다려도 되는 작업이므로 교재/피드백 생성 뒤로 스케줄
+    set_priority(BACKGROUND)
+    child_key, digest = _overall_feedback_cache_key(req)
+    cached, fresh = overall_feedback_cache.lookup(child_key, digest)
+    if cached is not None:
+        if not fresh:
+            # 이전 요약을 바로 돌려주고 새 요약은 백그라운드에서 생성
+            spawn_background(_refresh_overall_feedback(req))
+        return {"feedback": cached, "stale": not fresh}
+    return await _refresh_overall_feedback(req)
+
+def _overall_feedback_child_key(req: OverallFeedbackRequest) -> str:
+    # child_id가 없는 예전 클라이언트는 이름+나이로 구분
+    return req.child_id or f"{req.name}:{req.age}"
+
+def _overall_feedback_cache_key(req: OverallFeedbackRequest):
+    child_key = _overall_feedback_child_key(req)
+    digest = OverallFeedbackCache.make_digest(req.name, req.age, [item.dict() for item in req.history])
+    return child_key, digest
+
+async def _refresh_overall_feedback(req: OverallFeedbackRequest) -> dict:
+    return await workflow_coalescer.do(make_key("overall_feedback", req.dict()), lambda: _run_overall_feedback(req))
+
+async def _run_overall_feedback(req: OverallFeedbackRequest) -> dict:
+    started_at = time.time()
+    state = _overall_feedback_state(req)
     # print("[DEBUG] state.history:", state.history)
-    final_state = overall_feedback_workflow.invoke(state)
+    final_state = await run_workflow("overall_feedback", overall_feedback_workflow, state)
     if final_state.get("overall_feedback_response"):
-        return {"feedback": final_state["overall_feedback_response"].feedback}
+        feedback = final_state["overall_feedback_response"].feedback
+        overall_feedback_cache.store(*_overall_feedback_cache_key(req), feedback, started_at)
+        return {"feedback": feedback}
     else:
         raise Exception("종합 피드백 생성에 실패했습니다.")
+
+# ---- 스트리밍(SSE) 엔드포인트 ----
+# 마지막 LLM 호출만 토큰 단위로 흘려보내기 위해 그래프 대신 노드를 직접 순서대로 실행한다.
+# 이벤트: token(본문 조각) -> answers(정답, 교재만) -> done(최종 결과) / error
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def _take_ready_lesson(profile: ChildProfileInput):
+    """
+    이미 만들어 둔 교재가 있으면 꺼낸다 (없으면 None → 실시간 생성)
+    1) 직전 평가 제출 뒤 이 아이를 위해 선생성한 교재
+    2) 인기 (나이, 관심사) 버킷 교재 풀에서 이 아이가 아직 받지 않은 교재 (풀이 줄면 백그라운드에서 채움)
+    """
+    prefetch_store.remember(profile)
+    if LESSON_POOL_ENABLED:
+        await asyncio.to_thread(lesson_pool.record_request, profile.child_id, profile.age, profile.interests)
+    prefetched = prefetch_store.take(profile)
+    if prefetched is not None:
+        return prefetched
+    if not LESSON_POOL_ENABLED:
+        return None
+    item = await asyncio.to_thread(lesson_pool.take, profile.child_id, profile.age, profile.interests)
+    spawn_background(lesson_pool_builder.refill(profile.age, list(profile.interests)))
+    if item is None:
+        return None
+    # 풀 교재는 이름 자리표시자로 만들어 두므로 꺼낼 때 이 아이 이름으로 바꾼다
+    return LearningResponse(**{**item, "lesson": personalize(item["lesson"], profile.name)})
+
+# ---- 작업(job) API: 요청은 바로 job_id를 돌려주고, 결과는 GET /jobs/{job_id}로 long-poll ----
+
+async def _run_job(job_id: str, kind: str, request: dict):
+    model, handler = JOB_HANDLERS[kind]
+    try:
+        result = await handler(model(**request))
+        await job_store.acomplete(job_id, result.dict())
+    except HTTPException as e:
+        await job_store.afail(job_id, str(e.detail))
+    except Exception as e:
+        logger.exception("job %s %s failed", kind, job_id)
+        await job_store.afail(job_id, str(e))
+
+async def _start_job(kind: str, request: BaseModel) -> dict:
+    job_id = await job_store.acreate(kind, request.dict())
+    spawn_background(_run_job(job_id, kind, request.dict()))
+    return {"job_id": job_id, "status": "running"}
+
+@app.post("/jobs/init_profile", status_code=202)
+async def init_profile_job(profile: ChildProfileInput):
+    """교재 생성 작업 등록 (결과는 GET /jobs/{job_id})"""
+    return await _start_job("init_profile", profile)
+
+@app.post("/jobs/submit_assessment", status_code=202)
+async def submit_assessment_job(assessment: AssessmentInput):
+    """평가 제출/피드백 작업 등록. 교재를 찾을 수 없으면 작업을 만들지 않고 바로 404"""
+    await _resolve_materials(assessment)
+    return await _start_job("submit_assessment", assessment)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """작업 상태/결과 조회. wait초 동안 완료를 기다린다 (long-poll, 최대 JOB_MAX_WAIT_SECONDS)"""
+    job = await job_store.wait(job_id, min(wait, JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다 (만료되었거나 잘못된 id)")
+    return job
+
+JOB_HANDLERS = {
+    "init_profile": (ChildProfileInput, init_profile),
+    "submit_assessment": (AssessmentInput, submit_assessment),
+}
+
+@app.post("/init_profile/stream")
+async def init_profile_stream(profile: ChildProfileInput):
+    """교재 생성 스트리밍. 정답은 본문에 섞이지 않고 마지막에 answers 이벤트로 전달"""
+    async def events():
+        try:
+            with tracer.trace("init_profile_stream"):
+                ready = await _take_ready_lesson(profile)
+                if ready is not None:
+                    yield sse_event("token", {"text": ready.lesson})
+                    yield sse_event("answers", {"materials_text": ready.materials_text})
+                    yield sse_event("done", {"lesson": ready.lesson, "lesson_id": ready.lesson_id, "prefetched": True})
+                    return
+                state = EducationWorkflowState(child_profile=profile)
+                state = await init_profile_node(state)
+                state = await fetch_course_node(state)
+                state = await pack_context_node(state)
+                splitter = AnswerSeparatorSplitter()
+                chunks = []
+                async for token in azure_service.astream_materials(state.curriculum, state.related_docs or [], profile.name):
+                    chunks.append(token)
+                    text = splitter.feed(token)
+                    if text:
+                        yield sse_event("token", {"text": text})
+                tail = splitter.flush()
+                if tail:
+                    yield sse_event("token", {"text": tail})
+                lesson, materials = split_materials("".join(chunks).strip())
+                materials_text = "\n".join(materials)
+                lesson_id = await asyncio.to_thread(lesson_store.save, profile.child_id, lesson, materials_text)
+                yield sse_event("answers", {"materials_text": materials_text})
+                yield sse_event("done", {"lesson": lesson, "lesson_id": lesson_id})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"교재 생성에 실패했습니다: {e}"})
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/submit_assessment/stream")
+async def submit_assessment_stream(assessment: AssessmentInput):
+    """평가 저장 후 피드백 스트리밍"""
+    assessment = await _resolve_materials(assessment)
+    async def events():
+        try:
+            with tracer.trace("submit_assessment_stream"):
+                await submit_assessment_node(EducationWorkflowState(assessment_input=assessment))
+                chunks = []
+                async for token in azure_service.astream_feedback(assessment.materials_text, assessment.responses_text):
+                    chunks.append(token)
+                    yield sse_event("token", {"text": token})
+                start_prefetch(assessment)
+                yield sse_event("done", {"feedback": "".join(chunks).strip()})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"피드백 생성에 실패했습니다: {e}"})
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/overall_feedback/stream")
+async def overall_feedback_stream(req: OverallFeedbackRequest):
+    """종합 피드백 스트리밍"""
+    async def events():
+        set_priority(BACKGROUND)
+        try:
+            with tracer.trace("overall_feedback_stream"):
+                child_key, digest = _overall_feedback_cache_key(req)
+                cached, fresh = overall_feedback_cache.lookup(child_key, digest)
+                if cached is not None:
+                    if not fresh:
+                        spawn_background(_refresh_overall_feedback(req))
+                    yield sse_event("token", {"text": cached})
+                    yield sse_event("done", {"feedback": cached, "stale": not fresh})
+                    return
+                started_at = time.time()
+                state = _overall_feedback_state(req)
+                chunks = []
+                summary, recent = await history_summarizer.compact(child_key, state.history)
+                async for token in azure_service.astream_overall_feedback(req.name, req.age, recent, summary):
+                    chunks.append(token)
+                    yield sse_event("token", {"text": token})
+                feedback = "".join(chunks).strip()
+                overall_feedback_cache.store(child_key, digest, feedback, started_at)
+                yield sse_event("done", {"feedback": feedback})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"종합 피드백 생성에 실패했습니다: {e}"})
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,91 +1,85 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urljoin
 from dotenv import load_dotenv
 import os
-import sqlite3
 from datetime import datetime
 import re
-from collections import Counter
 import json
+from streamlit_db import ChildEduDB
 
 # 환경변수 로드
 load_dotenv()
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 DB_PATH = "./child_edu_ai.db"
+# (연결, 읽기) 타임아웃. long-poll은 서버 대기 시간만큼 읽기 타임아웃을 늘려 쓴다
+HTTP_TIMEOUT = (3.05, 30)
+JOB_POLL_SECONDS = 20
 
-# DB 유틸 함수
+# DB 접근 계층 (WAL, 세션 스레드별 연결, 이력 인덱스)
 @st.cache_resource
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    return conn
+def get_db():
+    return ChildEduDB(DB_PATH)
 
-def init_db():
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS accounts (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            pw TEXT,
-            age INTEGER
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS history (
-            id TEXT,
-            lesson_id TEXT,
-            date TEXT,
-            title TEXT,
-            content TEXT,
-            materials_text TEXT,
-            feedback TEXT,
-            PRIMARY KEY (id, lesson_id)
-        )
-    """)
-    conn.commit()
-init_db()
+db = get_db()
 
-# DB 연동 함수
-def add_account(id, name, pw, age):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("INSERT INTO accounts (id, name, pw, age) VALUES (?, ?, ?, ?)", (id, name, pw, age))
-    conn.commit()
-
-def get_account(id):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("SELECT id, name, pw, age FROM accounts WHERE id=?", (id,))
-    row = c.fetchone()
-    if row:
-        return {"id": row[0], "name": row[1], "pw": row[2], "age": row[3]}
-    return None
+# 백엔드 호출용 HTTP 세션 (연결 재사용, 조회 요청만 재시도)
+@st.cache_resource
+def get_http():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                          max_retries=Retry(total=2, backoff_factor=0.3, allowed_methods=["GET"]))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-def add_history(id, lesson_id, date, title, content, materials_text, feedback=None):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
-        INSERT OR REPLACE INTO history (id, lesson_id, date, title, content, materials_text, feedback)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (id, lesson_id, date, title, content, materials_text, feedback))
-    conn.commit()
+http = get_http()
 
-def get_history(id):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("SELECT lesson_id, date, title, content, materials_text, feedback FROM history WHERE id=? ORDER BY date DESC", (id,))
-    rows = c.fetchall()
-    return [
-        {"lesson_id": r[0], "date": r[1], "title": r[2], "content": r[3], "materials_text": r[4], "feedback": r[5]}
-        for r in rows
-    ]
+def run_job(kind, payload):
+    """
+    작업 API로 생성 요청 후 결과가 나올 때까지 long-poll.
+    진행 중인 작업 id는 session_state에 보관해, 재실행/연결 끊김 뒤 같은 요청이면 새로 만들지 않고 이어서 기다린다.
+    """
+    pending = st.session_state.get(f"job_{kind}")
+    if pending and pending["payload"] == payload:
+        job_id = pending["job_id"]
+    else:
+        resp = http.post(urljoin(API_URL, f"/jobs/{kind}"), json=payload, timeout=HTTP_TIMEOUT)
+        if resp.status_code != 202:
+            raise RuntimeError(resp.text)
+        job_id = resp.json()["job_id"]
+        st.session_state[f"job_{kind}"] = {"job_id": job_id, "payload": payload}
+    while True:
+        resp = http.get(urljoin(API_URL, f"/jobs/{job_id}"), params={"wait": JOB_POLL_SECONDS},
+                        timeout=(HTTP_TIMEOUT[0], JOB_POLL_SECONDS + 10))
+        if resp.status_code != 200:
+            st.session_state.pop(f"job_{kind}", None)
+            raise RuntimeError(resp.text)
+        job = resp.json()
+        if job["status"] == "running":
+            continue
+        st.session_state.pop(f"job_{kind}", None)
+        if job["status"] == "error":
+            raise RuntimeError(job["error"])
+        return job["result"]
 
-def update_feedback(id, lesson_id, feedback):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("UPDATE history SET feedback=? WHERE id=? AND lesson_id=?", (feedback, id, lesson_id))
-    conn.commit()
+def stream_sse(path, payload):
+    """SSE 스트리밍 엔드포인트를 호출해 (event, data)를 도착하는 대로 반환"""
+    with http.post(urljoin(API_URL, path), json=payload, stream=True, timeout=(HTTP_TIMEOUT[0], 120)) as resp:
+        if resp.status_code != 200:
+            raise RuntimeError(resp.text)
+        resp.encoding = "utf-8"
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "error":
+                    raise RuntimeError(data.get("detail"))
+                yield event, data
 
 def render_child_friendly_materials(materials_text):
     lines = materials_text.split('\n')
@@ -127,13 +121,6 @@ def render_child_friendly_materials(materials_text):
     output.append("\n---\n")
     return ''.join(output)
 
-def remove_markdown_links(text):
-    # [텍스트](링크) → 텍스트
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    # [텍스트] → 텍스트
-    text = re.sub(r'\[([^\]]+)\]', r'\1', text)
-    return text
-
 def get_unused_categories(user_interests):
     CATEGORIES = {
         "과학": ["과학", "천체", "물리", "화학", "생물", "마찰력", "표면장력", "천체물리학", "우주", "실험"],
@@ -150,49 +137,13 @@ def get_unused_categories(user_interests):
     unused = [cat for cat in CATEGORIES if cat not in used_cats]
     return unused
 
-def get_history_for_feedback(history):
-    result = []
-    for item in history:
-        # title에서 관심사 추출
-        m = re.findall(r'\((.*?)\)', item['title'])
-        interests = m[0] if m else ""
-        # content에서 주제 추출
-        topic = item['content'].split('\n')[0][:30] if item['content'] else ""
-        feedback = item.get('feedback', '') or ""  # None/null을 빈 문자열로 보정
-        result.append({
-            "interests": interests,
-            "topic": topic,
-            "feedback": feedback
-        })
-    return result
-
-def render_overall_feedback(history):
-    # 관심사, 학습 주제, 피드백 요약 추출
-    interests = []
-    topics = []
-    feedbacks = []
-    for item in history:
-        # 관심사 추출 (title이 (관심사1, 관심사2) 형식)
-        m = re.findall(r'\((.*?)\)', item['title'])
-        if m:
-            for s in m[0].split(','):
-                s = s.strip()
-                if s:
-                    interests.append(s)
-        # 학습 주제(lesson content의 첫 줄)
-        if item['content']:
-            topic_line = item['content'].split('\n')[0][:30]
-            topics.append(remove_markdown_links(topic_line))
-        # 피드백
-        if item.get('feedback'):
-            feedbacks.append(remove_markdown_links(item['feedback']))
-    interest_cnt = Counter(interests)
-    topic_cnt = Counter(topics)
+def render_overall_feedback(analytics):
+    # 관심사, 학습 주제, 피드백 단어 빈도는 이력 저장 시 갱신되는 집계(db.get_analytics)를 그대로 쓴다
+    interest_cnt = analytics["interests"]
+    topic_cnt = analytics["topics"]
     # 피드백 요약(가장 많이 등장하는 단어)
-    feedback_text = ' '.join(feedbacks)
-    words = [w for w in re.findall(r'\w+', feedback_text) if len(w) > 1]
-    word_cnt = Counter(words)
-    common_words = ', '.join([w for w, _ in word_cnt.most_common(3)])
+    common_words = ', '.join([w for w, _ in analytics["feedback_terms"]])
+    interests = [k for k, _ in interest_cnt]
     # 추천 관심사 카테고리
     unused_cats = get_unused_categories(interests)
     if unused_cats:
@@ -202,8 +153,8 @@ def render_overall_feedback(history):
     # 마크다운 종합 피드백 (대괄호 없이)
     md = [
         "# 📊 나의 학습 분석\n",
-        f"- **관심사:** " + ', '.join([f"{k}({v}회)" for k, v in interest_cnt.most_common()]) if interest_cnt else "- **관심사:** 없음",
-        f"- **학습 주제:** " + ', '.join([f"{k}({v}회)" for k, v in topic_cnt.most_common()]) if topic_cnt else "- **학습 주제:** 없음",
+        f"- **관심사:** " + ', '.join([f"{k}({v}회)" for k, v in interest_cnt]) if interest_cnt else "- **관심사:** 없음",
+        f"- **학습 주제:** " + ', '.join([f"{k}({v}회)" for k, v in topic_cnt]) if topic_cnt else "- **학습 주제:** 없음",
         f"- **AI 피드백 요약:** {common_words if common_words else '아직 피드백이 충분하지 않아요!'}\n",
         "## 📝 앞으로 이런 학습을 추천해요!",
         "- 서술형 문제에서 예시를 더 많이 써보세요.",
@@ -230,6 +181,16 @@ if "show_register" not in st.session_state:
     st.session_state.show_register = False
 if "feedback" not in st.session_state:
     st.session_state.feedback = None
+# 사이드바 이력: 지금까지 불러온 페이지와 다음 페이지 커서 (이력이 바뀌면 None으로 초기화)
+if "history_items" not in st.session_state:
+    st.session_state.history_items = None
+    st.session_state.history_cursor = None
+
+HISTORY_PAGE_SIZE = 20
+
+def reset_history_page():
+    st.session_state.history_items = None
+    st.session_state.history_cursor = None
 
 # 쿼리 파라미터로 동작 제어
 action = st.query_params.get("action", "")
@@ -290,10 +251,10 @@ if st.session_state.show_register:
     reg_age = st.number_input("나이", min_value=3, max_value=18, step=1, key="reg_age")
     if st.button("등록", key="register_btn"):
         if reg_id and reg_name and reg_pw and reg_age:
-            if get_account(reg_id):
+            if db.get_account(reg_id):
                 st.warning("이미 존재하는 ID입니다. 다른 ID를 입력하세요.")
             else:
-                add_account(reg_id, reg_name, reg_pw, reg_age)
+                db.add_account(reg_id, reg_name, reg_pw, reg_age)
                 st.session_state.child_id = reg_id
                 st.session_state.child_name = reg_name
                 st.session_state.child_pw = reg_pw
@@ -313,7 +274,7 @@ if st.session_state.show_login:
     login_pw = st.text_input("PW", type="password", key="login_pw")
     if st.button("로그인", key="login_btn"):
         if login_id and login_pw:
-            acc = get_account(login_id)
+            acc = db.get_account(login_id)
             if acc and acc["pw"] == login_pw:
                 st.session_state.child_id = login_id
                 st.session_state.child_name = acc["name"]
@@ -339,7 +300,9 @@ if not st.session_state.logged_in:
     2. 로그인 후 학습 이력, 새 교재 생성, 문제 풀이 및 피드백을 경험할 수 있습니다.
     """)
 else:
-    acc = get_account(st.session_state.child_id)
+    acc = db.get_account(st.session_state.child_id)
+    # 교재 생성 중 진행 상황을 보여줄 메인 영역
+    stream_area = st.empty()
     with st.sidebar:
         st.markdown("#### 새 교재 생성")
         interests = st.text_input("관심사 입력", key="interest_input")
@@ -352,30 +315,46 @@ else:
                 "age": int(acc["age"]),
                 "interests": interests_list
             }
-            resp = requests.post(urljoin(API_URL, "/init_profile"), json=payload)
-            if resp.status_code == 200:
-                data = resp.json()
+            try:
+                # 생성 결과는 로컬 이력에 남겨야 하므로 연결이 끊겨도 다시 받을 수 있는 작업 API를 쓴다
+                stream_area.info("교재를 만들고 있어요. 잠시만 기다려주세요...")
+                data = run_job("init_profile", payload)
+                stream_area.empty()
                 lesson_item = {
                     "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     "title": f"({interests_str})",
                     "lesson_id": data["lesson_id"],
                     "content": data["lesson"],
-                    "materials_text": data["materials_text"],
+                    "materials_text": data.get("materials_text", ""),
                     "feedback": None
                 }
-                add_history(acc["id"], lesson_item["lesson_id"], lesson_item["date"], lesson_item["title"], lesson_item["content"], lesson_item["materials_text"])
+                db.add_history(acc["id"], lesson_item["lesson_id"], lesson_item["date"], lesson_item["title"], lesson_item["content"], lesson_item["materials_text"])
+                reset_history_page()
                 st.session_state.selected_lesson = lesson_item
                 st.session_state.feedback = None
                 st.success("✅ 교재가 생성되었습니다! 메인 화면에서 확인하세요.")
-            else:
-                st.error(f"오류 발생: {resp.text}")
+            except Exception as e:
+                stream_area.empty()
+                st.error(f"오류 발생: {e}")
         st.markdown("---")
         st.markdown(f"### {acc['name']}님의 학습 이력")
-        history = get_history(acc["id"])
-        if history:
-            for idx, item in enumerate(history):
-                if st.button(f"{item['date']} {item['title']}", key=f"lesson_{idx}"):
-                    st.session_state.selected_lesson = item
+        # 목록은 (lesson_id, date, title, has_feedback)만 페이지 단위로 읽고, 본문은 교재를 열 때 읽는다
+        if st.session_state.history_items is None or st.session_state.get("history_child") != acc["id"]:
+            st.session_state.history_child = acc["id"]
+            items, cursor = db.list_history(acc["id"], HISTORY_PAGE_SIZE)
+            st.session_state.history_items = items
+            st.session_state.history_cursor = cursor
+        history_items = st.session_state.history_items
+        for idx, item in enumerate(history_items):
+            mark = "✅ " if item["has_feedback"] else ""
+            if st.button(f"{mark}{item['date']} {item['title']}", key=f"lesson_{idx}"):
+                st.session_state.selected_lesson = db.get_lesson(acc["id"], item["lesson_id"])
+        if st.session_state.history_cursor is not None:
+            if st.button("더 보기", key="history_more_btn"):
+                items, cursor = db.list_history(acc["id"], HISTORY_PAGE_SIZE, st.session_state.history_cursor)
+                st.session_state.history_items = history_items + items
+                st.session_state.history_cursor = cursor
+                st.rerun()
 
     # 메인: 학습 상세/진행
     if st.session_state.selected_lesson:
@@ -399,19 +378,18 @@ else:
                 payload = {
                     "child_id": acc["id"],
                     "lesson_id": lesson["lesson_id"],
-                    "responses_text": responses_text,
-                    "materials_text": lesson["materials_text"]
+                    "responses_text": responses_text
                 }
                 try:
                     print(json.dumps(payload, ensure_ascii=False))
-                    resp = requests.post(urljoin(API_URL, "/submit_assessment"), json=payload)
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        st.session_state.feedback = data["feedback"]
-                        update_feedback(acc["id"], lesson["lesson_id"], data["feedback"])
-                        st.success("✅ 평가가 제출되었습니다! 피드백을 확인하세요.")
-                    else:
-                        st.error(f"오류 발생: {resp.text}")
+                    feedback_area = st.empty()
+                    feedback_area.info("피드백을 작성하고 있어요...")
+                    feedback_text = run_job("submit_assessment", payload)["feedback"]
+                    feedback_area.empty()
+                    st.session_state.feedback = feedback_text
+                    db.update_feedback(acc["id"], lesson["lesson_id"], feedback_text)
+                    reset_history_page()
+                    st.success("✅ 평가가 제출되었습니다! 피드백을 확인하세요.")
                 except Exception as e:
                     st.error(f"요청 중 오류 발생: {e}")
             # 피드백은 문제 제출 후에만 노출
@@ -419,21 +397,32 @@ else:
                 st.markdown("#### 피드백 결과")
                 st.write(st.session_state.feedback or lesson.get("feedback"))
     else:
-        if history:
-            history_for_feedback = get_history_for_feedback(history)
+        # 종합 피드백 요청에는 저장 시 추출해 둔 (관심사, 주제, 피드백)만 읽는다
+        history_for_feedback = db.get_feedback_history(acc["id"]) if history_items else []
+        if history_for_feedback:
             payload = {
+                "child_id": acc["id"],
                 "name": acc["name"],
                 "age": acc["age"],
                 "history": history_for_feedback
             }
-            st.spinner("AI 종합 피드백을 작성중입니다. 잠시만 기다려주세요...")
-            resp = requests.post(urljoin(API_URL, "/overall_feedback"), json=payload)
-            if resp.status_code == 200:
-                overall_feedback = resp.json().get("feedback", "")
-                st.markdown("---")
-                st.markdown("## 📊 AI 종합 피드백")
-                st.markdown(overall_feedback, unsafe_allow_html=True)
-            else:
+            st.markdown("---")
+            # 학습 분석은 저장 시 갱신된 집계에서 바로 그린다 (이력 재스캔 없음)
+            st.markdown(render_overall_feedback(db.get_analytics(acc["id"])))
+            st.markdown("## 📊 AI 종합 피드백")
+            overall_area = st.empty()
+            overall_area.markdown("AI 종합 피드백을 작성중입니다. 잠시만 기다려주세요...")
+            try:
+                overall_feedback = ""
+                for event, body in stream_sse("/overall_feedback/stream", payload):
+                    if event == "token":
+                        overall_feedback += body["text"]
+                        overall_area.markdown(overall_feedback, unsafe_allow_html=True)
+                    elif event == "done":
+                        overall_feedback = body["feedback"]
+                overall_area.markdown(overall_feedback, unsafe_allow_html=True)
+            except Exception:
+                overall_area.empty()
                 st.error("AI 종합 피드백 생성에 실패했습니다.")
         else:
             st.markdown("""
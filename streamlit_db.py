@@ -0,0 +1,299 @@
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# 학습 분석 집계 스키마 버전 (PRAGMA user_version). 올리면 다음 기동 때 기존 이력으로 다시 채운다
+ANALYTICS_VERSION = 1
+
+
+def remove_markdown_links(text):
+    # [텍스트](링크) → 텍스트
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    # [텍스트] → 텍스트
+    text = re.sub(r'\[([^\]]+)\]', r'\1', text)
+    return text
+
+
+def extract_interests_text(title):
+    """title이 (관심사1, 관심사2) 형식일 때 괄호 안 문자열"""
+    m = re.findall(r'\((.*?)\)', title or "")
+    return m[0] if m else ""
+
+
+def extract_interests(title):
+    return [s.strip() for s in extract_interests_text(title).split(',') if s.strip()]
+
+
+def extract_topic(content):
+    """학습 주제: 교재 본문 첫 줄 앞 30자"""
+    return content.split('\n')[0][:30] if content else ""
+
+
+def extract_feedback_terms(feedback):
+    """피드백에서 두 글자 이상 단어 빈도"""
+    if not feedback:
+        return Counter()
+    return Counter(w for w in re.findall(r'\w+', remove_markdown_links(feedback)) if len(w) > 1)
+
+
+class ChildEduDB:
+    """
+    스트림릿 앱용 SQLite 데이터 접근 계층.
+
+    - WAL 모드: 읽기는 쓰기를 기다리지 않고, 쓰기끼리만 직렬화된다.
+    - 스레드별 연결: 스트림릿 세션(스크립트 실행 스레드)마다 자기 연결을 쓴다.
+      연결마다 준비된 문장 캐시(cached_statements)를 둬서 같은 SQL을 다시 파싱하지 않는다.
+    - history(id, date, lesson_id) 인덱스: 아이별 이력을 날짜순으로 정렬 없이, 키셋 페이지 단위로 읽는다.
+    - batch(): 여러 쓰기를 한 트랜잭션으로 묶어 커밋(fsync)을 한 번만 한다.
+    - 학습 분석 집계(관심사/주제/피드백 단어 빈도, 아이별 교재 수)는 add_history/update_feedback과
+      같은 트랜잭션에서 증분 갱신하므로, 분석 화면은 이력을 다시 훑지 않고 집계 테이블만 읽는다.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, cached_statements: int = 256):
+        self.path = path
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: 트랜잭션은 _transaction()에서 직접 BEGIN/COMMIT
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def _init_schema(self):
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS accounts (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    pw TEXT,
+                    age INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id TEXT,
+                    lesson_id TEXT,
+                    date TEXT,
+                    title TEXT,
+                    content TEXT,
+                    materials_text TEXT,
+                    feedback TEXT,
+                    PRIMARY KEY (id, lesson_id)
+                )
+            """)
+            # lesson_id까지 포함해야 같은 시각 이력의 페이지 경계도 인덱스 순서로 처리된다
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_id_date_lesson ON history(id, date, lesson_id)")
+            # 종합 피드백 요청용 파생 컬럼 (본문을 읽지 않도록 저장 시점에 추출)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+            for column in ("interests", "topic"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE history ADD COLUMN {column} TEXT")
+            for table, key in (("child_interests", "interest"), ("child_topics", "topic"), ("child_feedback_terms", "term")):
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id TEXT,
+                        {key} TEXT,
+                        count INTEGER,
+                        PRIMARY KEY (id, {key})
+                    )
+                """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS child_stats (
+                    id TEXT PRIMARY KEY,
+                    lessons INTEGER DEFAULT 0,
+                    feedbacks INTEGER DEFAULT 0
+                )
+            """)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < ANALYTICS_VERSION:
+                self._backfill_analytics(conn)
+                conn.execute(f"PRAGMA user_version={ANALYTICS_VERSION}")
+
+    # ---- 학습 분석 집계 ----
+
+    @staticmethod
+    def _bump(conn, table, key, id, counts, sign):
+        for value, n in counts.items():
+            conn.execute(
+                f"INSERT INTO {table} (id, {key}, count) VALUES (?, ?, ?) "
+                f"ON CONFLICT(id, {key}) DO UPDATE SET count = count + excluded.count",
+                (id, value, sign * n)
+            )
+        if sign < 0 and counts:
+            conn.execute(f"DELETE FROM {table} WHERE id=? AND count <= 0", (id,))
+
+    def _apply_lesson(self, conn, id, title, content, sign):
+        self._bump(conn, "child_interests", "interest", id, Counter(extract_interests(title)), sign)
+        topic = remove_markdown_links(extract_topic(content))
+        if content:
+            self._bump(conn, "child_topics", "topic", id, Counter([topic]), sign)
+        conn.execute(
+            "INSERT INTO child_stats (id, lessons) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET lessons = lessons + excluded.lessons",
+            (id, sign)
+        )
+
+    def _apply_feedback(self, conn, id, feedback, sign):
+        if not feedback:
+            return
+        self._bump(conn, "child_feedback_terms", "term", id, extract_feedback_terms(feedback), sign)
+        conn.execute(
+            "INSERT INTO child_stats (id, feedbacks) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET feedbacks = feedbacks + excluded.feedbacks",
+            (id, sign)
+        )
+
+    def _backfill_analytics(self, conn):
+        """기존 이력으로 파생 컬럼과 집계 테이블을 다시 채운다 (스키마 초기화 트랜잭션 안에서 실행)"""
+        for table in ("child_interests", "child_topics", "child_feedback_terms", "child_stats"):
+            conn.execute(f"DELETE FROM {table}")
+        rows = conn.execute("SELECT id, lesson_id, title, content, feedback FROM history").fetchall()
+        for id, lesson_id, title, content, feedback in rows:
+            conn.execute("UPDATE history SET interests=?, topic=? WHERE id=? AND lesson_id=?",
+                         (extract_interests_text(title), extract_topic(content), id, lesson_id))
+            self._apply_lesson(conn, id, title, content, 1)
+            self._apply_feedback(conn, id, feedback, 1)
+
+    @contextmanager
+    def _transaction(self):
+        """쓰기 트랜잭션. batch() 안에서 호출되면 바깥 트랜잭션에 합쳐진다"""
+        conn = self._conn()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        # BEGIN IMMEDIATE: 쓰기 잠금을 처음부터 잡아 읽기→쓰기 승격 중 교착(SQLITE_BUSY)을 피한다
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.depth = 0
+
+    def batch(self):
+        """with db.batch(): ... 안의 쓰기를 한 번에 커밋"""
+        return self._transaction()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- 계정 ----
+
+    def add_account(self, id, name, pw, age):
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO accounts (id, name, pw, age) VALUES (?, ?, ?, ?)", (id, name, pw, age))
+
+    def get_account(self, id):
+        row = self._conn().execute("SELECT id, name, pw, age FROM accounts WHERE id=?", (id,)).fetchone()
+        if row:
+            return {"id": row[0], "name": row[1], "pw": row[2], "age": row[3]}
+        return None
+
+    # ---- 학습 이력 ----
+
+    def add_history(self, id, lesson_id, date, title, content, materials_text, feedback=None):
+        with self._transaction() as conn:
+            # 같은 교재를 다시 저장하면 이전 값의 집계 기여분을 먼저 뺀다
+            old = conn.execute("SELECT title, content, feedback FROM history WHERE id=? AND lesson_id=?", (id, lesson_id)).fetchone()
+            if old:
+                self._apply_lesson(conn, id, old[0], old[1], -1)
+                self._apply_feedback(conn, id, old[2], -1)
+            conn.execute("""
+                INSERT OR REPLACE INTO history (id, lesson_id, date, title, content, materials_text, feedback, interests, topic)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (id, lesson_id, date, title, content, materials_text, feedback, extract_interests_text(title), extract_topic(content)))
+            self._apply_lesson(conn, id, title, content, 1)
+            self._apply_feedback(conn, id, feedback, 1)
+
+    def get_history(self, id):
+        rows = self._conn().execute(
+            "SELECT lesson_id, date, title, content, materials_text, feedback FROM history WHERE id=? ORDER BY date DESC", (id,)
+        ).fetchall()
+        return [
+            {"lesson_id": r[0], "date": r[1], "title": r[2], "content": r[3], "materials_text": r[4], "feedback": r[5]}
+            for r in rows
+        ]
+
+    def list_history(self, id, limit: int = 20, after=None):
+        """
+        사이드바용 가벼운 이력 목록 (최신순). 본문/정답/피드백 원문은 읽지 않는다.
+        after: 이전 페이지가 돌려준 커서 (date, lesson_id). 반환값: (항목 목록, 다음 커서 또는 None)
+        """
+        if after is None:
+            rows = self._conn().execute(
+                "SELECT lesson_id, date, title, feedback IS NOT NULL AND feedback != '' FROM history "
+                "WHERE id=? ORDER BY date DESC, lesson_id DESC LIMIT ?", (id, limit + 1)
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT lesson_id, date, title, feedback IS NOT NULL AND feedback != '' FROM history "
+                "WHERE id=? AND (date, lesson_id) < (?, ?) "
+                "ORDER BY date DESC, lesson_id DESC LIMIT ?", (id, after[0], after[1], limit + 1)
+            ).fetchall()
+        items = [{"lesson_id": r[0], "date": r[1], "title": r[2], "has_feedback": bool(r[3])} for r in rows[:limit]]
+        cursor = (items[-1]["date"], items[-1]["lesson_id"]) if len(rows) > limit else None
+        return items, cursor
+
+    def get_lesson(self, id, lesson_id):
+        """이력 한 건 전체 (교재를 열 때만 읽는다)"""
+        r = self._conn().execute(
+            "SELECT lesson_id, date, title, content, materials_text, feedback FROM history WHERE id=? AND lesson_id=?", (id, lesson_id)
+        ).fetchone()
+        if r is None:
+            return None
+        return {"lesson_id": r[0], "date": r[1], "title": r[2], "content": r[3], "materials_text": r[4], "feedback": r[5]}
+
+    def update_feedback(self, id, lesson_id, feedback):
+        with self._transaction() as conn:
+            old = conn.execute("SELECT feedback FROM history WHERE id=? AND lesson_id=?", (id, lesson_id)).fetchone()
+            if old is None:
+                return
+            conn.execute("UPDATE history SET feedback=? WHERE id=? AND lesson_id=?", (feedback, id, lesson_id))
+            self._apply_feedback(conn, id, old[0], -1)
+            self._apply_feedback(conn, id, feedback, 1)
+
+    def get_feedback_history(self, id):
+        """종합 피드백 API용 이력 [{interests, topic, feedback}, ...] (최신순, 본문은 읽지 않음)"""
+        rows = self._conn().execute(
+            "SELECT interests, topic, feedback FROM history WHERE id=? ORDER BY date DESC, lesson_id DESC", (id,)
+        ).fetchall()
+        return [{"interests": r[0] or "", "topic": r[1] or "", "feedback": r[2] or ""} for r in rows]
+
+    def get_analytics(self, id, top_terms: int = 3):
+        """학습 분석 집계: 관심사/주제 빈도(많은 순), 피드백 상위 단어, 교재/피드백 수"""
+        conn = self._conn()
+        interests = conn.execute(
+            "SELECT interest, count FROM child_interests WHERE id=? ORDER BY count DESC, interest", (id,)
+        ).fetchall()
+        topics = conn.execute(
+            "SELECT topic, count FROM child_topics WHERE id=? ORDER BY count DESC, topic", (id,)
+        ).fetchall()
+        terms = conn.execute(
+            "SELECT term, count FROM child_feedback_terms WHERE id=? ORDER BY count DESC, term LIMIT ?", (id, top_terms)
+        ).fetchall()
+        stats = conn.execute("SELECT lessons, feedbacks FROM child_stats WHERE id=?", (id,)).fetchone()
+        return {
+            "interests": interests,
+            "topics": topics,
+            "feedback_terms": terms,
+            "lessons": stats[0] if stats else 0,
+            "feedbacks": stats[1] if stats else 0,
+        }
@@ -0,0 +1,61 @@
+"""
+테스트 공통 설정.
+
+앱 수준 테스트는 etc/fake_openai_server.py의 가짜 Azure OpenAI 서버를 띄우고,
+모든 저장소 경로를 임시 디렉터리로 돌린 뒤 main을 불러온다 (main/nodes가 import 시점에 환경 변수를 읽는다).
+"""
+import os
+import socket
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "etc"))
+
+import fake_openai_server  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def fake_openai():
+    """가짜 Azure OpenAI 서버 주소"""
+    port = _free_port()
+    server = fake_openai_server.start_in_thread(port, latency=0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+
+
+@pytest.fixture(scope="session")
+def client(fake_openai, tmp_path_factory):
+    """가짜 서버에 붙은 앱 TestClient (저장소는 모두 임시 디렉터리)"""
+    store_dir = tmp_path_factory.mktemp("stores")
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": fake_openai,
+        "AZURE_OPENAI_API_KEY": "fake",
+        "AZURE_OPENAI_DEPLOY_CURRICULUM": "fake-chat",
+        "AZURE_OPENAI_DEPLOY_EMBED": "fake-embed",
+        "VECTOR_BACKEND": "mmap",
+        "TRACE_EXPORTER": "none",
+    })
+    for key, name in [
+        ("CHROMA_DB_PATH", "vectors"),
+        ("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+        ("HISTORY_SUMMARY_PATH", "history_summaries.db"),
+        ("INGEST_QUEUE_PATH", "ingest_queue.db"),
+        ("LESSON_STORE_PATH", "lesson_store.db"),
+        ("LESSON_POOL_PATH", "lesson_pool.db"),
+        ("JOB_STORE_PATH", "jobs.db"),
+    ]:
+        os.environ[key] = str(store_dir / name)
+
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as c:
+        yield c
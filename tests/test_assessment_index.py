@@ -0,0 +1,39 @@
+from app.services.assessment_index import AssessmentIndex
+
+
+def test_allocate_is_monotonic_per_student(tmp_path):
+    index = AssessmentIndex(str(tmp_path / "index.sqlite3"))
+    allocated = [index.allocate("s1") for _ in range(5)]
+    assert [seq for seq, _ in allocated] == [1, 2, 3, 4, 5]
+    timestamps = [ts for _, ts in allocated]
+    assert timestamps == sorted(set(timestamps))
+    assert index.allocate("s2")[0] == 1
+
+
+def test_late_write_does_not_replace_latest(tmp_path):
+    index = AssessmentIndex(str(tmp_path / "index.sqlite3"))
+    old = index.allocate("s1")
+    new = index.allocate("s1")
+    index.record([("s1", "s1_l2_resp", *new)])
+    index.record([("s1", "s1_l1_resp", *old)])
+    assert index.latest("s1") == "s1_l2_resp"
+    assert index.recent("s1") == ["s1_l2_resp", "s1_l1_resp"]
+
+
+def test_recent_keeps_newest_and_moves_resubmission(tmp_path):
+    index = AssessmentIndex(str(tmp_path / "index.sqlite3"), recent_n=3)
+    for lesson in ["a", "b", "c", "d"]:
+        index.record([("s1", lesson, *index.allocate("s1"))])
+    assert index.recent("s1") == ["d", "c", "b"]
+
+    # 같은 평가를 다시 제출하면 새 행 없이 맨 앞으로 온다
+    index.record([("s1", "b", *index.allocate("s1"))])
+    assert index.recent("s1") == ["b", "d", "c"]
+    assert index.latest("s1") == "b"
+    assert index.recent("s1", n=1) == ["b"]
+
+
+def test_unknown_student(tmp_path):
+    index = AssessmentIndex(str(tmp_path / "index.sqlite3"))
+    assert index.latest("nobody") is None
+    assert index.recent("nobody") == []
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.services.ingest_queue import IngestQueue
+from app.services.vector_db_service import VectorDBService
+
+
+class FakeEmbeddings:
+    """fail(texts)가 예외를 돌려주면 그 배치는 실패한다"""
+
+    def __init__(self, fail=lambda texts: None):
+        self.fail = fail
+        self.calls = 0
+
+    async def aget_embeddings(self, texts):
+        self.calls += 1
+        error = self.fail(texts)
+        if error is not None:
+            raise error
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+def make_queue(tmp_path, azure, **kwargs):
+    vector = VectorDBService(str(tmp_path / "vectors"), backend="mmap")
+    return vector, IngestQueue(vector, azure, str(tmp_path / "queue.db"), **kwargs)
+
+
+def items(n, bad=()):
+    return [{"student_id": f"s{i}", "lesson_id": "l1", "responses": ["bad" if i in bad else f"answer {i}"]}
+            for i in range(n)]
+
+
+def test_bad_item_is_split_out(tmp_path):
+    azure = FakeEmbeddings(lambda texts: ValueError("bad input") if "bad" in texts else None)
+    vector, queue = make_queue(tmp_path, azure, batch_size=8, backoff_base=60)
+    for item in items(8, bad={3}):
+        queue.enqueue(item)
+
+    # 남은 한 건은 백오프 중이므로 flush는 기다리지 않고 False
+    assert asyncio.run(queue.flush()) is False
+    stats = queue.stats()
+    assert stats["processed"] == 7
+    assert stats["backlog"] == 1
+    assert stats["dead"] == 0
+    assert vector.store.count() == 7
+
+
+def test_transient_error_is_not_split(tmp_path):
+    azure = FakeEmbeddings(lambda texts: asyncio.TimeoutError())
+    vector, queue = make_queue(tmp_path, azure, batch_size=8, backoff_base=60)
+    for item in items(8):
+        queue.enqueue(item)
+
+    assert asyncio.run(queue.flush()) is False
+    assert azure.calls == 1
+    assert queue.stats()["backlog"] == 8
+
+
+def test_item_goes_dead_after_max_attempts(tmp_path):
+    azure = FakeEmbeddings(lambda texts: ValueError("bad input") if "bad" in texts else None)
+    vector, queue = make_queue(tmp_path, azure, batch_size=4, max_attempts=2, backoff_base=0)
+    for item in items(4, bad={0}):
+        queue.enqueue(item)
+
+    assert asyncio.run(queue.flush(timeout=5)) is True
+    stats = queue.stats()
+    assert stats["processed"] == 3
+    assert stats["dead"] == 1
+    assert stats["backlog"] == 0
+
+
+def test_retried_old_submission_does_not_replace_newer(tmp_path):
+    failed_once = []
+
+    def fail_old_once(texts):
+        if "old" in texts and not failed_once:
+            failed_once.append(1)
+            return ValueError("temporary")
+        return None
+
+    vector, queue = make_queue(tmp_path, FakeEmbeddings(fail_old_once), batch_size=8, backoff_base=0)
+    # 같은 교재를 두 번 제출. 예전 제출은 실패했다가 새 제출보다 늦게 색인된다
+    queue.enqueue({"student_id": "s1", "lesson_id": "l1", "responses": ["old"]})
+    queue.enqueue({"student_id": "s1", "lesson_id": "l1", "responses": ["new"]})
+
+    assert asyncio.run(queue.flush(timeout=5)) is True
+    assert failed_once
+    assert vector.get_latest_assessment("s1")["responses"] == "new"
+    assert vector.store.count() == 1
+
+
+@pytest.mark.parametrize("worker", [False, True])
+def test_flush_waits_for_enqueued_items(tmp_path, worker):
+    async def run():
+        vector, queue = make_queue(tmp_path, FakeEmbeddings(), batch_size=2, poll_interval=10)
+        if worker:
+            queue.start()
+        for item in items(5):
+            await queue.aenqueue(item)
+        done = await queue.flush(timeout=5)
+        await queue.stop()
+        return done, vector.store.count()
+
+    assert asyncio.run(run()) == (True, 5)
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from app.services.job_store import JobStore
+
+
+def test_wait_wakes_on_completion(tmp_path):
+    async def run():
+        store = JobStore(str(tmp_path / "jobs.db"))
+        job_id = await store.acreate("init_profile", {"child_id": "c1"})
+
+        async def finish():
+            await asyncio.sleep(0.05)
+            await store.acomplete(job_id, {"lesson": "ok"})
+
+        started = time.monotonic()
+        asyncio.create_task(finish())
+        job = await store.wait(job_id, timeout=5)
+        return job, time.monotonic() - started, store
+
+    job, elapsed, store = asyncio.run(run())
+    assert job["status"] == "done"
+    assert job["result"] == {"lesson": "ok"}
+    assert elapsed < 1
+    assert store._events == {}
+
+
+def test_wait_times_out_while_running(tmp_path):
+    async def run():
+        store = JobStore(str(tmp_path / "jobs.db"))
+        job_id = store.create("init_profile", {})
+        return await store.wait(job_id, timeout=0.1)
+
+    assert asyncio.run(run())["status"] == "running"
+
+
+def test_wait_polls_job_run_by_another_process(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    owner = JobStore(path)
+    other = JobStore(path, poll_interval=0.05)
+    job_id = owner.create("init_profile", {})
+
+    async def run():
+        async def finish():
+            await asyncio.sleep(0.1)
+            await owner.afail(job_id, "boom")
+
+        asyncio.create_task(finish())
+        return await other.wait(job_id, timeout=5)
+
+    job = asyncio.run(run())
+    assert job["status"] == "error"
+    assert job["error"] == "boom"
+
+
+def test_only_expired_leases_are_claimed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    owner = JobStore(path, lease_seconds=0.2)
+    other = JobStore(path, lease_seconds=0.2)
+    job_id = owner.create("submit_assessment", {"child_id": "c1"})
+
+    assert other.claim_expired() == []
+    time.sleep(0.12)
+    assert owner.heartbeat() == 1
+    time.sleep(0.12)
+    # 임대를 갱신하고 있는 작업은 넘겨받지 않는다
+    assert other.claim_expired() == []
+
+    time.sleep(0.25)
+    assert other.claim_expired() == [(job_id, "submit_assessment", {"child_id": "c1"})]
+    # 넘겨받은 뒤에는 새 임대가 걸려 있으므로 다시 넘겨받지 않는다
+    assert owner.claim_expired() == []
+    assert other.stats()["resumed"] == 1
+
+
+def test_sweep_removes_finished_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), ttl_seconds=0)
+    running = store.create("init_profile", {})
+    finished = store.create("init_profile", {})
+    asyncio.run(store.acomplete(finished, {}))
+    time.sleep(0.01)
+
+    assert store.sweep() == 1
+    assert store.get(finished) is None
+    assert store.get(running)["status"] == "running"
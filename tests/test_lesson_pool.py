@@ -0,0 +1,55 @@
+from app.services.lesson_pool import LessonPool
+
+
+def make_pool(tmp_path, **kwargs):
+    return LessonPool(str(tmp_path / "pool.db"), **kwargs)
+
+
+def test_popularity_counts_distinct_children(tmp_path):
+    pool = make_pool(tmp_path, min_children=2)
+    for _ in range(5):
+        pool.record_request("c1", 8, ["공룡", "우주"])
+    assert not pool.is_popular(8, ["우주", "공룡"])
+    assert pool.popular_buckets() == []
+
+    pool.record_request("c2", 8, ["우주", "공룡"])
+    assert pool.is_popular(8, ["공룡", "우주"])
+    assert pool.popular_buckets() == [(8, ["공룡", "우주"], 2)]
+
+
+def test_refill_is_capped_per_request(tmp_path):
+    pool = make_pool(tmp_path, min_children=1, per_bucket=5, max_refill=2)
+    assert pool.needs_refill(8, ["공룡"]) == 0
+    pool.record_request("c1", 8, ["공룡"])
+    assert pool.needs_refill(8, ["공룡"]) == 2
+    for i in range(4):
+        pool.add(8, ["공룡"], f"l{i}", "교재", "정답")
+    assert pool.needs_refill(8, ["공룡"]) == 1
+
+
+def test_daily_build_budget(tmp_path):
+    pool = make_pool(tmp_path, daily_build_budget=3)
+    assert pool.reserve_builds(2) == 2
+    assert pool.reserve_builds(2) == 1
+    assert pool.reserve_builds(1) == 0
+    assert pool.stats()["budget_denied"] == 2
+
+
+def test_take_skips_served_and_retires(tmp_path):
+    pool = make_pool(tmp_path, max_serves=2)
+    pool.add(8, ["공룡"], "l1", "교재1", "정답1")
+    pool.add(8, ["공룡"], "l2", "교재2", "정답2")
+
+    first = pool.take("c1", 8, ["공룡"])
+    second = pool.take("c1", 8, ["공룡"])
+    assert {first["lesson_id"], second["lesson_id"]} == {"l1", "l2"}
+    # 같은 아이에게는 이미 받은 교재를 다시 주지 않는다
+    assert pool.take("c1", 8, ["공룡"]) is None
+    assert pool.stats()["exhausted"] == 1
+
+    # 두 번째 아이가 받으면 max_serves에 도달해 퇴역
+    pool.take("c2", 8, ["공룡"])
+    pool.take("c2", 8, ["공룡"])
+    stats = pool.stats()
+    assert stats["retired"] == 2
+    assert stats["lessons"] == 0
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_scheduler import LLMScheduler, INTERACTIVE, BACKGROUND
+
+
+def test_interactive_overtakes_queued_background():
+    async def run():
+        # 버킷 용량 1, 0.1초에 하나씩 찬다
+        scheduler = LLMScheduler(default_rpm=600, burst_seconds=0.1)
+        await scheduler.acquire("chat", 1, priority=INTERACTIVE)
+        order = []
+
+        async def request(priority, label):
+            await scheduler.acquire("chat", 1, priority=priority)
+            order.append(label)
+
+        background = asyncio.create_task(request(BACKGROUND, "background"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request(INTERACTIVE, "interactive"))
+        await asyncio.gather(background, interactive)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "background"]
+
+
+def test_settle_returns_unused_tokens():
+    async def run():
+        scheduler = LLMScheduler(default_tpm=6000, burst_seconds=1)  # 용량 100토큰
+        reservation = await scheduler.acquire("chat", 80)
+        before = scheduler.stats()["deployments"]["chat"]["tpm_available"]
+        scheduler.settle(reservation, 30)
+        after = scheduler.stats()["deployments"]["chat"]["tpm_available"]
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before == pytest.approx(20, abs=2)
+    assert after == pytest.approx(70, abs=2)
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def run():
+        scheduler = LLMScheduler(default_rpm=6, burst_seconds=10)  # 용량 1, 10초에 하나
+        await scheduler.acquire("chat", 1)
+        waiter = asyncio.create_task(scheduler.acquire("chat", 1))
+        await asyncio.sleep(0.05)
+        depth = scheduler.stats()["deployments"]["chat"]["queue_depth"]["interactive"]
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return depth, scheduler.stats()["deployments"]["chat"]["queue_depth"]["interactive"]
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def test_unlimited_deployment_does_not_wait():
+    scheduler = LLMScheduler()
+    reservation = scheduler.acquire_sync("embed", 10_000)
+    assert reservation.waited < 0.1
+    assert scheduler.stats()["deployments"]["embed"]["tpm_available"] is None
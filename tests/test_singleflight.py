@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight, make_key
+
+
+def test_same_key_runs_once():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "lesson"
+
+        results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+        return results, len(calls), flight.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["lesson"] * 5
+    assert calls == 1
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def run():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_error_reaches_every_caller_and_clears_key():
+    async def run():
+        flight = SingleFlight()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+        # 실패한 실행은 남지 않으므로 다음 요청은 다시 실행한다
+        with pytest.raises(RuntimeError):
+            await flight.do("k", failing)
+        return results, len(attempts)
+
+    results, attempts = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert attempts == 2
+
+
+def test_make_key_normalizes_payload():
+    a = make_key("init_profile", {"name": " 민수 ", "interests": ["공룡", ""]})
+    b = make_key("init_profile", {"interests": ["공룡"], "name": "민수"})
+    assert a == b
+    assert a != make_key("submit_assessment", {"interests": ["공룡"], "name": "민수"})
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.azure_openai_service import (
+    ANSWER_SEPARATOR, NAME_CHECK_CHARS, NAME_GREETING, NAME_PLACEHOLDER, personalize, personalize_stream,
+)
+from app.services.streaming import AnswerSeparatorSplitter
+
+LESSON = f"【문제 1】 {NAME_PLACEHOLDER}의 공룡 이야기\n{NAME_PLACEHOLDER}야, 읽어 보자.\n{ANSWER_SEPARATOR}\n(1) 가"
+# 자리표시자가 없는 교재, 앞부분을 지나서야 자리표시자가 나오는 교재
+LESSON_NO_NAME = "【문제 1】 공룡 이야기\n" + "티라노사우루스는 아주 컸어요. " * 8 + f"\n{ANSWER_SEPARATOR}\n(1) 가"
+LESSON_LATE_NAME = "【문제 1】 공룡 이야기\n" + "티라노사우루스는 아주 컸어요. " * 8 + f"{NAME_PLACEHOLDER}는 어떻게 생각하나요?"
+
+
+def splits(text):
+    """text를 두 군데에서 자른 모든 토큰 나눔"""
+    for i in range(len(text) + 1):
+        for j in range(i, len(text) + 1):
+            yield [t for t in (text[:i], text[i:j], text[j:]) if t]
+
+
+def chunkings(text):
+    """긴 텍스트용: 한 군데에서 자른 나눔과 고정 크기 토큰 나눔"""
+    for i in range(len(text) + 1):
+        yield [t for t in (text[:i], text[i:]) if t]
+    for size in range(1, 8):
+        yield [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def collect_stream(tokens, name):
+    async def source():
+        for token in tokens:
+            yield token
+
+    async def run():
+        return [token async for token in personalize_stream(source(), name)]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("name", ["민수", "[이름]", None])
+def test_personalize_stream_matches_personalize(name):
+    expected = personalize(LESSON, name)
+    for tokens in splits(LESSON):
+        assert "".join(collect_stream(tokens, name)) == expected
+
+
+def test_personalize_prepends_greeting_without_placeholder():
+    assert len(LESSON_NO_NAME) > NAME_CHECK_CHARS
+    assert personalize(LESSON_NO_NAME, "민수") == NAME_GREETING.format(name="민수") + LESSON_NO_NAME
+    # 앞부분 뒤에 나온 자리표시자도 치환하되 인사말은 붙인다
+    late = personalize(LESSON_LATE_NAME, "민수")
+    assert late.startswith(NAME_GREETING.format(name="민수"))
+    assert late.endswith("민수는 어떻게 생각하나요?")
+    assert personalize(LESSON, "민수").startswith("【문제 1】 민수의")
+    assert personalize("짧은 교재", "민수") == NAME_GREETING.format(name="민수") + "짧은 교재"
+
+
+def test_pool_lesson_gets_one_greeting():
+    # 풀 교재는 자리표시자 이름으로 만들어 두고 꺼낼 때 다시 personalize 한다
+    stored = personalize(LESSON_NO_NAME, NAME_PLACEHOLDER)
+    served = personalize(stored, "민수")
+    assert served == NAME_GREETING.format(name="민수") + LESSON_NO_NAME
+
+
+@pytest.mark.parametrize("text", [LESSON_NO_NAME, LESSON_LATE_NAME, "짧은 교재", f"{NAME_PLACEHOLDER}"])
+def test_personalize_stream_fallback_matches_personalize(text):
+    expected = personalize(text, "민수")
+    for tokens in chunkings(text):
+        assert "".join(collect_stream(tokens, "민수")) == expected
+
+
+def test_personalize_stream_does_not_wait_for_whole_lesson():
+    consumed = []
+
+    async def source():
+        for token in [LESSON[i:i + 4] for i in range(0, len(LESSON), 4)]:
+            consumed.append(token)
+            yield token
+
+    async def first_token():
+        async for token in personalize_stream(source(), "민수"):
+            return token, len(consumed)
+
+    token, consumed_count = asyncio.run(first_token())
+    assert token == "【문제 1】 민수의"
+    assert consumed_count == 3
+
+
+def test_answer_splitter_hides_answers_at_any_boundary():
+    body, answers = LESSON.split(ANSWER_SEPARATOR)
+    for tokens in splits(LESSON):
+        splitter = AnswerSeparatorSplitter()
+        emitted = "".join(splitter.feed(token) for token in tokens) + splitter.flush()
+        assert emitted == body
+        assert splitter.answers == answers.strip()
+
+
+def read_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_init_profile_stream_personalizes_tokens(client):
+    profile = {"child_id": "stream-c1", "name": "민수", "age": 8, "interests": ["공룡"]}
+    resp = client.post("/init_profile/stream", json=profile)
+    assert resp.status_code == 200
+    events = read_events(resp.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[-2:] == ["answers", "done"]
+    assert "error" not in kinds
+
+    streamed = "".join(data["text"] for kind, data in events if kind == "token")
+    done = events[-1][1]
+    assert "민수" in streamed
+    assert NAME_PLACEHOLDER not in streamed
+    assert ANSWER_SEPARATOR not in streamed
+    assert streamed.strip() == done["lesson"]
+    assert events[-2][1]["materials_text"]
+
+
+def test_init_profile_personalizes_cached_lesson(client):
+    # 같은 나이/관심사의 다른 아이는 캐시된 교재를 받되 자기 이름으로 받는다
+    for child_id, name in [("cache-c1", "민수"), ("cache-c2", "지우")]:
+        resp = client.post("/init_profile", json={"child_id": child_id, "name": name, "age": 9, "interests": ["우주"]})
+        assert resp.status_code == 200
+        lesson = resp.json()["lesson"]
+        assert name in lesson
+        assert NAME_PLACEHOLDER not in lesson
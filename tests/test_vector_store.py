@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import MmapVectorStore, VectorStore, matches_where
+
+
+def make_docs(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"doc{i}" for i in range(n)]
+    metadatas = [{"type": "assessment" if i % 2 else "lesson", "i": i} for i in range(n)]
+    return ids, vectors, metadatas
+
+
+def test_query_matches_bruteforce_squared_l2(tmp_path):
+    store = MmapVectorStore(str(tmp_path))
+    ids, vectors, metadatas = make_docs(50)
+    store.upsert(ids, vectors.tolist(), [f"text {i}" for i in ids], metadatas)
+
+    query = vectors[7] + 0.01
+    res = store.query(query.tolist(), 5)
+    expected = ((vectors - query) ** 2).sum(axis=1)
+    order = np.argsort(expected)[:5]
+    assert res["ids"] == [ids[i] for i in order]
+    assert res["distances"] == pytest.approx(expected[order].tolist(), rel=1e-4, abs=1e-4)
+    assert res["metadatas"][0] == metadatas[7]
+
+
+def test_where_filter(tmp_path):
+    store = MmapVectorStore(str(tmp_path))
+    ids, vectors, metadatas = make_docs(20)
+    store.upsert(ids, vectors.tolist(), ids, metadatas)
+
+    res = store.query(vectors[0].tolist(), 20, where={"type": "assessment"})
+    assert len(res["ids"]) == 10
+    assert all(meta["type"] == "assessment" for meta in res["metadatas"])
+    assert store.get(where={"i": {"$in": [1, 2]}})["ids"] == ["doc1", "doc2"]
+    assert matches_where({"a": 1, "b": 2}, {"$or": [{"a": 2}, {"b": {"$ne": 3}}]})
+
+
+def test_upsert_replaces_and_survives_reload(tmp_path):
+    store = MmapVectorStore(str(tmp_path))
+    ids, vectors, metadatas = make_docs(10)
+    store.upsert(ids, vectors.tolist(), ids, metadatas)
+    store.upsert(["doc3"], [vectors[5].tolist()], ["updated"], [{"type": "lesson", "version": 2}])
+    assert store.count() == 10
+
+    reloaded = MmapVectorStore(str(tmp_path))
+    assert reloaded.count() == 10
+    got = reloaded.get(ids=["doc3"])
+    assert got["documents"] == ["updated"]
+    assert got["metadatas"] == [{"type": "lesson", "version": 2}]
+    res = reloaded.query(vectors[5].tolist(), 2)
+    assert set(res["ids"]) == {"doc3", "doc5"}
+
+
+def test_grows_past_initial_capacity(tmp_path):
+    store = MmapVectorStore(str(tmp_path))
+    n = MmapVectorStore.INITIAL_CAPACITY + 10
+    ids, vectors, metadatas = make_docs(n, dim=4)
+    store.upsert(ids, vectors.tolist(), ids, metadatas)
+    assert MmapVectorStore(str(tmp_path)).count() == n
+    assert store.query(vectors[-1].tolist(), 1)["ids"] == [ids[-1]]
+
+
+def test_incomplete_backend_is_rejected():
+    class PartialStore(VectorStore):
+        def count(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        PartialStore()